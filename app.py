@@ -3,14 +3,9 @@ import pymysql
 import base64
 from streamlit_extras.switch_page_button import switch_page
 
-# Koneksi ke Database
-def create_connection():
-    return pymysql.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="road_detection"
-    )
+from utils.auth import authenticate_db_user, hash_password, is_logged_in, login_session, logout_session
+from utils.db import create_connection, get_connection
+from utils.model_registry import preload
 
 # Fungsi untuk Registrasi
 def register_user(username, password, photo):
@@ -19,7 +14,7 @@ def register_user(username, password, photo):
         cursor = conn.cursor()
 
         sql = "INSERT INTO users (username, password, photo) VALUES (%s, %s, %s)"
-        cursor.execute(sql, (username, password, photo))
+        cursor.execute(sql, (username, hash_password(password), photo))
 
         conn.commit()
         conn.close()
@@ -55,15 +50,8 @@ def register():
 # Fungsi untuk Otentikasi Pengguna
 def authenticate_user(username, password):
     try:
-        conn = create_connection()
-        cursor = conn.cursor()
-
-        sql = "SELECT * FROM users WHERE username = %s AND password = %s"
-        cursor.execute(sql, (username, password))
-        user = cursor.fetchone()
-
-        conn.close()
-        return user is not None
+        # Koneksi dipakai ulang, bcrypt hanya diverifikasi sekali saat login
+        return authenticate_db_user(get_connection(), username, password)
     except Exception as e:
         st.error(f"Terjadi kesalahan: {e}")
         return False
@@ -80,8 +68,7 @@ def login():
 
         if submit_button:
             if authenticate_user(username, password):
-                st.session_state['logged_in'] = True
-                st.session_state['username'] = username
+                login_session(st.session_state, username)
                 st.success("🚀 Login berhasil!")
                 st.experimental_set_query_params()  
             else:
@@ -94,7 +81,7 @@ def main():
     if 'username' not in st.session_state:
         st.session_state['username'] = None
 
-    if not st.session_state['logged_in']:
+    if not is_logged_in(st.session_state):
         st.sidebar.header("Akses")
         choice = st.sidebar.radio("Pilih Halaman", ["Login", "Registrasi"])
         if choice == "Login":
@@ -165,9 +152,10 @@ def main():
 
 # Fungsi Logout
 def logout():
-    st.session_state['logged_in'] = False
-    st.session_state['username'] = None
+    logout_session(st.session_state)
     st.experimental_set_query_params()  
 
 if __name__ == "__main__":
+    # Model dimuat dan dipanaskan di latar selagi pengguna login
+    preload()
     main()
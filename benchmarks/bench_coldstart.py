@@ -0,0 +1,80 @@
+"""Benchmark cold start model: checkpoint training vs artefak inferensi.
+
+Setiap model diukur di subprocess baru: waktu import ultralytics, memuat
+model, predict pertama, dan median predict berikutnya.
+
+Contoh:
+    python benchmarks/bench_coldstart.py models/YOLOv8_Small_RDD.pt models/YOLOv8_Small_RDD_640.torchscript --imgsz 640
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+def measure(model_path, imgsz, runs):
+    """Dijalankan di subprocess supaya tidak ada cache dari model sebelumnya."""
+    start = time.perf_counter()
+    import numpy as np
+    from ultralytics import YOLO
+    import_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    net = YOLO(model_path, task="detect")
+    load_s = time.perf_counter() - start
+
+    frame = np.random.default_rng(0).integers(0, 255, (imgsz, imgsz, 3), dtype=np.uint8)
+    start = time.perf_counter()
+    net.predict(frame, imgsz=imgsz, verbose=False)
+    first_s = time.perf_counter() - start
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        net.predict(frame, imgsz=imgsz, verbose=False)
+        timings.append(time.perf_counter() - start)
+    return {
+        "import_s": import_s,
+        "load_s": load_s,
+        "first_predict_s": first_s,
+        "steady_predict_s": statistics.median(timings),
+        "cold_start_s": import_s + load_s + first_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("models", nargs="+")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="path file JSON hasil")
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.models[0], args.imgsz, args.runs)))
+        return
+
+    results = {}
+    print(f"{'model':<40} {'import s':>9} {'muat s':>8} {'predict#1 s':>12} {'stabil ms':>10} {'total s':>8}")
+    for model in args.models:
+        output = subprocess.run(
+            [sys.executable, __file__, model, "--imgsz", str(args.imgsz), "--runs", str(args.runs), "--measure"],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        # Baris terakhir adalah JSON; ultralytics bisa mencetak log sebelumnya
+        result = results[model] = json.loads(output.strip().splitlines()[-1])
+        print(f"{Path(model).name:<40} {result['import_s']:>9.2f} {result['load_s']:>8.2f} "
+              f"{result['first_predict_s']:>12.2f} {result['steady_predict_s'] * 1000:>10.1f} {result['cold_start_s']:>8.2f}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"imgsz": args.imgsz, "models": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Benchmark decode foto besar: decode penuh vs decode skala DCT (``draft``).
+
+Setiap kasus dijalankan di subprocess terpisah supaya puncak RSS-nya bersih.
+Gambar JPEG sintetis dibuat untuk ukuran foto ponsel umum, atau gunakan
+``--images`` untuk foto asli.
+
+Contoh:
+    python benchmarks/bench_decode.py --sizes 12 24 48 --imgsz 640
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Resolusi (w, h) untuk megapiksel umum kamera ponsel
+RESOLUTIONS = {12: (4000, 3000), 24: (5664, 4248), 48: (8000, 6000)}
+
+
+def _reset_peak():
+    # Di Linux puncak RSS proses induk ikut terbawa ke subprocess, jadi direset dulu
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux melaporkan KiB, macOS byte
+    return peak / 1024 if sys.platform != "darwin" else peak / 2**20
+
+
+def measure(path, mode, imgsz, repeat):
+    """Dijalankan di subprocess: decode + resize ``repeat`` kali."""
+    import cv2
+    from PIL import Image
+
+    from utils.image_decode import decode_resized
+
+    with open(path, "rb") as f:
+        data = f.read()
+    _reset_peak()
+    baseline = _peak_rss_mb()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if mode == "full":
+            # Jalur lama halaman gambar: Image.open -> np.array -> cv2.resize
+            image = np.array(Image.open(path))
+            cv2.resize(image, (imgsz, imgsz))
+        else:
+            decode_resized(data, imgsz)
+        timings.append(time.perf_counter() - start)
+    return {"median_ms": float(np.median(timings)) * 1000, "peak_mb": _peak_rss_mb() - baseline}
+
+
+def make_jpeg(path, size):
+    from PIL import Image
+
+    width, height = size
+    # Gradien + noise supaya ukuran file mirip foto asli
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.empty((height, width, 3), np.uint8)
+    image[..., 0] = (x + y) / 2
+    image[..., 1] = x
+    image[..., 2] = y
+    image += rng.integers(0, 24, (height, width, 1), dtype=np.uint8)
+    Image.fromarray(image).save(path, quality=90)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[12, 24, 48], choices=sorted(RESOLUTIONS))
+    parser.add_argument("--images", nargs="+", default=[], help="foto asli sebagai pengganti gambar sintetis")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--measure", nargs=2, metavar=("PATH", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure[0], args.measure[1], args.imgsz, args.repeat)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = [(os.path.basename(p), p) for p in args.images]
+        for megapixels in args.sizes:
+            path = os.path.join(tmp, f"{megapixels}mp.jpg")
+            make_jpeg(path, RESOLUTIONS[megapixels])
+            cases.append((f"{megapixels} MP sintetis", path))
+
+        print(f"{'gambar':<20} {'mode':<8} {'decode ms':>10} {'puncak MB':>10}")
+        for name, path in cases:
+            for mode in ("full", "reduced"):
+                output = subprocess.run(
+                    [sys.executable, __file__, "--imgsz", str(args.imgsz), "--repeat", str(args.repeat),
+                     "--measure", path, mode],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                result = json.loads(output)
+                print(f"{name:<20} {mode:<8} {result['median_ms']:>10.1f} {result['peak_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
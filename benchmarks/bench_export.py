@@ -0,0 +1,122 @@
+"""Benchmark ekspor laporan + deteksi pada database lokal pengganti (SQLite).
+
+Database berisi ``--detections`` baris deteksi dibuat sekali di ``--db``
+(dipakai ulang bila jumlahnya sama). Setiap kasus dijalankan di subprocess
+supaya puncak RSS-nya bersih:
+
+- ``csv`` / ``parquet``: ``utils.export`` (cursor tanpa buffer, per potongan);
+- ``fetchall``: cara lama, ``fetchall()`` ke DataFrame lalu ``to_csv``.
+
+Contoh:
+    python benchmarks/bench_export.py --detections 10000000 --modes csv parquet
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_decode import _peak_rss_mb, _reset_peak  # noqa: E402
+from benchmarks.localdb import LocalConnection  # noqa: E402
+
+DEFAULT_DB = os.path.join(ROOT, "bench", "export_bench.db")
+DETECTIONS_PER_REPORT = 50
+LABELS = ["Retakan Longitudinal", "Retakan Transversal", "Retakan Aligator", "Lubang Jalan"]
+SEVERITIES = ["Ringan", "Sedang", "Berat"]
+
+
+def seed(path, detections):
+    """Mengisi database pengganti bila belum berisi ``detections`` baris."""
+    if os.path.exists(path):
+        with sqlite3.connect(path) as db:
+            try:
+                if db.execute("SELECT COUNT(*) FROM detections").fetchone()[0] == detections:
+                    return
+            except sqlite3.OperationalError:
+                pass
+        os.remove(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    LocalConnection(path)  # membuat skema
+    reports = max(1, detections // DETECTIONS_PER_REPORT)
+    with sqlite3.connect(path) as db:
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.executemany(
+            "INSERT INTO reports (report_id, road_name, report_description, pothole_severity, upload_time, video_name)"
+            " VALUES (?, ?, 'benchmark', ?, datetime('2024-01-01', ? || ' minutes'), 'bench.mp4')",
+            ((i + 1, f"Jalan {i % 500}", SEVERITIES[i % 3], str(i)) for i in range(reports)),
+        )
+        db.executemany(
+            "INSERT INTO detections (report_id, class_label, confidence, x, y, width, height, frame_index,"
+            " latitude, longitude) VALUES (?, ?, ?, ?, ?, 40, 40, ?, ?, ?)",
+            (
+                (i // DETECTIONS_PER_REPORT % reports + 1, LABELS[i % 4], (i % 100) / 100, i % 1280, i % 720,
+                 i % DETECTIONS_PER_REPORT, -6.2 + (i % 1000) * 1e-4, 106.8 + (i % 997) * 1e-4)
+                for i in range(detections)
+            ),
+        )
+
+
+def measure(path, mode, chunk_size):
+    """Dijalankan di subprocess: mengekspor seluruh tabel ke file sementara."""
+    from utils import export
+
+    connection = LocalConnection(path)
+    _reset_peak()
+    baseline = _peak_rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, f"export.{'parquet' if mode == 'parquet' else 'csv'}")
+        start = time.perf_counter()
+        if mode == "fetchall":
+            import pandas as pd
+
+            sql, params = export.build_query()
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                frame = pd.DataFrame(cursor.fetchall(), columns=export.HEADER)
+            frame.to_csv(output_path, index=False)
+            rows = len(frame)
+        else:
+            with open(output_path, "wb") as output:
+                rows, _ = export.export(connection, output, mode, chunk_size=chunk_size)
+        seconds = time.perf_counter() - start
+        size_mb = os.path.getsize(output_path) / 2**20
+    return {"rows": rows, "seconds": seconds, "rows_per_s": rows / seconds,
+            "peak_mb": _peak_rss_mb() - baseline, "file_mb": size_mb}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--detections", type=int, default=10_000_000)
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--modes", nargs="+", default=["csv", "parquet", "fetchall"],
+                        choices=["csv", "parquet", "fetchall"])
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.db, args.measure, args.chunk_size)))
+        return
+
+    start = time.perf_counter()
+    seed(args.db, args.detections)
+    print(f"Database {args.db}: {args.detections:,} deteksi (siap dalam {time.perf_counter() - start:.0f} detik)")
+    print(f"{'mode':<10} {'baris':>12} {'detik':>8} {'baris/detik':>12} {'puncak MB':>10} {'file MB':>8}")
+    for mode in args.modes:
+        command = [sys.executable, __file__, "--db", args.db, "--chunk-size", str(args.chunk_size),
+                   "--measure", mode]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<10} {result['rows']:>12,} {result['seconds']:>8.1f} {result['rows_per_s']:>12,.0f} "
+              f"{result['peak_mb']:>10.0f} {result['file_mb']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark throughput login dengan banyak pengguna bersamaan.
+
+Contoh:
+    python benchmarks/bench_login.py --users 32 --rounds 12 --concurrency 1 2 4 8 16
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ROADGUARD_SECRET_KEY", "benchmark-secret")
+
+from utils import auth  # noqa: E402
+
+
+class MemoryUserTable:
+    """Pengganti tabel users di memori supaya benchmark tidak butuh MySQL."""
+
+    def __init__(self, users):
+        self.users = dict(users)
+
+    def cursor(self):
+        return _MemoryCursor(self)
+
+    def commit(self):
+        pass
+
+
+class _MemoryCursor:
+    def __init__(self, table):
+        self.table = table
+        self.row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        if sql.startswith("SELECT"):
+            stored = self.table.users.get(params[0])
+            self.row = None if stored is None else (stored,)
+        else:
+            self.table.users[params[1]] = params[0]
+
+    def fetchone(self):
+        return self.row
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def run_logins(table, usernames, concurrency, attempts):
+    latencies = []
+
+    def login(i):
+        username = usernames[i % len(usernames)]
+        start = time.perf_counter()
+        ok = auth.authenticate_db_user(table, username, "password-" + username)
+        latencies.append(time.perf_counter() - start)
+        assert ok
+        return auth.issue_session_token(username)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        tokens = list(pool.map(login, range(attempts)))
+    elapsed = time.perf_counter() - start
+    return tokens, elapsed, latencies
+
+
+def run_validations(tokens, iterations):
+    state = {"username": None, "session_token": None}
+    start = time.perf_counter()
+    for i in range(iterations):
+        token = tokens[i % len(tokens)]
+        state["session_token"] = token
+        state["username"] = auth.validate_session_token(token)
+        assert auth.is_logged_in(state)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=auth.BCRYPT_ROUNDS)
+    parser.add_argument("--attempts", type=int, default=64, help="jumlah login per level konkurensi")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--validations", type=int, default=100000)
+    args = parser.parse_args()
+
+    auth.BCRYPT_ROUNDS = args.rounds
+    usernames = [f"user{i}" for i in range(args.users)]
+    table = MemoryUserTable({u: auth.hash_password("password-" + u) for u in usernames})
+
+    print(f"bcrypt rounds={args.rounds}, users={args.users}, attempts={args.attempts}")
+    print(f"{'concurrency':>11} {'logins/s':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    tokens = []
+    for concurrency in args.concurrency:
+        tokens, elapsed, latencies = run_logins(table, usernames, concurrency, args.attempts)
+        print(
+            f"{concurrency:>11} {args.attempts / elapsed:>10.1f} "
+            f"{percentile(latencies, 50) * 1000:>9.1f} {percentile(latencies, 95) * 1000:>9.1f}"
+        )
+
+    per_check = run_validations(tokens, args.validations)
+    print(f"\nvalidasi token sesi: {per_check * 1e6:.2f} us/cek ({1 / per_check:,.0f} cek/s)")
+
+    # Login kedua untuk baris plaintext lama sudah memakai bcrypt
+    legacy = MemoryUserTable({"legacy": "password-legacy"})
+    auth.authenticate_db_user(legacy, "legacy", "password-legacy")
+    print("upgrade plaintext -> bcrypt:", auth.is_bcrypt_hash(legacy.users["legacy"]))
+
+
+if __name__ == "__main__":
+    main()
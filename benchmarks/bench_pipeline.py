@@ -0,0 +1,312 @@
+"""Benchmark per tahap untuk pipeline deteksi.
+
+Fixture yang dipakai adalah ``input_temp.mp4`` dan gambar di ``resource/``.
+Setiap tahap diukur terpisah: decode, preprocess (``cv2.resize``),
+``net.predict``, ekstraksi box ke ``Detection``, anotasi, encode video, dan
+penyimpanan laporan ke database lokal pengganti (SQLite).
+
+Contoh:
+    python benchmarks/bench_pipeline.py run --frames 120 --output bench/baseline.json
+    python benchmarks/bench_pipeline.py compare bench/baseline.json bench/new.json --threshold 0.10
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import metadata
+from pathlib import Path
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.localdb import LocalConnection  # noqa: E402
+from utils.detection_store import DetectionStore  # noqa: E402
+from utils.reports import save_report  # noqa: E402
+from utils.roi import FULL_FRAME, RoiProfile, load_profiles  # noqa: E402
+
+DEFAULT_MODEL = ROOT / "models" / "YOLOv8_Small_RDD.pt"
+DEFAULT_VIDEO = ROOT / "input_temp.mp4"
+DEFAULT_IMAGES = sorted((ROOT / "resource").glob("*.jpg")) + sorted((ROOT / "resource").glob("*.png"))
+
+CLASSES = [
+    "Longitudinal Crack",
+    "Transverse Crack",
+    "Alligator Crack",
+    "Potholes",
+]
+
+
+class Detection(NamedTuple):
+    class_id: int
+    label: str
+    score: float
+    box: np.ndarray
+
+
+class StageTimer:
+    """Mengumpulkan durasi per tahap dalam detik."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def measure(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        return {stage: summarize(values) for stage, values in self.samples.items()}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def summarize(values):
+    return {
+        "n": len(values),
+        "mean_ms": statistics.fmean(values) * 1000,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "min_ms": min(values) * 1000,
+        "max_ms": max(values) * 1000,
+        "total_s": sum(values),
+    }
+
+
+def environment_metadata():
+    packages = {}
+    for name in ("numpy", "opencv-python-headless", "opencv-python", "torch", "ultralytics", "Pillow"):
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            continue
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    env = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "packages": packages,
+        "git_commit": commit,
+    }
+    try:
+        import torch
+
+        env["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return env
+
+
+# ===================== Tahap Pipeline =====================
+
+def extract_detections(results):
+    # Sama dengan ekstraksi box di halaman realtime/video
+    detections = []
+    for result in results:
+        for _box in result.boxes.cpu().numpy():
+            detections.append(
+                Detection(
+                    class_id=int(_box.cls),
+                    label=CLASSES[int(_box.cls)],
+                    score=float(_box.conf),
+                    box=_box.xyxy[0].astype(int),
+                )
+            )
+    return detections
+
+
+def store_detections(store, frame_index, results, roi):
+    # Sama dengan ekstraksi box di halaman video (saring ROI, lalu DetectionStore kolom)
+    result = results[0][roi.keep(results[0].boxes.xyxy.cpu().numpy())]
+    boxes = result.boxes.cpu().numpy()
+    store.append(frame_index, boxes.cls, boxes.conf, roi.to_frame(boxes.xyxy))
+    return result
+
+
+def bench_images(timer, images, net, conf, repeat):
+    for _ in range(repeat):
+        for path in images:
+            data = path.read_bytes()
+            image = timer.measure("image_decode", cv2.imdecode, np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            resized = timer.measure("preprocess", cv2.resize, image, (640, 640), interpolation=cv2.INTER_AREA)
+            if net is not None:
+                results = timer.measure("predict", net.predict, resized, conf=conf, verbose=False)
+                timer.measure("extract", extract_detections, results)
+                timer.measure("annotate", results[0].plot)
+
+
+def bench_video(timer, video_path, net, conf, max_frames, db, report_every, roi_profile=None):
+    capture = cv2.VideoCapture(str(video_path))
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    roi = (roi_profile or RoiProfile(FULL_FRAME)).layout(width, height)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = cv2.VideoWriter(os.path.join(tmp, "out.mp4"), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        store = DetectionStore()
+        saved = 0
+        frame_index = 0
+        while frame_index < max_frames:
+            ret, frame = timer.measure("video_decode", capture.read)
+            if not ret:
+                break
+            frame_rgb = timer.measure("preprocess_video", cv2.cvtColor, frame, cv2.COLOR_BGR2RGB)
+            annotated = frame_rgb
+            if net is not None:
+                results = timer.measure("predict_video", net.predict, roi.crop(frame_rgb), conf=conf, verbose=False)
+                result = timer.measure("extract_video", store_detections, store, frame_index, results, roi)
+                annotated = timer.measure("annotate_video", lambda: roi.paste(frame_rgb, result.plot()))
+            timer.measure("video_encode", writer.write, cv2.cvtColor(annotated, cv2.COLOR_RGB2BGR))
+            frame_index += 1
+
+            if frame_index % report_every == 0:
+                rows = list(store.iter_rows(CLASSES))[saved:] or synthetic_rows(frame_index, 8)
+                saved = len(store)
+                timer.measure("save_report", save_report, db, "Jalan Benchmark", "benchmark", "Ringan", rows,
+                              video_name=video_path.name)
+        store.close()
+        writer.release()
+    capture.release()
+    return frame_index
+
+
+def synthetic_rows(frame_index, count):
+    # Dipakai saat model tidak tersedia supaya tahap DB tetap terukur
+    rng = np.random.default_rng(frame_index)
+    rows = []
+    for _ in range(count):
+        x1, y1 = rng.integers(0, 500, size=2)
+        rows.append((CLASSES[int(rng.integers(0, 4))], float(rng.random()), x1, y1, x1 + 40, y1 + 40,
+                     frame_index, None, None))
+    return rows
+
+
+def load_net(model_path):
+    if not Path(model_path).exists():
+        print(f"Model {model_path} tidak ditemukan, tahap predict/extract/annotate dilewati.")
+        return None
+    from ultralytics import YOLO
+
+    net = YOLO(str(model_path))
+    # Pemanasan supaya biaya inisialisasi tidak masuk ke hasil
+    net.predict(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+    return net
+
+
+def run(args):
+    net = None if args.no_model else load_net(args.model)
+    timer = StageTimer()
+    db = LocalConnection()
+
+    bench_images(timer, [Path(p) for p in args.images], net, args.conf, args.repeat)
+    roi_profile = load_profiles()[args.roi]
+    frames = bench_video(timer, Path(args.video), net, args.conf, args.frames, db, args.report_every, roi_profile)
+
+    output = {
+        "environment": environment_metadata(),
+        "config": {
+            "model": None if net is None else str(args.model),
+            "video": str(args.video),
+            "frames": frames,
+            "images": [str(p) for p in args.images],
+            "repeat": args.repeat,
+            "conf": args.conf,
+            "report_every": args.report_every,
+            "roi": args.roi,
+        },
+        "stages": timer.summary(),
+    }
+
+    print(f"{'stage':<18} {'n':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for stage, stats in output["stages"].items():
+        print(f"{stage:<18} {stats['n']:>6} {stats['mean_ms']:>9.2f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"\nHasil disimpan ke {args.output}")
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    regressions = []
+    print(f"{'stage':<18} {'base p50':>9} {'new p50':>9} {'change':>8}")
+    for stage, new in candidate["stages"].items():
+        old = baseline["stages"].get(stage)
+        if old is None:
+            print(f"{stage:<18} {'-':>9} {new[args.metric]:>9.2f}      baru")
+            continue
+        change = (new[args.metric] - old[args.metric]) / old[args.metric] if old[args.metric] else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESI"
+            regressions.append(stage)
+        elif change < -args.threshold:
+            flag = "  lebih cepat"
+        print(f"{stage:<18} {old[args.metric]:>9.2f} {new[args.metric]:>9.2f} {change:>+8.1%}{flag}")
+
+    if baseline["environment"].get("platform") != candidate["environment"].get("platform"):
+        print("\nPeringatan: platform berbeda, perbandingan mungkin tidak setara.")
+    if regressions:
+        print(f"\nRegresi pada tahap: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="jalankan benchmark")
+    run_parser.add_argument("--model", default=str(DEFAULT_MODEL))
+    run_parser.add_argument("--no-model", action="store_true", help="lewati tahap yang butuh model")
+    run_parser.add_argument("--video", default=str(DEFAULT_VIDEO))
+    run_parser.add_argument("--images", nargs="+", default=[str(p) for p in DEFAULT_IMAGES])
+    run_parser.add_argument("--frames", type=int, default=120)
+    run_parser.add_argument("--repeat", type=int, default=3, help="pengulangan fixture gambar")
+    run_parser.add_argument("--conf", type=float, default=0.5)
+    run_parser.add_argument("--report-every", type=int, default=30, help="simpan laporan setiap N frame")
+    run_parser.add_argument("--roi", default=FULL_FRAME, help="profil ROI dari roi_profiles.json untuk tahap video")
+    run_parser.add_argument("--output", help="path file JSON hasil")
+
+    compare_parser = subparsers.add_parser("compare", help="bandingkan dua hasil benchmark")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="batas regresi relatif")
+    compare_parser.add_argument("--metric", default="p50_ms", choices=["p50_ms", "p95_ms", "mean_ms"])
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
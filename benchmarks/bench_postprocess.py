@@ -0,0 +1,242 @@
+"""Benchmark postprocessing deteksi pada frame retak buaya yang padat.
+
+Output mentah head YOLOv8 ``(4 + nc, anchor)`` disintesis untuk frame
+``--imgsz`` dengan ``--crowd`` bagian frame tertutup retak buaya: setiap
+anchor di area itu memberi box yang saling tumpang tindih dengan skor
+tinggi, seperti pada jalan yang retaknya menyebar. Setiap kasus diukur
+terpisah:
+
+- ``ultralytics``: ``ops.non_max_suppression`` + ``Results`` + ekstraksi box
+  satu per satu seperti halaman lama (hanya jika ultralytics terpasang);
+- ``referensi``: ambang batas + NMS atas semua kandidat + objek ``Detection``
+  per box, tanpa top-k (NumPy/OpenCV, selalu tersedia);
+- ``cepat``: ``utils.postprocess.postprocess`` (top-k per kelas, NMS batch torchvision
+  bila terpasang, array).
+
+Kolom ``cocok`` adalah porsi deteksi referensi yang punya pasangan satu-satu
+di jalur cepat (kelas sama, IoU >= 0.5), dan ``selisih`` adalah jumlah
+deteksi dikurangi jumlah deteksi referensi. Beberapa nilai top-k bisa
+dibandingkan sekaligus dengan ``--max-per-class``.
+Dengan ``--model`` dan ``--images``, ``net.predict`` + ekstraksi dibandingkan
+juga dengan ``utils.postprocess.detect`` pada gambar nyata.
+
+Contoh:
+    python benchmarks/bench_postprocess.py --crowd 0.2 0.5 0.8 --repeat 50 --max-per-class 300 1000 3000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_pipeline import CLASSES, DEFAULT_MODEL, Detection, StageTimer  # noqa: E402
+from utils.postprocess import IOU_THRESHOLD, MAX_PER_CLASS, postprocess, scale_boxes  # noqa: E402
+
+ALLIGATOR = CLASSES.index("Alligator Crack")
+
+
+def anchor_points(imgsz, strides=(8, 16, 32)):
+    points = []
+    for stride in strides:
+        grid = np.arange(imgsz // stride) * stride + stride / 2
+        xs, ys = np.meshgrid(grid, grid)
+        points.append(np.stack([xs.ravel(), ys.ravel(), np.full(xs.size, stride)], axis=1))
+    return np.concatenate(points).astype(np.float32)
+
+
+def crowded_prediction(imgsz, crowd, content=None, patch=64, seed=0):
+    """Output mentah sintetis: ``crowd`` bagian frame (pita bawah) berisi retak buaya.
+
+    Area retak dibagi menjadi petak ``patch`` piksel; semua anchor di dalam satu
+    petak memprediksi box petak itu dengan sedikit jitter dan skor tertinggi di
+    tengah petak, seperti head YOLOv8 pada kerusakan nyata. ``content`` adalah
+    rentang y (atas, bawah) isi gambar di dalam letterbox.
+    """
+    rng = np.random.default_rng(seed)
+    anchors = anchor_points(imgsz)
+    count = len(anchors)
+    prediction = np.zeros((4 + len(CLASSES), count), dtype=np.float32)
+    prediction[0:2] = anchors[:, :2].T
+    prediction[2:4] = anchors[:, 2] * 2
+    prediction[4:] = rng.uniform(0, 0.05, (len(CLASSES), count))
+
+    top, bottom = content or (0, imgsz)
+    cracked = (anchors[:, 1] >= bottom - crowd * (bottom - top)) & (anchors[:, 1] < bottom)
+    centers = (np.floor(anchors[cracked, :2] / patch) + 0.5) * patch
+    size = patch * rng.uniform(0.9, 1.3, (cracked.sum(), 2))
+    prediction[0:2, cracked] = (centers + rng.normal(0, patch * 0.05, centers.shape)).T
+    prediction[2:4, cracked] = size.T
+    distance = np.abs(anchors[cracked, :2] - centers).max(1) / (patch / 2)
+    prediction[4 + ALLIGATOR, cracked] = np.clip(0.9 - 0.5 * distance + rng.normal(0, 0.05, cracked.sum()), 0, 1)
+    # Kelas lain muncul jarang di luar area retak (di dalam isi gambar, bukan padding)
+    inside = (anchors[:, 1] - anchors[:, 2] >= top) & (anchors[:, 1] + anchors[:, 2] < bottom)
+    sparse = ~cracked & inside & (rng.random(count) < 0.005)
+    prediction[4 + rng.integers(0, len(CLASSES), sparse.sum()), sparse] = rng.uniform(0.3, 0.9, sparse.sum())
+    return prediction
+
+
+def reference(prediction, conf, iou, shape, gain, pad):
+    """Ambang batas + NMS semua kandidat, lalu objek per box (cara lama, tanpa top-k)."""
+    scores_all = prediction[4:]
+    class_ids = scores_all.argmax(0)
+    scores = scores_all.max(0)
+    candidates = np.flatnonzero(scores >= conf)
+    cx, cy, w, h = prediction[:4, candidates]
+    xywh = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+    keep = np.asarray(cv2.dnn.NMSBoxesBatched(xywh, scores[candidates], class_ids[candidates].astype(np.int32),
+                                              conf, iou), dtype=np.intp).reshape(-1)[:300]
+    boxes = xywh[keep]
+    boxes[:, 2:] += boxes[:, :2]
+    boxes = scale_boxes(boxes, gain, pad, shape)
+    return [
+        Detection(class_id=int(class_ids[candidates[i]]), label=CLASSES[int(class_ids[candidates[i]])],
+                  score=float(scores[candidates[i]]), box=box.astype(int))
+        for i, box in zip(keep, boxes)
+    ]
+
+
+def fast(prediction, conf, iou, shape, gain, pad, max_per_class):
+    detections = postprocess(prediction, conf, iou, max_per_class)
+    return detections._replace(boxes=scale_boxes(detections.boxes, gain, pad, shape))
+
+
+def ultralytics_path(prediction, conf, iou, image, gain, pad):
+    """NMS ultralytics + ``Results`` + ekstraksi per box seperti ``bench_pipeline.extract_detections``."""
+    import torch
+    from ultralytics.engine.results import Results
+    from ultralytics.utils import ops
+
+    # non_max_suppression mengubah tensor input di tempat; kasus lain memakai array yang sama
+    det = ops.non_max_suppression(torch.from_numpy(prediction.copy())[None], conf, iou)[0]
+    det[:, :4] = torch.from_numpy(scale_boxes(det[:, :4].numpy(), gain, pad, image.shape))
+    result = Results(image, path="", names=dict(enumerate(CLASSES)), boxes=det)
+    return [
+        Detection(class_id=int(box.cls), label=CLASSES[int(box.cls)], score=float(box.conf),
+                  box=box.xyxy[0].astype(int))
+        for box in result.boxes.cpu().numpy()
+    ]
+
+
+def box_iou(box, boxes):
+    x1 = np.maximum(boxes[:, 0], box[0])
+    y1 = np.maximum(boxes[:, 1], box[1])
+    x2 = np.minimum(boxes[:, 2], box[2])
+    y2 = np.minimum(boxes[:, 3], box[3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    union = area + (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]) - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def match_rate(expected, detections, threshold=0.5):
+    """Porsi ``expected`` yang punya pasangan di ``detections`` (satu-satu, kelas sama, IoU >= threshold).
+
+    Pencocokan greedy dari skor referensi tertinggi; setiap box jalur cepat hanya
+    boleh dipakai sekali, jadi banyak box referensi tidak bisa dihitung cocok
+    dengan satu box besar yang sama.
+    """
+    if not expected:
+        return 1.0
+    used = np.zeros(len(detections.scores), dtype=bool)
+    found = 0
+    for detection in sorted(expected, key=lambda d: -d.score):
+        candidates = np.flatnonzero((detections.class_ids == detection.class_id) & ~used)
+        if not len(candidates):
+            continue
+        ious = box_iou(detection.box, detections.boxes[candidates])
+        best = int(np.argmax(ious))
+        if ious[best] >= threshold:
+            used[candidates[best]] = True
+            found += 1
+    return found / len(expected)
+
+
+def bench_synthetic(args):
+    try:
+        import ultralytics  # noqa: F401
+        has_ultralytics = True
+    except ImportError:
+        has_ultralytics = False
+        print("ultralytics tidak terpasang: kasus 'ultralytics' dilewati.\n")
+
+    # Frame 1280x720 di-letterbox ke imgsz, sama seperti halaman video
+    image = np.zeros((720, 1280, 3), dtype=np.uint8)
+    gain = args.imgsz / 1280
+    pad = (0, (args.imgsz - round(720 * gain)) // 2)
+
+    print(f"{'padat':>6} {'kandidat':>9} {'kasus':<12} {'top-k':>6} {'deteksi':>8} {'selisih':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'cocok':>7}")
+    for crowd in args.crowd:
+        prediction = crowded_prediction(args.imgsz, crowd, content=(pad[1], args.imgsz - pad[1]))
+        candidates = int((prediction[4:].max(0) >= args.conf).sum())
+        timer = StageTimer()
+        outputs = {}
+        cases = (["ultralytics"] if has_ultralytics else []) + ["referensi"] + [f"cepat@{k}" for k in args.max_per_class]
+        for _ in range(args.repeat):
+            outputs["referensi"] = timer.measure("referensi", reference, prediction, args.conf, args.iou,
+                                                 image.shape, gain, pad)
+            for k in args.max_per_class:
+                outputs[f"cepat@{k}"] = timer.measure(f"cepat@{k}", fast, prediction, args.conf, args.iou,
+                                                      image.shape, gain, pad, k)
+            if has_ultralytics:
+                outputs["ultralytics"] = timer.measure("ultralytics", ultralytics_path, prediction, args.conf,
+                                                       args.iou, image, gain, pad)
+        summary = timer.summary()
+        expected = len(outputs["referensi"])
+        for case in cases:
+            fast_case = case.startswith("cepat")
+            count = len(outputs[case].scores) if fast_case else len(outputs[case])
+            name, top_k = ("cepat", case.split("@")[1]) if fast_case else (case, "-")
+            matched = f"{match_rate(outputs['referensi'], outputs[case]):.1%}" if fast_case else "-"
+            print(f"{crowd:>6.0%} {candidates:>9} {name:<12} {top_k:>6} {count:>8} {count - expected:>+8} "
+                  f"{summary[case]['p50_ms']:>8.2f} {summary[case]['p95_ms']:>8.2f} {matched:>7}")
+
+
+def bench_model(args):
+    from ultralytics import YOLO
+
+    from benchmarks.bench_pipeline import extract_detections
+    from utils.postprocess import detect
+
+    net = YOLO(str(args.model))
+    timer = StageTimer()
+    for path in args.images:
+        image = cv2.imread(str(path))
+        for _ in range(args.repeat):
+            results = timer.measure("predict", net.predict, image, conf=args.conf, imgsz=args.imgsz, verbose=False)
+            timer.measure("extract", extract_detections, results)
+            timer.measure("detect", detect, net, image, args.conf, args.imgsz, args.iou,
+                          args.max_per_class[0])
+    print(f"\n{'tahap':<10} {'p50 ms':>8} {'p95 ms':>8}")
+    for stage, stats in timer.summary().items():
+        print(f"{stage:<10} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=IOU_THRESHOLD)
+    parser.add_argument("--max-per-class", type=int, nargs="+", default=[MAX_PER_CLASS],
+                        help="nilai top-k per kelas yang dibandingkan (kasus sintetis)")
+    parser.add_argument("--crowd", type=float, nargs="+", default=[0.1, 0.3, 0.6, 0.9],
+                        help="porsi frame yang tertutup retak buaya")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--model", type=Path, help=f"mis. {DEFAULT_MODEL.relative_to(ROOT)}")
+    parser.add_argument("--images", type=Path, nargs="*", default=[])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    bench_synthetic(args)
+    if args.model and args.images:
+        bench_model(args)
+    print(f"\nSelesai dalam {time.perf_counter() - start:.1f} detik")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark throughput gabungan saat banyak sesi menjalankan inferensi bersamaan.
+
+Setiap sesi adalah thread yang terus memanggil ``predict`` selama
+``--duration`` detik. Dua mode dibandingkan, masing-masing di subprocess
+baru karena jumlah thread PyTorch berlaku per proses:
+
+- ``default``: ``net.predict`` langsung dengan thread PyTorch bawaan;
+- ``scheduled``: lewat ``utils.cpu_scheduler`` (slot + thread intra-op).
+
+Dengan ``--mixed`` separuh sesi berprioritas realtime dan separuh video,
+dan fps per prioritas ikut dilaporkan.
+
+Contoh:
+    python benchmarks/bench_scheduler.py --sessions 1 2 4 8 16 --duration 20
+"""
+import argparse
+import json
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_MODEL = ROOT / "models" / "YOLOv8_Small_RDD.pt"
+
+
+def measure(mode, model_path, sessions, duration, imgsz, mixed):
+    """Dijalankan di subprocess: fps gabungan untuk satu mode dan jumlah sesi."""
+    from utils import cpu_scheduler
+    from utils.model_registry import get_model, warm_model
+
+    if mode == "scheduled":
+        slots, threads = cpu_scheduler.configure()
+        net = get_model(model_path, warm_sizes=[imgsz])
+    else:
+        import torch
+
+        slots, threads = sessions, torch.get_num_threads()
+        # Tanpa scheduler tiap sesi tetap butuh model sendiri supaya aman dipakai paralel.
+        # Dipanaskan langsung: get_model(warm_sizes=...) akan mengaktifkan scheduler.
+        models = [get_model(model_path, replica=i) for i in range(sessions)]
+        for model in models:
+            warm_model(model, [imgsz])
+    frame = np.random.default_rng(0).integers(0, 255, (imgsz, imgsz, 3), dtype=np.uint8)
+    priorities = [
+        cpu_scheduler.VIDEO if mixed and i % 2 else cpu_scheduler.REALTIME for i in range(sessions)
+    ]
+    frames = [0] * sessions
+    latencies = [[] for _ in range(sessions)]
+    stop = time.perf_counter() + duration
+
+    def session(i):
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            if mode == "scheduled":
+                cpu_scheduler.predict(net, frame, priorities[i], imgsz=imgsz, verbose=False)
+            else:
+                models[i].predict(frame, imgsz=imgsz, verbose=False)
+            latencies[i].append(time.perf_counter() - start)
+            frames[i] += 1
+
+    workers = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    result = {
+        "slots": slots,
+        "intraop_threads": threads,
+        "fps": sum(frames) / duration,
+        "p95_ms": float(np.percentile(np.concatenate([np.array(l) for l in latencies if l]), 95)) * 1000,
+    }
+    for priority, name in cpu_scheduler.PRIORITY_NAMES.items():
+        selected = [frames[i] for i in range(sessions) if priorities[i] == priority]
+        if mixed and selected:
+            result[f"fps_{name}"] = sum(selected) / duration
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=str(DEFAULT_MODEL))
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--modes", nargs="+", default=["default", "scheduled"], choices=["default", "scheduled"])
+    parser.add_argument("--mixed", action="store_true", help="separuh sesi realtime, separuh video")
+    parser.add_argument("--output", help="path file JSON hasil")
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "SESSIONS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        result = measure(args.measure[0], args.model, int(args.measure[1]), args.duration, args.imgsz, args.mixed)
+        print(json.dumps(result))
+        return
+
+    results = []
+    print(f"{'mode':<10} {'sesi':>5} {'slot':>5} {'thread':>7} {'fps':>8} {'p95 ms':>9}")
+    for mode in args.modes:
+        for sessions in args.sessions:
+            command = [sys.executable, __file__, "--model", args.model, "--duration", str(args.duration),
+                       "--imgsz", str(args.imgsz), "--measure", mode, str(sessions)]
+            if args.mixed:
+                command.append("--mixed")
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            result.update(mode=mode, sessions=sessions)
+            results.append(result)
+            extra = "".join(f"  {key}={value:.1f}" for key, value in result.items() if key.startswith("fps_"))
+            print(f"{mode:<10} {sessions:>5} {result['slots']:>5} {result['intraop_threads']:>7} "
+                  f"{result['fps']:>8.2f} {result['p95_ms']:>9.1f}{extra}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
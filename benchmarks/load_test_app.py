@@ -0,0 +1,530 @@
+"""Load test multi-pengguna untuk aplikasi Streamlit (login, halaman gambar, halaman video).
+
+Server ``streamlit run app.py`` dijalankan sebagai subprocess dengan database
+lokal pengganti (``benchmarks/localdb.py``, SQLite) sebagai ganti MySQL.
+Setiap pengguna simulasi adalah sesi websocket sungguhan, seperti browser:
+membuka aplikasi, login lewat form, membuka halaman, dan mengunggah media
+bawaan (``resource/`` dan ``input_temp.mp4``) lewat endpoint upload Streamlit.
+
+``AppTest`` tidak dipakai karena memakai runtime global per proses, sehingga
+tidak bisa menjalankan banyak sesi bersamaan di satu server.
+
+Untuk setiap jumlah pengguna dicatat:
+
+- latensi per interaksi (p50/p95/p99), dari pesan ``rerun`` sampai skrip selesai;
+- CPU (%) dan RSS (MB) proses server setiap ``--sample-interval`` detik;
+- titik jenuh: jumlah pengguna pertama ketika throughput berhenti naik
+  (< 10%) atau p95 suatu interaksi melebihi ``--slo-factor`` x p95 satu pengguna.
+
+Contoh:
+    python benchmarks/load_test_app.py run --users 1 2 4 8 --iterations 3 --output bench/load_app.json
+    python benchmarks/load_test_app.py compare bench/load_app_v1.json bench/load_app_v2.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_pipeline import DEFAULT_IMAGES, DEFAULT_VIDEO, environment_metadata, percentile  # noqa: E402
+
+DEFAULT_DB = ROOT / "bench" / "load_test_app.db"
+PASSWORD = "loadtest-password"
+SCENARIO = ("login", "image", "video")
+# Label widget dan judul halaman, sesuai app.py dan pages/
+USERNAME_LABEL = "👤 Username"
+PASSWORD_LABEL = "🔑 Password"
+LOGIN_BUTTON = "Login"
+IMAGE_PAGE = "Image_Detection"
+VIDEO_PAGE = "Video_Detection"
+IMAGE_UPLOADER = "Unggah Gambar Jalan"
+VIDEO_UPLOADER = "Unggah Video"
+CONTENT_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".mp4": "video/mp4"}
+
+
+# ===================== Server =====================
+
+def seed_users(db_path, count):
+    """Membuat pengguna ``loadtest_<i>`` di database pengganti."""
+    from benchmarks.localdb import LocalConnection
+    from utils.auth import hash_password
+
+    connection = LocalConnection(str(db_path))
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM users WHERE username LIKE 'loadtest_%'")
+        existing = cursor.fetchone()[0]
+        hashed = hash_password(PASSWORD)
+        cursor.executemany(
+            "INSERT INTO users (username, password) VALUES (%s, %s)",
+            [(f"loadtest_{i}", hashed) for i in range(existing, count)],
+        )
+    connection.commit()
+
+
+def serve(args):
+    """Dijalankan di subprocess: ``streamlit run app.py`` dengan MySQL diganti SQLite lokal."""
+    import pymysql
+
+    from benchmarks.localdb import LocalConnection
+
+    pymysql.connect = lambda **kwargs: LocalConnection(args.db, cursorclass=kwargs.get("cursorclass"))
+    # Inspektur simulasi mengulang interaksi jauh lebih cepat dari manusia; batas laju
+    # admission dilonggarkan supaya yang diukur adalah antrean dan inferensi, bukan penolakan.
+    # Batas bersamaan tetap bawaan. Override dari environment tetap didahulukan.
+    for kind in ("IMAGE", "VIDEO", "REALTIME"):
+        os.environ.setdefault(f"ROADGUARD_ADMISSION_{kind}_RATE", "100000")
+        os.environ.setdefault(f"ROADGUARD_ADMISSION_{kind}_BURST", "100000")
+        os.environ.setdefault(f"ROADGUARD_ADMISSION_{kind}_MAX_QUEUE", "10000")
+
+    from streamlit.web import cli
+
+    sys.argv = [
+        "streamlit", "run", str(ROOT / "app.py"),
+        "--server.port", str(args.port),
+        "--server.headless", "true",
+        "--browser.gatherUsageStats", "false",
+        # Tanpa referensi cache pesan: klien simulasi selalu menerima elemen lengkap
+        "--global.minCachedMessageSize", str(2**40),
+    ]
+    cli.main()
+
+
+def wait_healthy(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/_stcore/health", timeout=5) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+class ProcessSampler:
+    """Mencatat CPU (%) dan RSS (MB) proses server dari /proc."""
+
+    def __init__(self, pid, interval):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._ticks = os.sysconf("SC_CLK_TCK")
+
+    def _read(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / self._ticks
+        rss_mb = 0.0
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss_mb = int(line.split()[1]) / 1024
+        return cpu_seconds, rss_mb
+
+    async def run(self, stop):
+        start = time.monotonic()
+        last_time, (last_cpu, _) = start, self._read()
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            now = time.monotonic()
+            try:
+                cpu, rss = self._read()
+            except OSError:
+                break
+            self.samples.append({
+                "t": round(now - start, 2),
+                "cpu_percent": round((cpu - last_cpu) / max(now - last_time, 1e-6) * 100, 1),
+                "rss_mb": round(rss, 1),
+            })
+            last_time, last_cpu = now, cpu
+
+
+# ===================== Sesi Browser Simulasi =====================
+
+class ScriptError(Exception):
+    pass
+
+
+class StreamlitSession:
+    """Satu sesi websocket Streamlit yang dikendalikan seperti browser."""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session_id = None
+        self.pages = {}
+        self.page_hash = ""
+        self.widgets = {}
+        self.widget_states = {}
+        self.errors = []
+        self._ws = None
+        self._xsrf = None
+        self._finished = None
+        self._file_urls = {}
+        self._reader = None
+
+    async def connect(self):
+        from tornado.websocket import websocket_connect
+
+        ws_url = self.base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        self._ws = await websocket_connect(ws_url, max_message_size=2**30)
+        for cookie in self._ws.headers.get_list("Set-Cookie"):
+            if cookie.startswith("_xsrf="):
+                self._xsrf = cookie.split(";", 1)[0].split("=", 1)[1]
+        self._reader = asyncio.ensure_future(self._read_loop())
+
+    async def close(self):
+        if self._ws is not None:
+            self._ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+    async def _read_loop(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        while True:
+            payload = await self._ws.read_message()
+            if payload is None:
+                if self._finished is not None and not self._finished.done():
+                    self._finished.set_exception(ScriptError("koneksi websocket tertutup"))
+                return
+            msg = ForwardMsg()
+            msg.ParseFromString(payload)
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                self.session_id = msg.new_session.initialize.session_id
+                self.pages = {page.page_name: page.page_script_hash for page in msg.new_session.app_pages}
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                self._on_element(msg.delta.new_element)
+            elif kind == "script_finished":
+                status = ForwardMsg.ScriptFinishedStatus.Name(msg.script_finished)
+                if status != "FINISHED_EARLY_FOR_RERUN" and self._finished is not None and not self._finished.done():
+                    self._finished.set_result(status)
+            elif kind == "page_not_found":
+                self.errors.append(f"halaman tidak ditemukan: {msg.page_not_found.page_name}")
+            elif kind == "file_urls_response":
+                future = self._file_urls.pop(msg.file_urls_response.response_id, None)
+                if future is not None:
+                    future.set_result(msg.file_urls_response.file_urls[0])
+
+    def _on_element(self, element):
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            self.errors.append(f"{element.exception.type}: {element.exception.message}")
+        elif kind == "alert" and element.alert.format == element.alert.ERROR:
+            self.errors.append(element.alert.body)
+        elif kind == "alert" and element.alert.body.startswith("🚦"):
+            # Penolakan admission (admission.describe_rejection) bukan deteksi yang berhasil
+            self.errors.append(element.alert.body)
+        else:
+            widget = getattr(element, kind)
+            if hasattr(widget, "id") and hasattr(widget, "label") and widget.id:
+                self.widgets[widget.label] = widget.id
+
+    async def rerun(self, page=None, triggers=()):
+        """Menjalankan ulang skrip dengan state widget sekarang; mengembalikan durasi (detik)."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        msg = BackMsg()
+        if page is not None:
+            self.page_hash = self.pages[page]
+            self.widget_states.clear()
+        # Seperti browser, setiap rerun menyebut halaman yang sedang dibuka
+        msg.rerun_script.page_script_hash = self.page_hash
+        msg.rerun_script.widget_states.widgets.extend(self.widget_states.values())
+        for label in triggers:
+            msg.rerun_script.widget_states.widgets.append(WidgetState(id=self.widgets[label], trigger_value=True))
+
+        self.errors.clear()
+        self.widgets = {}
+        self._finished = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        await self._ws.write_message(msg.SerializeToString(), binary=True)
+        status = await asyncio.wait_for(self._finished, self.timeout)
+        elapsed = time.perf_counter() - start
+        if status != "FINISHED_SUCCESSFULLY":
+            raise ScriptError(status)
+        if self.errors:
+            raise ScriptError("; ".join(self.errors))
+        return elapsed
+
+    def set_text(self, label, value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        widget_id = self.widgets[label]
+        self.widget_states[widget_id] = WidgetState(id=widget_id, string_value=value)
+
+    async def upload(self, label, path):
+        """Mengunggah file ke ``st.file_uploader`` berlabel ``label`` (tanpa rerun)."""
+        from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.Common_pb2 import FileUploaderState
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        path = Path(path)
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._file_urls[request_id] = future
+        msg = BackMsg()
+        msg.file_urls_request.request_id = request_id
+        msg.file_urls_request.session_id = self.session_id
+        msg.file_urls_request.file_names.append(path.name)
+        await self._ws.write_message(msg.SerializeToString(), binary=True)
+        file_urls = await asyncio.wait_for(future, self.timeout)
+
+        data = path.read_bytes()
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{path.name}\"\r\n"
+            f"Content-Type: {CONTENT_TYPES.get(path.suffix.lower(), 'application/octet-stream')}\r\n\r\n"
+        ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        if self._xsrf:
+            headers.update({"Cookie": f"_xsrf={self._xsrf}", "X-Xsrftoken": self._xsrf})
+        await AsyncHTTPClient().fetch(HTTPRequest(
+            self.base_url + file_urls.upload_url, method="PUT", body=body, headers=headers,
+            request_timeout=self.timeout,
+        ))
+
+        widget_id = self.widgets[label]
+        state = FileUploaderState(max_file_id=0)
+        info = state.uploaded_file_info.add(name=path.name, size=len(data), file_id=file_urls.file_id)
+        info.file_urls.CopyFrom(file_urls)
+        self.widget_states[widget_id] = WidgetState(id=widget_id, file_uploader_state_value=state)
+
+
+# ===================== Skenario =====================
+
+async def simulate_user(base_url, index, args, record):
+    """Satu inspektur: login sekali, lalu ``--iterations`` kali halaman gambar dan video."""
+    await asyncio.sleep(random.uniform(0, args.ramp))
+    session = StreamlitSession(base_url, args.timeout)
+
+    async def step(name, action):
+        start = time.perf_counter()
+        try:
+            await action()
+            record(name, time.perf_counter() - start, None)
+        except (ScriptError, KeyError, asyncio.TimeoutError, OSError) as e:
+            record(name, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+            return False
+        return True
+
+    async def login():
+        session.set_text(USERNAME_LABEL, f"loadtest_{index}")
+        session.set_text(PASSWORD_LABEL, PASSWORD)
+        await session.rerun(triggers=[LOGIN_BUTTON])
+
+    async def detect_image():
+        await session.upload(IMAGE_UPLOADER, args.images[random.randrange(len(args.images))])
+        await session.rerun()
+
+    async def detect_video():
+        await session.upload(VIDEO_UPLOADER, args.video)
+        await session.rerun()
+
+    try:
+        await session.connect()
+        if not await step("open_app", session.rerun):
+            return
+        if "login" in args.scenario and not await step("login", login):
+            return
+        for _ in range(args.iterations):
+            if "image" in args.scenario:
+                if await step("open_image_page", lambda: session.rerun(page=IMAGE_PAGE)):
+                    await step("detect_image", detect_image)
+            if "video" in args.scenario:
+                if await step("open_video_page", lambda: session.rerun(page=VIDEO_PAGE)):
+                    await step("detect_video", detect_video)
+    finally:
+        await session.close()
+
+
+async def run_level(base_url, server_pid, users, args):
+    samples = {}
+    errors = []
+
+    def record(name, seconds, error):
+        if error is None:
+            samples.setdefault(name, []).append(seconds)
+        else:
+            errors.append({"interaction": name, "error": error})
+
+    sampler = ProcessSampler(server_pid, args.sample_interval)
+    stop = asyncio.Event()
+    sampling = asyncio.ensure_future(sampler.run(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(simulate_user(base_url, i, args, record) for i in range(users)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampling
+
+    interactions = {
+        name: {
+            "n": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+        for name, values in samples.items()
+    }
+    completed = sum(len(values) for values in samples.values())
+    cpu = [s["cpu_percent"] for s in sampler.samples] or [0.0]
+    rss = [s["rss_mb"] for s in sampler.samples] or [0.0]
+    return {
+        "users": users,
+        "seconds": elapsed,
+        "throughput": completed / elapsed,
+        "interactions": interactions,
+        "errors": errors,
+        "cpu_percent_mean": sum(cpu) / len(cpu),
+        "cpu_percent_max": max(cpu),
+        "rss_mb_max": max(rss),
+        "timeline": sampler.samples,
+    }
+
+
+def find_saturation(levels, slo_factor, min_gain=0.10):
+    """Jumlah pengguna pertama yang sudah jenuh, beserta alasannya; None bila belum jenuh."""
+    if not levels:
+        return None
+    baseline = levels[0]["interactions"]
+    for previous, level in zip([None] + levels[:-1], levels):
+        for name, stats in level["interactions"].items():
+            if name in baseline and stats["p95_ms"] > slo_factor * baseline[name]["p95_ms"]:
+                return {"users": level["users"],
+                        "reason": f"p95 {name} {stats['p95_ms']:.0f} ms > {slo_factor:g}x satu pengguna"}
+        if level["errors"]:
+            return {"users": level["users"], "reason": f"{len(level['errors'])} interaksi gagal"}
+        if previous is not None and level["throughput"] < previous["throughput"] * (1 + min_gain):
+            return {"users": level["users"],
+                    "reason": f"throughput {level['throughput']:.2f}/detik tidak naik dari {previous['throughput']:.2f}"}
+    return None
+
+
+def run(args):
+    base_url = f"http://127.0.0.1:{args.port}"
+    Path(args.db).parent.mkdir(parents=True, exist_ok=True)
+    seed_users(args.db, max(args.users))
+
+    command = [sys.executable, __file__, "serve", "--port", str(args.port), "--db", str(args.db)]
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL if not args.server_log else None,
+                              stderr=subprocess.STDOUT if not args.server_log else None)
+    try:
+        if not wait_healthy(base_url, args.wait):
+            sys.exit(f"Server Streamlit tidak siap dalam {args.wait:.0f} detik")
+        # Sesi pemanasan: model dimuat dan dipanaskan sebelum pengukuran
+        asyncio.run(run_level(base_url, server.pid, 1, argparse.Namespace(**{**vars(args), "iterations": 1})))
+
+        levels = []
+        print(f"{'pengguna':>8} {'interaksi/detik':>16} {'CPU % rata2':>12} {'RSS MB maks':>12} {'gagal':>6}  p95 per interaksi (ms)")
+        for users in args.users:
+            level = asyncio.run(run_level(base_url, server.pid, users, args))
+            levels.append(level)
+            p95 = "  ".join(f"{name}={stats['p95_ms']:.0f}" for name, stats in level["interactions"].items())
+            print(f"{users:>8} {level['throughput']:>16.2f} {level['cpu_percent_mean']:>12.0f} "
+                  f"{level['rss_mb_max']:>12.0f} {len(level['errors']):>6}  {p95}")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    saturation = find_saturation(levels, args.slo_factor)
+    if saturation:
+        print(f"\nTitik jenuh: {saturation['users']} pengguna ({saturation['reason']})")
+    else:
+        print(f"\nBelum jenuh sampai {args.users[-1]} pengguna")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "environment": environment_metadata(),
+                "config": {"scenario": args.scenario, "iterations": args.iterations, "images": args.images,
+                           "video": args.video, "slo_factor": args.slo_factor},
+                "levels": levels,
+                "saturation": saturation,
+            }, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    base_levels = {level["users"]: level for level in baseline["levels"]}
+    regressions = []
+    print(f"{'pengguna':>8} {'interaksi':<16} {'baseline ms':>12} {'kandidat ms':>12} {'perubahan':>10}")
+    for level in candidate["levels"]:
+        base = base_levels.get(level["users"])
+        if base is None:
+            continue
+        for name, stats in level["interactions"].items():
+            if name not in base["interactions"]:
+                continue
+            before, after = base["interactions"][name]["p95_ms"], stats["p95_ms"]
+            change = (after - before) / before if before else 0.0
+            flag = "  REGRESI" if change > args.threshold else ""
+            print(f"{level['users']:>8} {name:<16} {before:>12.0f} {after:>12.0f} {change:>+10.1%}{flag}")
+            if flag:
+                regressions.append((level["users"], name))
+
+    def users_at(result):
+        return result["saturation"]["users"] if result.get("saturation") else None
+
+    print(f"\nTitik jenuh: baseline {users_at(baseline)}, kandidat {users_at(candidate)} pengguna")
+    if regressions:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="jalankan load test")
+    run_parser.add_argument("--users", nargs="+", type=int, default=[1, 2, 4, 8])
+    run_parser.add_argument("--iterations", type=int, default=2, help="putaran halaman per pengguna")
+    run_parser.add_argument("--scenario", nargs="+", default=list(SCENARIO), choices=SCENARIO)
+    run_parser.add_argument("--images", nargs="+", default=[str(p) for p in DEFAULT_IMAGES])
+    run_parser.add_argument("--video", default=str(DEFAULT_VIDEO))
+    run_parser.add_argument("--port", type=int, default=8599)
+    run_parser.add_argument("--db", default=str(DEFAULT_DB))
+    run_parser.add_argument("--ramp", type=float, default=2.0, help="sebaran waktu mulai pengguna (detik)")
+    run_parser.add_argument("--timeout", type=float, default=600, help="batas waktu satu interaksi (detik)")
+    run_parser.add_argument("--sample-interval", type=float, default=0.5)
+    run_parser.add_argument("--slo-factor", type=float, default=3.0)
+    run_parser.add_argument("--wait", type=float, default=120, help="detik menunggu server siap")
+    run_parser.add_argument("--server-log", action="store_true", help="tampilkan log server")
+    run_parser.add_argument("--output", help="path file JSON hasil")
+
+    compare_parser = sub.add_parser("compare", help="bandingkan dua hasil load test")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="batas regresi relatif p95")
+
+    serve_parser = sub.add_parser("serve", help=argparse.SUPPRESS)
+    serve_parser.add_argument("--port", type=int, required=True)
+    serve_parser.add_argument("--db", required=True)
+
+    args = parser.parse_args()
+    {"run": run, "compare": compare, "serve": serve}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
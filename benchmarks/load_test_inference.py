@@ -0,0 +1,126 @@
+"""Load test layanan ``services/inference_server.py``.
+
+Mengirim request ``/detect`` dari N klien bersamaan untuk setiap tingkat
+konkurensi, lalu melaporkan throughput dan latensi p50/p95/p99.
+
+Contoh:
+    python benchmarks/load_test_inference.py --url http://localhost:8080 --concurrency 1 2 4 8 16 --requests 200
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_pipeline import DEFAULT_IMAGES, percentile  # noqa: E402
+
+CONTENT_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+
+def wait_ready(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/readyz", timeout=5) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def send(url, image, conf):
+    data, content_type = image
+    request = urllib.request.Request(
+        f"{url}/detect?conf={conf}", data=data, headers={"Content-Type": content_type}, method="POST"
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            json.loads(response.read())
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def run_level(url, images, concurrency, requests, conf):
+    # Gambar dibagi bergiliran ke semua klien
+    cycle = itertools.cycle(images)
+    lock = threading.Lock()
+
+    def next_image():
+        with lock:
+            return next(cycle)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda _: send(url, next_image(), conf), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, ok in outcomes if ok]
+    errors = len(outcomes) - len(latencies)
+    if not latencies:
+        return {"concurrency": concurrency, "errors": errors}
+    return {
+        "concurrency": concurrency,
+        "requests": len(outcomes),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--images", nargs="+", default=[str(p) for p in DEFAULT_IMAGES])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=100, help="jumlah request per tingkat konkurensi")
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--wait", type=float, default=120, help="detik menunggu /readyz")
+    parser.add_argument("--output", help="path file JSON hasil")
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/")
+    if not wait_ready(url, args.wait):
+        sys.exit(f"{url}/readyz tidak siap dalam {args.wait:.0f} detik")
+
+    images = [
+        (Path(path).read_bytes(), CONTENT_TYPES.get(Path(path).suffix.lower(), "application/octet-stream"))
+        for path in args.images
+    ]
+    # Satu putaran pemanasan supaya koneksi dan cache server sudah hangat
+    run_level(url, images, 1, min(5, args.requests), args.conf)
+
+    print(f"{'klien':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'error':>6}")
+    levels = []
+    for concurrency in args.concurrency:
+        level = run_level(url, images, concurrency, args.requests, args.conf)
+        levels.append(level)
+        if "p50_ms" not in level:
+            print(f"{concurrency:>6} {'-':>8} {'-':>9} {'-':>9} {'-':>9} {level['errors']:>6}")
+            continue
+        print(f"{concurrency:>6} {level['throughput_rps']:>8.2f} {level['p50_ms']:>9.1f} "
+              f"{level['p95_ms']:>9.1f} {level['p99_ms']:>9.1f} {level['errors']:>6}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"url": url, "images": args.images, "levels": levels}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
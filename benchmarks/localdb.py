@@ -0,0 +1,133 @@
+"""Pengganti database MySQL berbasis SQLite untuk benchmark dan uji beban.
+
+Meniru bagian API PyMySQL yang dipakai aplikasi: placeholder ``%s``,
+``cursor()`` sebagai context manager, ``lastrowid``, ``executemany``,
+``commit``/``rollback``, serta ``DictCursor`` bila diminta.
+"""
+import sqlite3
+
+from utils import geo
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    photo BLOB
+);
+CREATE TABLE IF NOT EXISTS reports (
+    report_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    road_name TEXT,
+    report_description TEXT,
+    pothole_severity TEXT,
+    upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    image_name TEXT,
+    video_name TEXT,
+    annotated_image BLOB,
+    latitude REAL,
+    longitude REAL,
+    geohash TEXT
+);
+CREATE TABLE IF NOT EXISTS detections (
+    detection_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_id INTEGER REFERENCES reports(report_id),
+    class_label TEXT,
+    confidence REAL,
+    x INTEGER,
+    y INTEGER,
+    width INTEGER,
+    height INTEGER,
+    frame_index INTEGER,
+    latitude REAL,
+    longitude REAL,
+    geohash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reports_geohash ON reports (geohash);
+CREATE INDEX IF NOT EXISTS idx_detections_geohash ON detections (geohash);
+CREATE INDEX IF NOT EXISTS idx_detections_report ON detections (report_id);
+"""
+
+
+class LocalCursor:
+    def __init__(self, cursor, dict_rows=False):
+        self._cursor = cursor
+        self._dict_rows = dict_rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+    @staticmethod
+    def _sql(sql):
+        return sql.replace("%s", "?")
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(self._sql(sql), tuple(params or ()))
+        return self._cursor.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        if not seq_of_params:
+            return 0
+        self._cursor.executemany(self._sql(sql), seq_of_params)
+        return self._cursor.rowcount
+
+    def _row(self, row):
+        if row is None or not self._dict_rows:
+            return row
+        return {col[0]: value for col, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+class LocalConnection:
+    """Koneksi SQLite dengan antarmuka mirip PyMySQL."""
+
+    def __init__(self, path=":memory:", cursorclass=None):
+        # cursorclass bawaan seperti argumen pymysql.connect(cursorclass=...)
+        self._cursorclass = cursorclass
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.create_function("LEFT", 2, lambda value, n: None if value is None else value[:n])
+        self._db.executescript(SCHEMA)
+        # Skema lokal sudah memuat kolom geo, migrasi information_schema tidak diperlukan
+        geo._schema_ready = True
+
+    def cursor(self, cursorclass=None):
+        cursorclass = cursorclass or self._cursorclass
+        # SSCursor cukup dengan cursor SQLite biasa, yang memang membaca baris secara bertahap
+        dict_rows = cursorclass is not None and "Dict" in cursorclass.__name__
+        return LocalCursor(self._db.cursor(), dict_rows=dict_rows)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
@@ -4,8 +4,15 @@ import pandas as pd
 from PIL import Image
 import base64
 import io
+import os
+import shutil
+import tempfile
 import altair as alt
-import bcrypt
+import numpy as np
+
+from utils import archive, crop_store, export, write_behind
+from utils.auth import hash_password, is_logged_in
+from utils.geo import cluster_detections
 
 
 # Fungsi untuk membuat koneksi ke database MySQL
@@ -33,6 +40,9 @@ def get_stats():
                 total_detections = cursor.fetchone()[0]
 
             connection.close()
+            # Data lama ada di arsip bulanan; jumlahnya dibaca dari metadata Parquet
+            total_reports += archive.count_rows("reports")
+            total_detections += archive.count_rows("detections")
             return total_reports, total_users, total_detections
 
         except pymysql.MySQLError as e:
@@ -93,10 +103,14 @@ def delete_report(report_id):
                 
                 # Hapus laporan di tabel reports
                 delete_report_query = "DELETE FROM reports WHERE report_id = %s"
-                cursor.execute(delete_report_query, (report_id,))
+                deleted = cursor.execute(delete_report_query, (report_id,))
                 
                 connection.commit()
+            # Laporan yang sudah dipindah ke arsip dihapus dari file Parquet-nya
+            if deleted or archive.delete_report(report_id):
                 st.success("Laporan dan data terkait berhasil dihapus!")
+            else:
+                st.warning("Laporan dengan ID ini tidak ditemukan.")
         except pymysql.MySQLError as e:
             st.error(f"Gagal menghapus laporan: {e}")
         finally:
@@ -131,7 +145,7 @@ def create_user(username, password, photo):
         try:
             with connection.cursor() as cursor:
                 query = "INSERT INTO users (username, password, photo) VALUES (%s, %s, %s)"
-                cursor.execute(query, (username, password, photo))
+                cursor.execute(query, (username, hash_password(password), photo))
                 connection.commit()
                 st.success("Pengguna berhasil ditambahkan!")
         except pymysql.MySQLError as e:
@@ -145,7 +159,7 @@ def update_user(user_id, username, password, photo):
         st.error("ID pengguna tidak boleh kosong.")
         return
 
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())  # Hashing password
+    hashed_password = hash_password(password)  # Hashing password
 
     connection = create_connection()
     if connection:
@@ -298,6 +312,13 @@ def get_report_by_id(report_id):
                 cursor.execute(query, (report_id,))
                 result = cursor.fetchone()
                 connection.close()
+                if result is None:
+                    report = archive.get_report(report_id)
+                    if report is not None:
+                        result = tuple(report[column] for column in (
+                            "report_id", "road_name", "report_description", "pothole_severity",
+                            "upload_time", "image_name", "video_name", "annotated_image",
+                        ))
                 return result
         except pymysql.MySQLError as e:
             st.error(f"Gagal mengambil data: {e}")
@@ -339,7 +360,7 @@ def main():
     st.title("📊 Dashboard Monitoring Laporan Road Guard")
 
     # Cek apakah pengguna sudah login
-if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
+if not is_logged_in(st.session_state):
     st.error("Silakan login terlebih dahulu!")
     st.stop()  # Hentikan eksekusi jika belum login
 
@@ -404,7 +425,16 @@ def get_all_reports():
                 result = cursor.fetchall()
                 connection.close()
                 # Convert result to DataFrame
-                return pd.DataFrame(result, columns=["Report ID", "Road Name", "Description", "Severity", "Upload Time"])
+                columns = ["Report ID", "Road Name", "Description", "Severity", "Upload Time"]
+                hot = pd.DataFrame(result, columns=columns)
+                # Kolom arsip di-cache per file, jadi render berikutnya tidak membaca ulang arsip
+                archived = archive.cached_table(
+                    "reports", ["report_id", "road_name", "report_description", "pothole_severity", "upload_time"]
+                ).to_pandas()
+                if archived.empty:
+                    return hot
+                archived.columns = columns
+                return pd.concat([archived, hot], ignore_index=True)
         except pymysql.MySQLError as e:
             st.error(f"Error saat mengambil data: {e}")
             connection.close()
@@ -425,7 +455,10 @@ def get_damage_data():
                 cursor.execute(query)
                 result = cursor.fetchall()
                 connection.close()
-                return pd.DataFrame(result, columns=["Severity", "Count"])
+                counts = archive.severity_counts()
+                for severity, count in result:
+                    counts[severity] += count
+                return pd.DataFrame(list(counts.items()), columns=["Severity", "Count"])
         except pymysql.MySQLError as e:
             st.error(f"Gagal mengambil data kerusakan: {e}")
             connection.close()
@@ -454,6 +487,179 @@ def visualize_damage_data():
     else:
         st.warning("Tidak ada data kerusakan untuk divisualisasikan.")
 
+# Fungsi untuk menampilkan agregasi kerusakan per area
+def visualize_damage_per_area():
+    st.subheader("🗺️ Kerusakan per Area")
+    zoom = st.slider("Level Zoom Area", min_value=2, max_value=18, value=12,
+                     help="Semakin besar zoom, semakin kecil area pengelompokan deteksi.")
+
+    bbox = None
+    with st.expander("Filter Area (Bounding Box)"):
+        use_bbox = st.checkbox("Batasi ke area tertentu")
+        col1, col2 = st.columns(2)
+        min_lat = col1.number_input("Lintang Min", -90.0, 90.0, -11.0, format="%.6f")
+        max_lat = col1.number_input("Lintang Maks", -90.0, 90.0, 6.0, format="%.6f")
+        min_lon = col2.number_input("Bujur Min", -180.0, 180.0, 95.0, format="%.6f")
+        max_lon = col2.number_input("Bujur Maks", -180.0, 180.0, 141.0, format="%.6f")
+        if use_bbox:
+            bbox = (min_lat, min_lon, max_lat, max_lon)
+
+    connection = create_connection()
+    try:
+        clusters = list(cluster_detections(connection, zoom, bbox)) + archive.cluster_detections(zoom, bbox)
+    except pymysql.MySQLError as e:
+        st.error(f"Gagal mengambil data area: {e}")
+        return
+    finally:
+        connection.close()
+
+    if not clusters:
+        st.warning("Belum ada deteksi dengan koordinat.")
+        return
+
+    # Satu baris per sel area, kolom per jenis kerusakan
+    area_data = pd.DataFrame(clusters)
+    area_data["lat_sum"] = area_data["latitude"] * area_data["count"]
+    area_data["lon_sum"] = area_data["longitude"] * area_data["count"]
+    per_area = area_data.groupby("cell").agg(
+        total=("count", "sum"), lat_sum=("lat_sum", "sum"), lon_sum=("lon_sum", "sum")
+    )
+    per_area["latitude"] = per_area["lat_sum"] / per_area["total"]
+    per_area["longitude"] = per_area["lon_sum"] / per_area["total"]
+    per_class = area_data.pivot_table(
+        index="cell", columns="class_label", values="count", aggfunc="sum", fill_value=0
+    )
+    table = per_area[["latitude", "longitude", "total"]].join(per_class).sort_values("total", ascending=False)
+
+    st.map(table[["latitude", "longitude"]])
+    st.dataframe(table)
+
+
+# Label kelas yang pernah tersimpan, untuk pilihan filter ekspor
+@st.cache_data(ttl=600)
+def get_class_labels():
+    connection = create_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT DISTINCT class_label FROM detections")
+            return sorted(row[0] for row in cursor.fetchall() if row[0])
+    except pymysql.MySQLError:
+        return []
+    finally:
+        connection.close()
+
+
+# Fungsi untuk ekspor laporan + deteksi ke CSV/Parquet
+def export_ui():
+    st.subheader("⬇️ Ekspor Laporan dan Deteksi")
+    with st.form("ekspor_form"):
+        col1, col2, col3 = st.columns(3)
+        dates = col1.date_input("Rentang Tanggal Unggah", value=())
+        severities = col2.multiselect("Tingkat Kerusakan", ["Ringan", "Sedang", "Berat"])
+        classes = col3.multiselect("Kelas Kerusakan", get_class_labels())
+        fmt = col1.radio("Format", export.FORMATS, horizontal=True)
+        server_name = ""
+        if export.EXPORT_DIR:
+            server_name = col2.text_input(f"Simpan ke {export.EXPORT_DIR} di server (opsional)",
+                                          help="Nama file saja. Kosongkan untuk mengunduh lewat browser.")
+        st.caption(f"Unduhan lewat browser maksimal {export.BROWSER_MAX_BYTES / 2**20:,.0f} MB. "
+                   "Ekspor yang lebih besar " + (f"disimpan ke {export.EXPORT_DIR} di server."
+                                                 if export.EXPORT_DIR else "harus lewat `python -m utils.export`."))
+        submit = st.form_submit_button("Ekspor")
+
+    if not submit:
+        return
+    start_date = dates[0] if len(dates) > 0 else None
+    end_date = dates[1] if len(dates) > 1 else start_date
+    path = None
+    if server_name:
+        try:
+            path = export.server_export_path(server_name, fmt)
+        except ValueError as e:
+            st.error(str(e))
+            return
+
+    connection = create_connection()
+    try:
+        if not server_name:
+            # File sementara per permintaan supaya ekspor sesi lain tidak saling menimpa
+            handle, path = tempfile.mkstemp(prefix="roadguard_export_", suffix=f".{fmt}")
+            os.close(handle)
+        with st.spinner("Mengekspor..."), open(path, "wb") as output:
+            rows, seconds = export.export(connection, output, fmt, start_date=start_date, end_date=end_date,
+                                          severities=severities, classes=classes)
+        if not server_name:
+            size = os.path.getsize(path)
+            if size <= export.BROWSER_MAX_BYTES:
+                with open(path, "rb") as f:
+                    data = f.read()
+            elif export.EXPORT_DIR:
+                # Terlalu besar untuk ditahan di memori sesi: pindahkan ke direktori ekspor server
+                target = export.server_export_path(os.path.basename(path), fmt)
+                shutil.move(path, target)
+                server_name, path = os.path.basename(target), target
+            else:
+                st.error(f"Hasil ekspor {size / 2**20:,.0f} MB melebihi batas unduhan browser "
+                         f"{export.BROWSER_MAX_BYTES / 2**20:,.0f} MB. Persempit filter, atau jalankan "
+                         "`python -m utils.export` di server.")
+                return
+    except (pymysql.MySQLError, OSError) as e:
+        st.error(f"Gagal mengekspor data: {e}")
+        return
+    finally:
+        connection.close()
+        if not server_name and path and os.path.exists(path):
+            # Isi file sudah diserahkan ke download_button, file sementara tidak diperlukan lagi
+            os.remove(path)
+
+    st.success(f"{rows:,} baris diekspor dalam {seconds:.1f} detik ({rows / max(seconds, 1e-9):,.0f} baris/detik).")
+    if server_name:
+        st.info(f"File disimpan di {path}")
+    else:
+        st.download_button("⬇️ Unduh Ekspor", data=data, file_name=f"roadguard_export.{fmt}",
+                           mime="text/csv" if fmt == "csv" else "application/octet-stream")
+
+# Galeri crop kerusakan dari file pack, tanpa decode video/gambar penuh
+GALLERY_COLUMNS = 6
+GALLERY_PAGE_SIZE = 48
+
+
+def crop_caption(record, report_ids):
+    caption = f"{record['label'].decode(errors='ignore')} {record['score']:.2f}"
+    if record["frame"] >= 0:
+        caption += f" · frame {record['frame']}"
+    # ID laporan dicatat permanen di crop store saat commit; jurnal write-behind hanya cadangan
+    report_id = report_ids.get(record["source"])
+    if report_id is None:
+        report_id = write_behind.status(record["source"].decode(errors="ignore"))["report_id"]
+    if report_id:
+        caption += f" · laporan #{report_id}"
+    return caption + f" · {record['name'].decode(errors='ignore')}"
+
+
+def crop_gallery():
+    st.subheader("🖼️ Galeri Kerusakan")
+    store = crop_store.get_store()
+    index = store.index()
+    if not len(index):
+        st.info("Belum ada crop kerusakan yang tersimpan.")
+        return
+    labels = [label.decode(errors="ignore") for label in np.unique(index["label"])]
+    col1, col2, col3 = st.columns(3)
+    selected = col1.multiselect("Kelas", labels, key="gallery_labels")
+    min_score = col2.slider("Skor Minimum", 0.0, 1.0, 0.5, 0.05, key="gallery_min_score")
+    records = store.select(selected, min_score)
+    page_count = max(1, -(-len(records) // GALLERY_PAGE_SIZE))
+    page = col3.number_input("Halaman Galeri", min_value=1, max_value=page_count, value=1, step=1) - 1
+    page_records = records[page * GALLERY_PAGE_SIZE:(page + 1) * GALLERY_PAGE_SIZE]
+    crops = store.read(page_records)
+    report_ids = store.report_ids()
+    st.caption(f"{len(records):,} dari {len(index):,} crop, terbaru lebih dulu.")
+    for row_start in range(0, len(page_records), GALLERY_COLUMNS):
+        row = slice(row_start, row_start + GALLERY_COLUMNS)
+        for column, record, jpeg in zip(st.columns(GALLERY_COLUMNS), page_records[row], crops[row]):
+            column.image(jpeg, caption=crop_caption(record, report_ids), use_column_width=True)
+
 # Tambahkan visualisasi ke dashboard
 if __name__ == '__main__':
     main()
@@ -471,6 +677,18 @@ if __name__ == '__main__':
 
     st.markdown("---")
 
+    visualize_damage_per_area()
+
+    st.markdown("---")
+
+    export_ui()
+
+    st.markdown("---")
+
+    crop_gallery()
+
+    st.markdown("---")
+
     # Tampilkan laporan berdasarkan ID terlebih dahulu
     show_report_by_id()
 
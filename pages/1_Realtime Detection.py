@@ -1,19 +1,19 @@
 import logging
-import queue
+import time
 from pathlib import Path
-from typing import List, NamedTuple
 
 import av
 import cv2
-import numpy as np
 import streamlit as st
 from streamlit_webrtc import WebRtcMode, webrtc_streamer
 
-# Deep learning framework
-from ultralytics import YOLO
-
-from sample_utils.download import download_file
 from sample_utils.get_STUNServer import getSTUNServer
+from utils import admission, cpu_scheduler, metrics
+from utils.auth import is_logged_in
+from utils.model_registry import CLASSES, render_model_selector
+from utils.realtime_stats import ResultsAggregator
+from utils.roi import render_roi_selector
+from utils.video_render import draw_detections
 
 
 
@@ -26,43 +26,23 @@ st.set_page_config(
 )
 
 # Cek apakah pengguna sudah login
-if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
+if not is_logged_in(st.session_state):
     st.error("Silakan login terlebih dahulu!")
     st.stop()  # Hentikan eksekusi jika belum login
+username = st.session_state["username"]
     
 # Paths dan Setup Model
 HERE = Path(__file__).parent
 ROOT = HERE.parent
 logger = logging.getLogger(__name__)
 
-MODEL_URL = "https://github.com/oracl4/RoadDamageDetection/raw/main/models/YOLOv8_Small_RDD.pt"  # noqa: E501
-MODEL_LOCAL_PATH = ROOT / "./models/YOLOv8_Small_RDD.pt"
-download_file(MODEL_URL, MODEL_LOCAL_PATH, expected_size=89569358)
-
 # STUN Server
 STUN_STRING = "stun:" + str(getSTUNServer())
 STUN_SERVER = [{"urls": [STUN_STRING]}]
 
-# Caching Model
-cache_key = "yolov8smallrdd"
-if cache_key in st.session_state:
-    net = st.session_state[cache_key]
-else:
-    net = YOLO(MODEL_LOCAL_PATH)
-    st.session_state[cache_key] = net
-
-CLASSES = [
-    "Longitudinal Crack",
-    "Transverse Crack",
-    "Alligator Crack",
-    "Potholes",
-]
-
-class Detection(NamedTuple):
-    class_id: int
-    label: str
-    score: float
-    box: np.ndarray
+# Model dipilih dari manifest sesuai anggaran latensi, dipakai bersama antar sesi
+model_choice, net = render_model_selector("realtime")
+imgsz = model_choice.imgsz
 
 # Header
 # st.image("./resource/banner2.png", use_column_width="always")  # banner2 yang menarik
@@ -94,6 +74,10 @@ st.sidebar.write(
     """
 )
 
+roi_profile = render_roi_selector("realtime")
+
+metrics.render_debug_panel()
+
 st.markdown(
     """
     ### 🎥 Fitur Realtime Deteksi
@@ -103,31 +87,68 @@ st.markdown(
     """
 )
 
-# Queue untuk prediksi hasil
-result_queue: "queue.Queue[List[Detection]]" = queue.Queue()
+# Ringkasan hasil deteksi per sesi; callback hanya menambah, UI membaca snapshot per rerun
+if "realtime_aggregator" not in st.session_state:
+    st.session_state.realtime_aggregator = ResultsAggregator(CLASSES)
+aggregator = st.session_state.realtime_aggregator
+
+# Tiket admission stream ini; diisi skrip saat stream mulai, dibaca callback per frame
+admission_state = st.session_state.setdefault("realtime_admission", {"ticket": None, "message": None})
+
+
+def queue_overlay(image, text):
+    # Stream tetap hidup selama antre, hanya tanpa inferensi
+    cv2.putText(image, text, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 4, cv2.LINE_AA)
+    cv2.putText(image, text, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+    return av.VideoFrame.from_ndarray(image, format="bgr24")
+
 
 def video_frame_callback(frame: av.VideoFrame) -> av.VideoFrame:
-    image = frame.to_ndarray(format="bgr24")
+    ticket = admission_state["ticket"]
+    if ticket is not None and ticket.revoked:
+        # Lease dicabut karena callback sempat macet > LEASE_SECONDS: antre ulang dengan tiket baru
+        try:
+            ticket = admission.get_controller().request(username, admission.REALTIME)
+            admission_state["message"] = None
+        except admission.Rejected as e:
+            ticket = None
+            admission_state["message"] = str(e)
+        admission_state["ticket"] = ticket
+    if ticket is None or not ticket.admitted.is_set():
+        image = frame.to_ndarray(format="bgr24")
+        if ticket is None:
+            return queue_overlay(image, admission_state["message"] or "Menunggu izin deteksi...")
+        ticket.touch()
+        position, eta = admission.get_controller().position(ticket)
+        return queue_overlay(image, f"Antrean deteksi: posisi {position}, sekitar {max(eta, 1):.0f} detik")
+    ticket.touch()
+
+    with metrics.timer("realtime.decode"):
+        image = frame.to_ndarray(format="bgr24")
     h_ori, w_ori = image.shape[:2]
-    image_resized = cv2.resize(image, (640, 640), interpolation=cv2.INTER_AREA)
-    results = net.predict(image_resized, conf=score_threshold)
-    
-    for result in results:
-        boxes = result.boxes.cpu().numpy()
-        detections = [
-            Detection(
-                class_id=int(_box.cls),
-                label=CLASSES[int(_box.cls)],
-                score=float(_box.conf),
-                box=_box.xyxy[0].astype(int),
-            )
-            for _box in boxes
-        ]
-        result_queue.put(detections)
-    
-    annotated_frame = results[0].plot()
-    _image = cv2.resize(annotated_frame, (w_ori, h_ori), interpolation=cv2.INTER_AREA)
-    return av.VideoFrame.from_ndarray(_image, format="bgr24")
+    with metrics.timer("realtime.preprocess"):
+        # Hanya area jalan yang diinferensi; letterbox ke imgsz dilakukan di utils.postprocess
+        roi = roi_profile.layout(w_ori, h_ori)
+        crop = roi.crop(image)
+    with metrics.timer("realtime.inference"):
+        # Jalur cepat: ambang batas dan top-k per kelas sebelum NMS, hasil berupa array
+        detections = cpu_scheduler.detect(net, crop, cpu_scheduler.REALTIME, conf=score_threshold, imgsz=imgsz)
+
+    with metrics.timer("realtime.extract"):
+        # Deteksi di luar poligon jalan dibuang sebelum dicatat dan digambar
+        detections = detections.select(roi.keep(detections.boxes))
+        frame_boxes = roi.to_frame(detections.boxes)
+        aggregator.add(detections.class_ids, detections.scores, frame_boxes)
+        metrics.count("realtime.detections", len(detections.scores))
+
+    with metrics.timer("realtime.annotate"):
+        _image = draw_detections(image.copy(), detections.class_ids, detections.scores,
+                                 frame_boxes.astype(int), CLASSES)
+        roi.outline(_image)
+    with metrics.timer("realtime.encode"):
+        output_frame = av.VideoFrame.from_ndarray(_image, format="bgr24")
+    metrics.count("realtime.frames")
+    return output_frame
 
 webrtc_ctx = webrtc_streamer(
     key="road-damage-detection",
@@ -141,13 +162,52 @@ webrtc_ctx = webrtc_streamer(
     async_processing=True,
 )
 
+# Slot realtime dipegang selama stream berjalan dan dilepas saat stream berhenti;
+# tab yang ditutup tanpa menghentikan stream dilepas otomatis setelah LEASE_SECONDS
+if webrtc_ctx.state.playing and admission_state["ticket"] is None:
+    try:
+        admission_state["ticket"] = admission.get_controller().request(username, admission.REALTIME)
+        admission_state["message"] = None
+    except admission.Rejected as e:
+        admission_state["message"] = str(e)
+        st.warning(admission.describe_rejection(e))
+elif not webrtc_ctx.state.playing and admission_state["ticket"] is not None:
+    admission.get_controller().release(admission_state["ticket"])
+    admission_state["ticket"] = None
+if admission_state["ticket"] is not None and not admission_state["ticket"].admitted.is_set():
+    position, eta = admission.get_controller().position(admission_state["ticket"])
+    st.info(f"⏳ Slot deteksi realtime penuh: posisi {position} dalam antrean, perkiraan {max(eta, 1):.0f} detik. "
+            "Deteksi dimulai otomatis.")
+
 # Tabel Prediksi
+# Tabel diperbarui berkala oleh loop di akhir skrip. Loop dibatasi waktunya, dan interaksi apa pun
+# memicu rerun yang langsung menghentikannya, jadi halaman tetap responsif.
+TABLE_REFRESH_SECONDS = 1.0
+TABLE_REFRESH_MAX_SECONDS = 15 * 60
+
+
+def render_results_summary(placeholder):
+    summary = aggregator.snapshot()
+    with placeholder.container():
+        col1, col2, col3 = st.columns(3)
+        col1.metric("FPS", f"{summary['fps']:.1f}")
+        col2.metric(f"Frame ({aggregator.window:.0f} detik terakhir)", summary["frames"])
+        col3.metric("Deteksi", summary["detections"])
+        st.dataframe(
+            {"Kelas": list(summary["counts"]), "Jumlah": list(summary["counts"].values())},
+            hide_index=True,
+        )
+        st.write("Deteksi terbaru:")
+        st.dataframe(summary["recent"], hide_index=True)
+
+
+summary_placeholder = None
 if st.checkbox("📝 Tampilkan Tabel Prediksi"):
     if webrtc_ctx.state.playing:
-        labels_placeholder = st.empty()
-        while True:
-            result = result_queue.get()
-            labels_placeholder.table(result)
+        summary_placeholder = st.empty()
+        render_results_summary(summary_placeholder)
+    else:
+        aggregator.clear()
 
 st.divider()
 
@@ -169,3 +229,11 @@ st.markdown(
     """,
     unsafe_allow_html=True,
 )
+
+# Refresh berkala paling akhir: semua elemen halaman sudah dirender sebelum loop dimulai
+if summary_placeholder is not None:
+    refresh_until = time.monotonic() + TABLE_REFRESH_MAX_SECONDS
+    while time.monotonic() < refresh_until:
+        time.sleep(TABLE_REFRESH_SECONDS)
+        render_results_summary(summary_placeholder)
+    st.caption("Pembaruan otomatis tabel berhenti; muat ulang halaman untuk melanjutkan.")
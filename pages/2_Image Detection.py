@@ -1,13 +1,16 @@
-import os
 import cv2
-import numpy as np
 import streamlit as st
 import pymysql
-from ultralytics import YOLO
 from PIL import Image
 from io import BytesIO
 import pandas as pd
 
+from utils import admission, cpu_scheduler, crop_store, metrics, write_behind
+from utils.auth import is_logged_in
+from utils.batch_detection import BATCH_SIZE, run_batch
+from utils.image_decode import decode_image
+from utils.model_registry import render_model_selector
+
 # ===================== Fungsi untuk Koneksi ke Database =====================
 
 def connect_db():
@@ -51,51 +54,29 @@ def get_stats():
             return 0, 0, 0
 
 
-# ===================== Fungsi untuk Memuat Model YOLO =====================
-
-def load_model(model_path, model_url):
-    """Memuat model YOLO dari path lokal atau mengunduhnya jika belum ada."""
-    if not os.path.exists(model_path):
-        from urllib.request import urlretrieve
-        urlretrieve(model_url, model_path)
-    return YOLO(model_path)
+# ===================== Fungsi untuk Menyimpan Laporan ke Database =====================
 
+def detection_rows_for(detections, location=None):
+    """Baris deteksi untuk ``save_report``; semua deteksi memakai koordinat gambarnya."""
+    lat, lon = location if location else (None, None)
+    return [
+        (detection["name"], detection["confidence"], *detection["box"], None, lat, lon)
+        for detection in detections
+    ]
 
-# ===================== Fungsi untuk Menyimpan Laporan ke Database =====================
 
-def save_report_to_db(connection, image_name, road_name, description, severity, annotated_image, detections):
-    """Menyimpan laporan dan deteksi ke database."""
+def queue_report(image_name, road_name, description, severity, annotated_image, detections, location=None, crops=()):
+    """Memasukkan laporan ke antrean penyimpanan. Mengembalikan ID sementara, atau None jika gagal."""
     try:
-        with connection.cursor() as cursor:
-            # Simpan laporan
-            sql_report = """
-            INSERT INTO reports (image_name, road_name, report_description, pothole_severity, annotated_image)
-            VALUES (%s, %s, %s, %s, %s)
-            """
-            cursor.execute(sql_report, (image_name, road_name, description, severity, annotated_image))
-            report_id = cursor.lastrowid
-
-            # Simpan deteksi
-            sql_detection = """
-            INSERT INTO detections (report_id, class_label, confidence, x, y, width, height)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            for detection in detections:
-                rounded_confidence = round(float(detection["confidence"]), 4)
-                cursor.execute(sql_detection, (
-                    report_id,
-                    detection["name"],
-                    rounded_confidence,
-                    detection["box"][0],
-                    detection["box"][1],
-                    detection["box"][2],
-                    detection["box"][3],
-                ))
-
-            connection.commit()
-            return report_id
+        pending_id = write_behind.enqueue(
+            road_name, description, severity, detection_rows_for(detections, location),
+            image_name=image_name, annotated_image=annotated_image, location=location,
+        )
+        write_behind.remember(pending_id, image_name)
+        crop_store.save_crops(pending_id, image_name, crops)
+        return pending_id
     except Exception as e:
-        st.error(f"Terjadi kesalahan saat menyimpan laporan ke database: {e}")
+        st.error(f"Terjadi kesalahan saat menyimpan laporan: {e}")
         return None
 
 
@@ -104,9 +85,10 @@ def save_report_to_db(connection, image_name, road_name, description, severity,
 st.set_page_config(page_title="Road Guard", page_icon="\U0001F6E3\uFE0F", layout="wide")
 
 # Cek apakah pengguna sudah login
-if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
+if not is_logged_in(st.session_state):
     st.error("Silakan login terlebih dahulu!")
     st.stop()
+username = st.session_state["username"]
 
 # ===================== CSS Kustom untuk Styling =====================
 
@@ -140,43 +122,79 @@ st.markdown(
 
 st.sidebar.header("\U0001F527 Pengaturan Deteksi")
 score_threshold = st.sidebar.slider("Tingkat Kepercayaan", 0.0, 1.0, 0.5, 0.05)
-image_file = st.file_uploader("Unggah Gambar Jalan", type=["png", "jpg", "jpeg"])
+metrics.render_debug_panel()
+upload_mode = st.sidebar.radio("Mode Unggah", ["Satu Gambar", "Banyak Gambar"])
+if upload_mode == "Satu Gambar":
+    image_file = st.file_uploader("Unggah Gambar Jalan", type=["png", "jpg", "jpeg"])
+    image_files = []
+else:
+    image_file = None
+    image_files = st.file_uploader("Unggah Gambar Jalan", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
 
 # ===================== Load Model =====================
 
-MODEL_PATH = "./models/YOLOv8_Small_RDD.pt"
-MODEL_URL = "https://github.com/oracl4/RoadDamageDetection/raw/main/models/YOLOv8_Small_RDD.pt"
-model = load_model(MODEL_PATH, MODEL_URL)
+model_choice, model = render_model_selector("image")
+imgsz = model_choice.imgsz
 CLASSES = ["Retak Longitudinal", "Retak Melintang", "Retak Buaya", "Lubang Jalan"]
 
 # ===================== Proses Deteksi =====================
 
 if image_file:
-    image = Image.open(image_file)
-    image_array = np.array(image)
+    with metrics.timer("image.decode"):
+        # JPEG besar didecode langsung di skala kecil, orientasi EXIF sudah diterapkan
+        image_array, location, original_size = decode_image(image_file.getvalue(), target=imgsz)
 
     col1, col2 = st.columns(2)
-    with col1:
-        st.image(image, caption="Gambar Unggahan", use_container_width=True)
-
-    # Jalankan deteksi YOLO
-    results = model.predict(cv2.resize(image_array, (640, 640)), conf=score_threshold)
-    annotated_image = results[0].plot()
-
-    with col2:
+    with col1, metrics.timer("image.display"):
+        st.image(image_array, caption=f"Gambar Unggahan ({original_size[0]}×{original_size[1]})", use_container_width=True)
+
+    # Hasil disimpan di session supaya rerun (isi form, klik simpan) tidak mengulang inferensi
+    # dan tidak memakai token admission lagi
+    single_key = (image_file.name, image_file.size, score_threshold, model_choice.label)
+    single = st.session_state.get("single_result")
+    if single is None or single["key"] != single_key:
+        st.session_state.pop("single_result", None)
+        # Jalankan deteksi YOLO
+        with metrics.timer("image.preprocess"):
+            image_resized = cv2.resize(image_array, (imgsz, imgsz))
+        queue_status = st.empty()
+        try:
+            with admission.admit(username, admission.IMAGE, admission.render_queue_status(queue_status, "Deteksi gambar")):
+                queue_status.empty()
+                with metrics.timer("image.inference"):
+                    results = cpu_scheduler.predict(model, image_resized, cpu_scheduler.IMAGE, conf=score_threshold, imgsz=imgsz)
+        except admission.Rejected as e:
+            queue_status.warning(admission.describe_rejection(e))
+            st.stop()
+        with metrics.timer("image.annotate"):
+            annotated_image = results[0].plot()
+
+        # Konversi gambar anotasi ke byte untuk disimpan
+        with metrics.timer("image.encode"):
+            buffer = BytesIO()
+            Image.fromarray(annotated_image).save(buffer, format="PNG")
+
+        # Persiapkan data deteksi
+        with metrics.timer("image.extract"):
+            detections = [
+                {"name": CLASSES[int(r[5])], "confidence": r[4], "box": tuple(map(int, r[:4]))}
+                for r in results[0].boxes.data
+            ]
+        metrics.count("image.images")
+        metrics.count("image.detections", len(detections))
+        single = st.session_state["single_result"] = {
+            "key": single_key,
+            "annotated_image": annotated_image,
+            "annotated_image_bytes": buffer.getvalue(),
+            "detections": detections,
+        }
+    annotated_image = single["annotated_image"]
+    annotated_image_bytes = single["annotated_image_bytes"]
+    detections = single["detections"]
+
+    with col2, metrics.timer("image.display"):
         st.image(annotated_image, caption="Hasil Deteksi", use_container_width=True)
 
-    # Konversi gambar anotasi ke byte untuk disimpan
-    buffer = BytesIO()
-    Image.fromarray(annotated_image).save(buffer, format="PNG")
-    annotated_image_bytes = buffer.getvalue()
-
-    # Persiapkan data deteksi
-    detections = [
-        {"name": CLASSES[int(r[5])], "confidence": r[4], "box": tuple(map(int, r[:4]))}
-        for r in results[0].boxes.data
-    ]
-
     st.write("### Objek yang Terdeteksi:")
     st.write(pd.DataFrame(detections))
 
@@ -184,18 +202,122 @@ if image_file:
     road_name = st.text_input("Masukkan Nama Jalan:", placeholder="Misalnya: Jalan Raya Utama")
     description = st.text_area("Deskripsi Laporan:", placeholder="Jelaskan kondisi jalan...")
     severity = st.selectbox("Pilih Tingkat Kerusakan:", ["Ringan", "Sedang", "Berat"])
+    if location:
+        st.caption(f"\U0001F4CD Lokasi dari EXIF GPS: {location[0]:.6f}, {location[1]:.6f}")
+    else:
+        st.caption("Gambar tidak memiliki data EXIF GPS.")
 
     # Simpan laporan ke database
     if st.button("Simpan Laporan ke Database"):
         if not road_name or not description or not severity:
             st.error("Harap lengkapi semua kolom sebelum menyimpan.")
         else:
-            connection = connect_db()
-            if connection:
-                report_id = save_report_to_db(
-                    connection, image_file.name, road_name, description, severity, annotated_image_bytes, detections
+            with metrics.timer("image.db_save"):
+                # Crop diambil dari gambar hasil decode (lebih tajam dari input model imgsz x imgsz)
+                crops = crop_store.image_crops(
+                    image_array, detections,
+                    box_scale=(image_array.shape[1] / imgsz, image_array.shape[0] / imgsz),
                 )
-                if report_id:
-                    st.success(f"Laporan berhasil disimpan dengan ID: {report_id}!")
-                connection.close()
-
+                pending_id = queue_report(
+                    image_file.name, road_name, description, severity, annotated_image_bytes, detections,
+                    location=location, crops=crops,
+                )
+            if pending_id:
+                st.success("Laporan masuk antrean dan disimpan ke database di latar belakang. Lihat status di sidebar.")
+
+# ===================== Proses Deteksi Banyak Gambar =====================
+
+GRID_COLUMNS = 3
+GRID_PAGE_SIZE = 12
+
+if image_files:
+    # Hasil disimpan di session supaya rerun (ganti halaman grid, isi form) tidak mengulang inferensi
+    batch_key = (tuple((f.name, f.size) for f in image_files), score_threshold, model_choice.label)
+    batch = st.session_state.get("batch_results")
+    if batch is None or batch["key"] != batch_key:
+        st.session_state.pop("batch_results", None)
+        if st.button(f"Proses {len(image_files)} Gambar"):
+            queue_status = st.empty()
+            try:
+                # Satu batch dihitung sebagai satu pekerjaan gambar
+                with admission.admit(username, admission.IMAGE, admission.render_queue_status(queue_status, "Batch gambar")):
+                    queue_status.empty()
+                    progress_bar = st.progress(0.0)
+                    results, seconds = run_batch(
+                        model, ((f.name, f.getvalue()) for f in image_files), CLASSES,
+                        imgsz=imgsz, conf=score_threshold, batch_size=BATCH_SIZE,
+                        progress=lambda done: progress_bar.progress(done / len(image_files)),
+                    )
+            except admission.Rejected as e:
+                queue_status.warning(admission.describe_rejection(e))
+                st.stop()
+            batch = st.session_state["batch_results"] = {
+                "key": batch_key,
+                "results": [r for r in results if r.error is None],
+                "failed": [r for r in results if r.error is not None],
+                "seconds": seconds,
+            }
+        else:
+            batch = None
+
+    if batch:
+        results = batch["results"]
+        if batch["failed"]:
+            st.warning(
+                f"{len(batch['failed'])} gambar gagal dibaca dan dilewati: "
+                + ", ".join(r.name for r in batch["failed"])
+            )
+            with st.expander("Detail kesalahan"):
+                st.dataframe(pd.DataFrame([{"gambar": r.name, "kesalahan": r.error} for r in batch["failed"]]))
+        total_detections = sum(len(r.detections) for r in results)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Gambar Diproses", len(results))
+        col2.metric("Total Deteksi", total_detections)
+        col3.metric("Throughput", f"{len(results) / batch['seconds']:.1f} gambar/detik" if batch["seconds"] else "-")
+        st.caption(f"Total waktu proses {batch['seconds']:.1f} detik (batch {BATCH_SIZE}, input {imgsz}px).")
+
+        # Grid hasil deteksi dengan paginasi
+        page_count = max(1, -(-len(results) // GRID_PAGE_SIZE))
+        page = st.number_input("Halaman", min_value=1, max_value=page_count, value=1, step=1) - 1
+        page_results = results[page * GRID_PAGE_SIZE:(page + 1) * GRID_PAGE_SIZE]
+        for row_start in range(0, len(page_results), GRID_COLUMNS):
+            for column, result in zip(st.columns(GRID_COLUMNS), page_results[row_start:row_start + GRID_COLUMNS]):
+                with column:
+                    st.image(result.annotated_png, caption=f"{result.name} ({len(result.detections)} deteksi)",
+                             use_container_width=True)
+
+        st.write("### Objek yang Terdeteksi:")
+        st.dataframe(pd.DataFrame(
+            [{"gambar": r.name, **detection} for r in results for detection in r.detections]
+        ))
+
+        # Satu formulir untuk semua gambar. Semua laporan masuk jurnal dalam satu transaksi, tetapi
+        # writer meng-commit ke MySQL per batch, jadi sebagian laporan bisa tersimpan lebih dulu
+        road_name = st.text_input("Masukkan Nama Jalan:", placeholder="Misalnya: Jalan Raya Utama", key="batch_road_name")
+        description = st.text_area("Deskripsi Laporan:", placeholder="Jelaskan kondisi jalan...", key="batch_description")
+        severity = st.selectbox("Pilih Tingkat Kerusakan:", ["Ringan", "Sedang", "Berat"], key="batch_severity")
+
+        if results and st.button(f"Simpan {len(results)} Laporan ke Database"):
+            if not road_name or not description or not severity:
+                st.error("Harap lengkapi semua kolom sebelum menyimpan.")
+            else:
+                reports = [
+                    dict(
+                        road_name=road_name, description=description, severity=severity,
+                        detection_rows=detection_rows_for(r.detections, r.location),
+                        image_name=r.name, annotated_image=r.annotated_png, location=r.location,
+                    )
+                    for r in results
+                ]
+                try:
+                    with metrics.timer("image.db_save_batch"):
+                        pending_ids = write_behind.enqueue_many(reports)
+                    for pending_id, r in zip(pending_ids, results):
+                        write_behind.remember(pending_id, r.name)
+                        crop_store.save_crops(pending_id, r.name, r.crops)
+                    st.success(f"{len(pending_ids)} laporan masuk antrean dan disimpan ke database di latar belakang.")
+                except Exception as e:
+                    st.error(f"Terjadi kesalahan saat menyimpan laporan: {e}")
+
+# Dirender terakhir supaya laporan yang baru masuk antrean ikut tampil
+write_behind.render_status_panel()
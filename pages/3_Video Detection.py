@@ -1,11 +1,19 @@
 import streamlit as st
 import cv2
 import numpy as np
-import pymysql
 from io import BytesIO
-from ultralytics import YOLO
-from pathlib import Path
 import os
+import time
+import uuid
+import pandas as pd
+
+from utils import admission, cpu_scheduler, crop_store, metrics, write_behind
+from utils.auth import is_logged_in
+from utils.detection_store import DetectionStore
+from utils.geo import load_gps_track
+from utils.model_registry import render_model_selector
+from utils.roi import render_roi_selector
+from utils.video_render import FLOOR_CONFIDENCE, draw_detections, render_video
 
 # === Konfigurasi halaman Streamlit ===
 st.set_page_config(
@@ -16,89 +24,80 @@ st.set_page_config(
 )
 
 # Cek apakah pengguna sudah login
-if 'logged_in' not in st.session_state or not st.session_state['logged_in']:
+if not is_logged_in(st.session_state):
     st.error("Silakan login terlebih dahulu!")
     st.stop()  # Hentikan eksekusi jika belum login
+username = st.session_state["username"]
 
-# === Fungsi untuk koneksi database ===
-def connect_db():
-    try:
-        return pymysql.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="road_detection",
-            charset="utf8mb4",
-            cursorclass=pymysql.cursors.DictCursor,
-        )
-    except Exception as e:
-        st.error(f"Gagal terhubung ke database: {e}")
-        return None
-
-# === Inisialisasi model YOLO ===
-MODEL_PATH = Path("./models/YOLOv8_Small_RDD.pt")
-
-if not MODEL_PATH.exists():
-    st.error("Model tidak ditemukan. Pastikan model sudah diunduh di folder 'models'.")
-    st.stop()
-
-@st.cache_resource
-def load_model():
-    return YOLO(str(MODEL_PATH))
-
-net = load_model()
+# === Inisialisasi model YOLO (varian dipilih dari models/manifest.json) ===
+model_choice, net = render_model_selector("video")
+roi_profile = render_roi_selector("video")
 CLASSES = ["Retakan Longitudinal", "Retakan Transversal", "Retakan Aligator", "Lubang Jalan"]
 
 # === Fungsi menyimpan BytesIO ke file ===
 def write_bytesio_to_file(filename, bytesio):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
     with open(filename, "wb") as outfile:
         outfile.write(bytesio.getbuffer())
 
-# === Kelas untuk menyimpan deteksi ===
-class Detection:
-    def __init__(self, class_id, label, score, box):
-        self.class_id = class_id
-        self.label = label
-        self.score = score
-        self.box = box
+# === File sementara video ===
+TEMP_DIR = "./temp"
+# Pasangan video input/hasil yang tidak disentuh selama ini dianggap milik sesi yang sudah ditinggal
+TEMP_MAX_AGE_HOURS = float(os.environ.get("ROADGUARD_VIDEO_TEMP_MAX_AGE_HOURS", "6"))
+TEMP_PREFIXES = ("input_video_", "output_infer_")
+
+def remove_files(*paths):
+    for path in paths:
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def cleanup_temp_videos(max_age_hours=TEMP_MAX_AGE_HOURS):
+    """Menghapus video sementara di ``TEMP_DIR`` yang tidak disentuh lebih dari ``max_age_hours``."""
+    cutoff = time.time() - max_age_hours * 3600
+    try:
+        entries = list(os.scandir(TEMP_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if not entry.name.startswith(TEMP_PREFIXES):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                metrics.count("video.temp_removed")
+        except FileNotFoundError:
+            pass
 
-# === Fungsi menyimpan laporan ke database ===
-def save_report_to_db(connection, video_name, road_name, description, severity, detections):
+# === Fungsi menyimpan laporan ke database (lewat antrean write-behind) ===
+def queue_report(video_name, road_name, description, severity, detections, gps_track=None, fps=None, min_score=None,
+                 tracks=None):
     try:
-        with connection.cursor() as cursor:
-            sql_report = """
-            INSERT INTO reports (video_name, road_name, report_description, pothole_severity)
-            VALUES (%s, %s, %s, %s)
-            """
-            cursor.execute(sql_report, (video_name, road_name, description, severity))
-            report_id = cursor.lastrowid
-
-            sql_detection = """
-            INSERT INTO detections (report_id, class_label, confidence, x, y, width, height)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            for det in detections:
-                cursor.execute(sql_detection, (
-                    report_id,
-                    det.label,
-                    det.score,
-                    det.box[0],
-                    det.box[1],
-                    det.box[2] - det.box[0],
-                    det.box[3] - det.box[1],
-                ))
-
-            connection.commit()
-            return report_id
+        # Koordinat tiap deteksi diambil dari trek GPS pada frame-nya
+        lats = lons = None
+        location = None
+        frames = detections.view(min_score)["frame"]
+        if gps_track is not None and len(frames):
+            lats, lons = gps_track.positions(frames, fps)
+            location = (float(lats[0]), float(lons[0]))
+        pending_id = write_behind.enqueue(
+            road_name, description, severity, detections.iter_rows(CLASSES, lats, lons, min_score=min_score),
+            video_name=video_name, location=location,
+        )
+        write_behind.remember(pending_id, video_name)
+        if tracks is not None:
+            # Satu crop per kerusakan (frame dengan skor tertinggi), bukan seluruh video
+            crop_store.save_crops(pending_id, video_name, tracks.best(CLASSES, min_score))
+        return pending_id
     except Exception as e:
         st.error(f"Kesalahan menyimpan laporan: {e}")
         return None
 
 # === Proses Video dengan Inferensi ===
-def process_video_with_inference(video_file, score_threshold):
-    temp_file_input = "./temp/input_video.mp4"
-    temp_file_infer = "./temp/output_infer.mp4"
-
+def process_video_with_inference(video_file, score_threshold, roi_profile, temp_file_input, temp_file_infer):
+    """Inferensi sekali pada ``FLOOR_CONFIDENCE``; video keluaran digambar untuk ``score_threshold``."""
     write_bytesio_to_file(temp_file_input, video_file)
     video_capture = cv2.VideoCapture(temp_file_input)
 
@@ -115,75 +114,179 @@ def process_video_with_inference(video_file, score_threshold):
     progress_bar = st.progress(0)
     image_display = st.empty()
 
-    detections_list = []
+    # Inferensi hanya pada area jalan; box dikembalikan ke koordinat frame penuh
+    roi = roi_profile.layout(width, height)
+    inference_seconds = 0.0
+
+    detections = DetectionStore()
+    tracks = crop_store.TrackCropper()
     frame_counter = 0
     while video_capture.isOpened():
-        ret, frame = video_capture.read()
+        with metrics.timer("video.decode"):
+            ret, frame = video_capture.read()
         if not ret:
             break
 
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = net.predict(frame_rgb, conf=score_threshold)
-
-        for result in results:
-            for box in result.boxes.cpu().numpy():
-                detections_list.append(
-                    Detection(
-                        class_id=int(box.cls),
-                        label=CLASSES[int(box.cls)],
-                        score=float(box.conf),
-                        box=box.xyxy[0].astype(int),
-                    )
-                )
+        start = time.perf_counter()
+        with metrics.timer("video.inference"):
+            # Jalur cepat: ambang batas dan top-k per kelas sebelum NMS, hasil berupa array.
+            # detect mengharapkan BGR seperti net.predict, jadi frame OpenCV dipakai langsung
+            result = cpu_scheduler.detect(net, roi.crop(frame), cpu_scheduler.VIDEO, conf=FLOOR_CONFIDENCE, imgsz=model_choice.imgsz)
+        inference_seconds += time.perf_counter() - start
+
+        with metrics.timer("video.extract"):
+            # Deteksi di luar poligon jalan dibuang; semua skor >= floor disimpan untuk ambang batas lain
+            result = result.select(roi.keep(result.boxes))
+            frame_boxes = roi.to_frame(result.boxes)
+            detections.append(frame_counter, result.class_ids, result.scores, frame_boxes)
+        with metrics.timer("video.crops"):
+            tracks.update(frame_counter, frame, result.class_ids, result.scores, frame_boxes)
 
-        annotated_frame = results[0].plot()
-        writer.write(cv2.cvtColor(annotated_frame, cv2.COLOR_RGB2BGR))
+        with metrics.timer("video.annotate"):
+            shown = result.scores >= score_threshold
+            annotated_frame = draw_detections(
+                frame.copy(), result.class_ids[shown], result.scores[shown], frame_boxes[shown].astype(int), CLASSES
+            )
+            roi.outline(annotated_frame)
+        with metrics.timer("video.encode"):
+            writer.write(annotated_frame)
 
-        image_display.image(annotated_frame)
+        with metrics.timer("video.display"):
+            image_display.image(annotated_frame, channels="BGR")
         frame_counter += 1
-        progress_bar.progress(frame_counter / frame_count)
+        with metrics.timer("video.progress"):
+            progress_bar.progress(min(frame_counter / max(frame_count, 1), 1.0))
+        metrics.count("video.frames")
 
     video_capture.release()
     writer.release()
     progress_bar.empty()
+    metrics.count("video.detections", len(detections))
     st.success("Proses video selesai!")
+    if frame_counter:
+        st.caption(
+            f"Inferensi rata-rata {inference_seconds / frame_counter * 1000:.0f} ms/frame pada "
+            f"{roi.pixel_ratio:.0%} piksel frame (profil ROI: {roi_profile.name})."
+        )
+
+    return detections, fps, roi, tracks
 
-    return detections_list, temp_file_infer
+# === Video beranotasi untuk ambang batas baru, dari box tersimpan ===
+def rerender_video(score_threshold):
+    progress_bar = st.progress(0.0, text="Menggambar ulang video untuk ambang batas baru...")
+    with metrics.timer("video.rerender"):
+        render_video(
+            st.session_state.video_input, st.session_state.video_output, st.session_state.detections,
+            score_threshold, CLASSES, roi=st.session_state.video_roi, progress=progress_bar.progress,
+        )
+    progress_bar.empty()
+    st.session_state.video_output_threshold = score_threshold
 
 # === UI Utama Streamlit ===
 def main():
     st.title("🛣️ Road Guard: Deteksi Kerusakan Jalan")
     video_file = st.file_uploader("Unggah Video", type=["mp4"])
-    score_threshold = st.slider("Ambang Batas Deteksi", 0.1, 1.0, 0.5, step=0.05)
+    gps_file = st.file_uploader("Unggah Trek GPS (opsional)", type=["csv", "gpx"],
+                                help="CSV dengan kolom lat, lon, dan frame atau time (detik), atau file GPX.")
+    score_threshold = st.slider("Ambang Batas Deteksi", FLOOR_CONFIDENCE, 1.0, 0.5, step=0.05,
+                                help="Video diproses sekali; mengubah ambang batas hanya menyaring ulang deteksi.")
+    metrics.render_debug_panel()
 
     # State untuk mengelola apakah video sudah diproses
     if "detections" not in st.session_state:
         st.session_state.detections = None
+        st.session_state.video_input = None
         st.session_state.video_output = None
         st.session_state.video_processed = False
+        st.session_state.video_fps = None
+
+    # File sesi ini ditandai masih dipakai; jika sudah dihapus pembersihan umur
+    # (sesi ditinggal lalu dibuka lagi), video diproses ulang
+    if st.session_state.video_processed:
+        try:
+            os.utime(st.session_state.video_input)
+            os.utime(st.session_state.video_output)
+        except FileNotFoundError:
+            if st.session_state.detections is not None:
+                st.session_state.detections.close()
+            remove_files(st.session_state.video_input, st.session_state.video_output)
+            st.session_state.detections = st.session_state.video_input = st.session_state.video_output = None
+            st.session_state.video_processed = False
+            st.session_state.video_key = None
+
+    # Video baru diunggah atau profil ROI diganti: lepaskan deteksi dan file video sebelumnya
+    if video_file and st.session_state.get("video_key") != (video_file.name, roi_profile.name):
+        if st.session_state.detections is not None:
+            st.session_state.detections.close()
+        remove_files(st.session_state.video_input, st.session_state.video_output)
+        st.session_state.video_input = st.session_state.video_output = None
+        st.session_state.detections = None
+        st.session_state.video_tracks = None
+        st.session_state.video_processed = False
+        st.session_state.video_key = (video_file.name, roi_profile.name)
 
     if video_file and not st.session_state.video_processed:
-        detections, video_output = process_video_with_inference(video_file, score_threshold)
+        # File sementara per video supaya pengguna lain tidak menimpa video yang akan digambar ulang
+        video_tag = uuid.uuid4().hex
+        video_input = f"{TEMP_DIR}/input_video_{video_tag}.mp4"
+        video_output = f"{TEMP_DIR}/output_infer_{video_tag}.mp4"
+        cleanup_temp_videos()
+        queue_status = st.empty()
+        try:
+            with admission.admit(username, admission.VIDEO, admission.render_queue_status(queue_status, "Video")):
+                queue_status.empty()
+                detections, fps, roi, tracks = process_video_with_inference(
+                    video_file, score_threshold, roi_profile, video_input, video_output
+                )
+        except admission.Rejected as e:
+            queue_status.warning(admission.describe_rejection(e))
+            st.stop()
+        except Exception:
+            remove_files(video_input, video_output)
+            raise
         st.session_state.detections = detections
+        st.session_state.video_input = video_input
         st.session_state.video_output = video_output
+        st.session_state.video_output_threshold = score_threshold
+        st.session_state.video_roi = roi
+        st.session_state.video_tracks = tracks
+        st.session_state.video_fps = fps
         st.session_state.video_processed = True
 
     if st.session_state.video_processed:
         st.success("Video berhasil diproses!")
+        detections = st.session_state.detections
+        counts = detections.class_counts(len(CLASSES), min_score=score_threshold)
+        st.write(f"### Objek yang Terdeteksi: {int(counts.sum())}")
+        st.dataframe(pd.DataFrame({"Kelas": CLASSES, "Jumlah": counts}), hide_index=True)
         road_name = st.text_input("Nama Jalan:", placeholder="Contoh: Jalan Raya Utama")
         description = st.text_area("Deskripsi:", placeholder="Deskripsi kondisi jalan...")
         severity = st.selectbox("Tingkat Kerusakan:", ["Ringan", "Sedang", "Berat"])
 
+        gps_track = None
+        if gps_file:
+            try:
+                gps_track = load_gps_track(gps_file.getvalue(), gps_file.name)
+            except (ValueError, KeyError) as e:
+                st.error(f"Trek GPS tidak valid: {e}")
+
         if st.button("Simpan Laporan"):
-            connection = connect_db()
-            if connection:
-                report_id = save_report_to_db(connection, video_file.name, road_name, description, severity, st.session_state.detections)
-                if report_id:
-                    st.success(f"Laporan berhasil disimpan dengan ID: {report_id}")
-                connection.close()
+            with metrics.timer("video.db_save"):
+                pending_id = queue_report(
+                    video_file.name, road_name, description, severity, st.session_state.detections,
+                    gps_track=gps_track, fps=st.session_state.video_fps, min_score=score_threshold,
+                    tracks=st.session_state.get("video_tracks"),
+                )
+            if pending_id:
+                st.success("Laporan masuk antrean dan disimpan ke database di latar belakang. Lihat status di sidebar.")
 
+        if st.session_state.video_output_threshold != score_threshold:
+            rerender_video(score_threshold)
         with open(st.session_state.video_output, "rb") as f:
             st.download_button("⬇️ Unduh Video Prediksi", data=f, file_name="RDD_Prediction.mp4", mime="video/mp4")
 
+    # Dirender terakhir supaya laporan yang baru masuk antrean ikut tampil
+    write_behind.render_status_panel()
+
 if __name__ == "__main__":
     main()
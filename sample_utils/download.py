@@ -1,50 +1,183 @@
+"""Unduhan file model yang bisa dilanjutkan dan diverifikasi.
+
+Data ditulis ke ``<file>.part`` dan dilanjutkan dengan HTTP Range bila
+terputus. File akhir baru muncul lewat ``os.replace`` setelah ukuran dan
+SHA-256 cocok, jadi file setengah jadi tidak pernah dianggap model valid.
+Lock file mencegah dua sesi/proses mengunduh file yang sama bersamaan.
+
+``fetch()`` tidak bergantung pada Streamlit sehingga bisa diuji dengan
+server HTTP lokal; ``download_file()`` adalah pembungkus untuk halaman.
+"""
+import contextlib
+import hashlib
+import http.client
+import logging
+import os
+import time
+import urllib.error
 import urllib.request
 from pathlib import Path
 
-import streamlit as st
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2**20
+PROGRESS_INTERVAL = 0.25
+MEGABYTES = 2.0**20
+
+
+class DownloadError(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Lock eksklusif antarproses pada ``path`` (diblok sampai tersedia)."""
+    with open(path, "a+b") as handle:
+        try:
+            import fcntl
+
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        except ImportError:
+            import msvcrt
+
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.5)
+        yield
+
+
+def _hash_file(path, digest):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest
+
+
+def is_valid(path, expected_size=None, sha256=None):
+    path = Path(path)
+    if not path.exists():
+        return False
+    if expected_size and path.stat().st_size != expected_size:
+        return False
+    if sha256 and _hash_file(path, hashlib.sha256()).hexdigest() != sha256.lower():
+        return False
+    return True
 
-# This code is based on https://github.com/streamlit/demo-self-driving/blob/230245391f2dda0cb464008195a470751c01770b/streamlit_app.py#L48  # noqa: E501
-def download_file(url, download_to: Path, expected_size=None):
-    # Don't download the file twice.
-    # (If possible, verify the download using the file length.)
-    if download_to.exists():
-        if expected_size:
-            if download_to.stat().st_size == expected_size:
-                return
-        else:
-            st.info(f"{url} is already downloaded.")
-            if not st.button("Download again?"):
-                return
 
+def _transfer(url, part, progress, timeout):
+    """Satu percobaan: melanjutkan ``part`` dari ukurannya sekarang. Mengembalikan ukuran akhirnya."""
+    offset = part.stat().st_size if part.exists() else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416:
+            # Range di luar ukuran file: .part sudah lengkap (atau rusak, diperiksa pemanggil)
+            return offset
+        raise
+
+    with response:
+        if offset and response.status != 206:
+            logger.info("Server mengabaikan Range, unduhan %s diulang dari awal", url)
+            offset = 0
+        length = response.headers.get("Content-Length")
+        total = offset + int(length) if length is not None else None
+
+        done = offset
+        last_report = 0.0
+        with open(part, "ab" if offset else "wb") as output:
+            while True:
+                data = response.read(CHUNK_SIZE)
+                if not data:
+                    break
+                output.write(data)
+                done += len(data)
+                now = time.monotonic()
+                if progress is not None and now - last_report >= PROGRESS_INTERVAL:
+                    progress(done, total)
+                    last_report = now
+            output.flush()
+            os.fsync(output.fileno())
+    if total is not None and done != total:
+        raise DownloadError(f"Unduhan terputus pada {done}/{total} byte")
+    return done
+
+
+def fetch(url, download_to, expected_size=None, sha256=None, progress=None, retries=5, timeout=30):
+    """Mengunduh ``url`` ke ``download_to`` secara atomik.
+
+    ``progress(done, total)`` dipanggil paling sering tiap ``PROGRESS_INTERVAL``
+    detik. Koneksi yang putus dilanjutkan dari byte terakhir hingga ``retries``
+    kali. Mengembalikan False bila file valid sudah ada (tidak ada unduhan).
+    """
+    download_to = Path(download_to)
     download_to.parent.mkdir(parents=True, exist_ok=True)
+    part = download_to.with_name(download_to.name + ".part")
+
+    with file_lock(download_to.with_name(download_to.name + ".lock")):
+        # Dicek lagi setelah lock: proses lain mungkin baru saja selesai mengunduh
+        if is_valid(download_to, expected_size, sha256):
+            return False
+        if download_to.exists():
+            logger.warning("%s tidak cocok dengan ukuran/SHA-256 yang diharapkan, diunduh ulang", download_to)
+        if expected_size and part.exists() and part.stat().st_size > expected_size:
+            part.unlink()
+
+        for attempt in range(retries + 1):
+            try:
+                size = _transfer(url, part, progress, timeout)
+                break
+            except (urllib.error.URLError, http.client.HTTPException, OSError, DownloadError) as e:
+                if isinstance(e, urllib.error.HTTPError) and e.code < 500:
+                    raise
+                if attempt == retries:
+                    raise DownloadError(f"Gagal mengunduh {url}: {e}") from e
+                logger.warning("Unduhan %s terputus (%s), dilanjutkan", url, e)
+                time.sleep(min(2**attempt, 30))
+
+        if expected_size and size != expected_size:
+            part.unlink()
+            raise DownloadError(f"Ukuran {url} {size} byte, seharusnya {expected_size}")
+        if sha256:
+            actual = _hash_file(part, hashlib.sha256()).hexdigest()
+            if actual != sha256.lower():
+                part.unlink()
+                raise DownloadError(f"SHA-256 {url} tidak cocok: {actual}")
+        os.replace(part, download_to)
+    if progress is not None:
+        progress(size, size)
+    return True
+
+
+def download_file(url, download_to: Path, expected_size=None, sha256=None):
+    """``fetch()`` dengan status dan progress bar Streamlit."""
+    import streamlit as st
 
-    # These are handles to two visual elements to animate.
     weights_warning, progress_bar = None, None
+
+    def show_progress(done, total):
+        nonlocal weights_warning, progress_bar
+        if weights_warning is None:
+            weights_warning = st.warning(f"Downloading {url}...")
+            progress_bar = st.progress(0.0)
+        if total:
+            weights_warning.warning(f"Downloading {url}... ({done / MEGABYTES:6.2f}/{total / MEGABYTES:6.2f} MB)")
+            progress_bar.progress(min(done / total, 1.0))
+        else:
+            weights_warning.warning(f"Downloading {url}... ({done / MEGABYTES:6.2f} MB)")
+
     try:
-        weights_warning = st.warning("Downloading %s..." % url)
-        progress_bar = st.progress(0)
-        with open(download_to, "wb") as output_file:
-            with urllib.request.urlopen(url) as response:
-                length = int(response.info()["Content-Length"])
-                counter = 0.0
-                MEGABYTES = 2.0 ** 20.0
-                while True:
-                    data = response.read(8192)
-                    if not data:
-                        break
-                    counter += len(data)
-                    output_file.write(data)
-
-                    # We perform animation by overwriting the elements.
-                    weights_warning.warning(
-                        "Downloading %s... (%6.2f/%6.2f MB)"
-                        % (url, counter / MEGABYTES, length / MEGABYTES)
-                    )
-                    progress_bar.progress(min(counter / length, 1.0))
-    
-    # Finally, we remove these visual elements by calling .empty().
+        with st.spinner(f"Menyiapkan {download_to.name}..."):
+            fetch(url, download_to, expected_size=expected_size, sha256=sha256, progress=show_progress)
+    except DownloadError as e:
+        st.error(str(e))
+        st.stop()
     finally:
         if weights_warning is not None:
             weights_warning.empty()
-        if progress_bar is not None:
-            progress_bar.empty()
\ No newline at end of file
+            progress_bar.empty()
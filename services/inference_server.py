@@ -0,0 +1,284 @@
+"""Layanan HTTP deteksi kerusakan jalan untuk sistem lain (tiket kota, aplikasi lapangan).
+
+Memakai model dan ``CLASSES`` yang sama dengan halaman Streamlit (lihat
+``utils.model_registry``). Request yang datang hampir bersamaan digabung
+menjadi satu panggilan ``predict`` ber-batch.
+
+Endpoint:
+    POST /detect      satu gambar (body mentah, Content-Type image/*) atau
+                      banyak gambar (multipart/form-data). Parameter query
+                      opsional: ``conf`` (default 0.5).
+    GET  /healthz     proses hidup.
+    GET  /readyz      model sudah dimuat dan dipanaskan, antrean tidak penuh.
+    GET  /metrics     metrik format teks Prometheus.
+
+Box dikembalikan dalam koordinat gambar asli (setelah orientasi EXIF).
+
+Contoh:
+    python services/inference_server.py --port 8080 --window-ms 10 --max-batch 8
+    curl -H "Content-Type: image/jpeg" --data-binary @foto.jpg "http://localhost:8080/detect?conf=0.4"
+"""
+import argparse
+import email.parser
+import email.policy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import metrics  # noqa: E402
+from utils.image_decode import decode_image  # noqa: E402
+from utils.model_registry import CLASSES, get_model, is_available, load_manifest, select_model, warm_model  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 2**20
+DEFAULT_CONF = 0.5
+
+
+class Batcher:
+    """Menggabungkan gambar dari banyak request menjadi satu batch inferensi.
+
+    Thread worker menunggu gambar pertama, lalu mengumpulkan gambar lain
+    selama ``window`` detik atau sampai ``max_batch`` terpenuhi.
+    """
+
+    def __init__(self, model, imgsz, window=0.01, max_batch=8, max_queue=256):
+        self.model = model
+        self.imgsz = imgsz
+        self.window = window
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.queue = queue.Queue()
+        self.ready = threading.Event()
+        threading.Thread(target=self._run, name="batcher", daemon=True).start()
+
+    def submit(self, image, conf):
+        future = Future()
+        self.queue.put((image, conf, future))
+        return future
+
+    def overloaded(self):
+        return self.queue.qsize() >= self.max_queue
+
+    def warmup(self):
+        # Panggilan pertama memuat bobot dan menyiapkan graf; jangan dibebankan ke request pertama
+        warm_model(self.model, [self.imgsz], batch_sizes=sorted({1, self.max_batch}))
+        self.ready.set()
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                # Satu predict untuk semua request; ambang per request disaring setelahnya
+                conf = min(conf for _, conf, _ in batch)
+                with metrics.timer("service.inference"):
+                    results = self.model.predict(
+                        [image for image, _, _ in batch], conf=conf, imgsz=self.imgsz, verbose=False
+                    )
+                metrics.count("service.batches")
+                metrics.count("service.images", len(batch))
+                for (_, conf, future), result in zip(batch, results):
+                    future.set_result(_filter(result.boxes.data.cpu().numpy(), conf))
+            except Exception as e:
+                logger.exception("Inferensi batch gagal")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+def _filter(data, conf):
+    return data[data[:, 4] >= conf]
+
+
+def to_json(data, scale_x, scale_y):
+    """Baris (x1, y1, x2, y2, score, cls) ke daftar deteksi JSON dalam koordinat asli."""
+    boxes = data[:, :4] * np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+    return [
+        {
+            "class_id": int(class_id),
+            "label": CLASSES[int(class_id)],
+            "score": round(float(score), 4),
+            "box": [round(float(v), 1) for v in box],
+        }
+        for box, score, class_id in zip(boxes, data[:, 4], data[:, 5])
+    ]
+
+
+def parse_multipart(content_type, body):
+    """Mengembalikan daftar (nama file, bytes) dari body multipart/form-data."""
+    header = f"Content-Type: {content_type}\r\n\r\n".encode()
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + body)
+    if not message.is_multipart():
+        raise ValueError("Body multipart tidak valid")
+    files = []
+    for i, part in enumerate(message.iter_parts()):
+        data = part.get_payload(decode=True)
+        if data:
+            files.append((part.get_filename() or f"image_{i}", data))
+    return files
+
+
+class DetectionHandler(BaseHTTPRequestHandler):
+    server_version = "RoadGuardInference/1.0"
+    batcher = None
+    model_label = None
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/healthz":
+            self._send_json(HTTPStatus.OK, {"status": "ok"})
+        elif path == "/readyz":
+            if not self.batcher.ready.is_set():
+                self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"status": "loading"})
+            elif self.batcher.overloaded():
+                self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"status": "overloaded"})
+            else:
+                self._send_json(HTTPStatus.OK, {"status": "ready", "model": self.model_label})
+        elif path == "/metrics":
+            body = metrics.export_prometheus().encode()
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "tidak ditemukan"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/detect":
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "tidak ditemukan"})
+            return
+        if not self.batcher.ready.is_set() or self.batcher.overloaded():
+            self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": "layanan belum siap atau sedang penuh"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            self._send_json(HTTPStatus.LENGTH_REQUIRED, {"error": "body gambar kosong"})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "body terlalu besar"})
+            return
+        body = self.rfile.read(length)
+
+        try:
+            conf = float(parse_qs(url.query).get("conf", [DEFAULT_CONF])[0])
+            content_type = self.headers.get("Content-Type", "")
+            multipart = content_type.startswith("multipart/form-data")
+            files = parse_multipart(content_type, body) if multipart else [("image", body)]
+            if not files:
+                raise ValueError("tidak ada gambar di request")
+        except ValueError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+
+        start = time.perf_counter()
+        pending = []
+        for name, data in files:
+            try:
+                with metrics.timer("service.decode"):
+                    image, _, (width, height) = decode_image(data, target=self.batcher.imgsz)
+            except Exception as e:
+                pending.append((name, None, None, f"gambar tidak bisa dibaca: {e}"))
+                continue
+            scale = (width / image.shape[1], height / image.shape[0])
+            # decode_image menghasilkan RGB, sedangkan predict menganggap array numpy BGR
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            pending.append((name, (width, height), scale, self.batcher.submit(image, conf)))
+
+        results = []
+        for name, size, scale, future in pending:
+            if isinstance(future, str):
+                results.append({"filename": name, "error": future})
+                continue
+            try:
+                detections = to_json(future.result(timeout=60), *scale)
+            except Exception as e:
+                results.append({"filename": name, "error": f"inferensi gagal: {e}"})
+                continue
+            results.append({"filename": name, "width": size[0], "height": size[1], "detections": detections})
+        metrics.observe("service.request", time.perf_counter() - start)
+
+        if multipart:
+            self._send_json(HTTPStatus.OK, {"model": self.model_label, "results": results})
+        elif "error" in results[0]:
+            self._send_json(HTTPStatus.UNPROCESSABLE_ENTITY, results[0])
+        else:
+            self._send_json(HTTPStatus.OK, {"model": self.model_label, **results[0]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--variant", help="override varian model, misalnya small@640")
+    parser.add_argument("--window-ms", type=float, default=10.0, help="jendela penggabungan request")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=256, help="antrean maksimum sebelum menolak request")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    metrics.set_enabled(True)
+
+    manifest = load_manifest()
+    choice = select_model(override=args.variant, manifest=manifest)
+    if not any(v["name"] == choice.variant and is_available(v) for v in manifest["variants"]):
+        raise SystemExit(f"Model {choice.path} belum ada atau tidak utuh. Jalankan aplikasi Streamlit sekali untuk mengunduhnya.")
+    logger.info("Memakai model %s (%s)", choice.label, choice.reason)
+    batcher = Batcher(get_model(choice.path), choice.imgsz, args.window_ms / 1000, args.max_batch, args.max_queue)
+    DetectionHandler.batcher = batcher
+    DetectionHandler.model_label = choice.label
+
+    server = ThreadingHTTPServer((args.host, args.port), DetectionHandler)
+    server.daemon_threads = True
+    # Server sudah menerima /healthz selama model dipanaskan; /readyz 503 sampai selesai
+    threading.Thread(target=batcher.warmup, name="warmup", daemon=True).start()
+    logger.info("Mendengarkan di http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""Evaluasi dengan prediksi yang di-cache untuk sweep ambang batas per kelas.
+
+Inferensi dijalankan sekali pada confidence sangat rendah. Prediksi
+mentah, ground truth, dan status TP tiap prediksi (untuk IoU 0.50:0.95)
+disimpan ke file ``.npz``. Karena pencocokan dilakukan berurutan dari
+confidence tertinggi, status TP sebuah prediksi tidak berubah ketika
+ambang batas dinaikkan. Jadi P/R/F1/mAP untuk ambang batas apa pun cukup
+dihitung dari kumulatif TP, tanpa inferensi ulang.
+
+Contoh:
+    python training/evaluate_thresholds.py cache --model models/YOLOv8_Small_RDD.pt \\
+        --data training/dataset/rddJapanIndiaFiltered/rdd_JapanIndia.yaml --output runs/eval/val_cache.npz
+    python training/evaluate_thresholds.py sweep --cache runs/eval/val_cache.npz --min-precision 0.6
+    python training/evaluate_thresholds.py sweep --cache runs/eval/val_cache.npz --class-thresholds 0.3 0.35 0.4 0.25
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+# np.trapz diganti nama menjadi np.trapezoid di NumPy 2.0
+_trapezoid = getattr(np, "trapezoid", None) or np.trapz
+
+
+# ===================== Dataset =====================
+
+def resolve_dataset(data_yaml, dataset_root=None):
+    """Daftar gambar validasi dan nama kelas dari file yaml dataset."""
+    data_yaml = Path(data_yaml)
+    with open(data_yaml) as f:
+        config = yaml.safe_load(f)
+
+    if dataset_root:
+        root = Path(dataset_root)
+    else:
+        root = Path(config.get("path", "."))
+        if not root.is_absolute():
+            candidates = [data_yaml.parent.parent / root, data_yaml.parent / root, data_yaml.parent, Path.cwd() / root]
+            root = next((c for c in candidates if c.exists()), candidates[0])
+
+    val_dirs = config["val"] if isinstance(config["val"], list) else [config["val"]]
+    images = []
+    for val_dir in val_dirs:
+        images.extend(sorted(p for p in (root / val_dir).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES))
+    names = config["names"]
+    if isinstance(names, dict):
+        names = [names[i] for i in sorted(names)]
+    return images, list(names)
+
+
+def label_path_for(image_path):
+    parts = list(image_path.parts)
+    index = len(parts) - 1 - parts[::-1].index("images")
+    parts[index] = "labels"
+    return Path(*parts).with_suffix(".txt")
+
+
+def load_ground_truth(image_path, width, height):
+    """Box ground truth YOLO (ternormalisasi) dalam piksel xyxy."""
+    path = label_path_for(image_path)
+    if not path.exists() or not path.stat().st_size:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.float32)
+    labels = np.loadtxt(path, ndmin=2, dtype=np.float32)
+    cx, cy, w, h = labels[:, 1] * width, labels[:, 2] * height, labels[:, 3] * width, labels[:, 4] * height
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return labels[:, 0].astype(np.int64), boxes
+
+
+# ===================== Pencocokan Prediksi =====================
+
+def box_iou(a, b):
+    """IoU antar dua kumpulan box xyxy, hasil (len(a), len(b))."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_predictions(pred_cls, pred_conf, pred_box, gt_cls, gt_box):
+    """Status TP (n_pred, 10) tiap prediksi, dicocokkan dari confidence tertinggi."""
+    tp = np.zeros((len(pred_cls), len(IOU_THRESHOLDS)), dtype=bool)
+    if not len(pred_cls) or not len(gt_cls):
+        return tp
+    iou = box_iou(pred_box, gt_box)
+    iou[pred_cls[:, None] != gt_cls[None, :]] = -1.0
+    matched = np.zeros((len(gt_cls), len(IOU_THRESHOLDS)), dtype=bool)
+    columns = np.arange(len(IOU_THRESHOLDS))
+    for p in np.argsort(-pred_conf, kind="stable"):
+        candidates = (iou[p][:, None] >= IOU_THRESHOLDS[None, :]) & ~matched
+        if not candidates.any():
+            continue
+        scores = np.where(candidates, iou[p][:, None], -1.0)
+        best = scores.argmax(axis=0)
+        ok = scores[best, columns] >= 0
+        tp[p, ok] = True
+        matched[best[ok], columns[ok]] = True
+    return tp
+
+
+# ===================== Cache Prediksi =====================
+
+def build_cache(model_path, data_yaml, output, conf=0.001, iou=0.7, imgsz=640, batch=16, dataset_root=None):
+    from ultralytics import YOLO
+
+    images, names = resolve_dataset(data_yaml, dataset_root)
+    model = YOLO(str(model_path))
+
+    pred_parts = {"image": [], "cls": [], "conf": [], "box": [], "tp": []}
+    gt_parts = {"image": [], "cls": []}
+    start = time.perf_counter()
+    for batch_start in range(0, len(images), batch):
+        batch_paths = images[batch_start:batch_start + batch]
+        results = model.predict([str(p) for p in batch_paths], conf=conf, iou=iou, imgsz=imgsz, verbose=False)
+        for offset, (path, result) in enumerate(zip(batch_paths, results)):
+            image_index = batch_start + offset
+            height, width = result.orig_shape
+            boxes = result.boxes.cpu().numpy()
+            pred_cls = boxes.cls.astype(np.int64)
+            pred_conf = boxes.conf.astype(np.float32)
+            pred_box = boxes.xyxy.astype(np.float32)
+            gt_cls, gt_box = load_ground_truth(path, width, height)
+
+            pred_parts["image"].append(np.full(len(pred_cls), image_index, dtype=np.int32))
+            pred_parts["cls"].append(pred_cls)
+            pred_parts["conf"].append(pred_conf)
+            pred_parts["box"].append(pred_box)
+            pred_parts["tp"].append(match_predictions(pred_cls, pred_conf, pred_box, gt_cls, gt_box))
+            gt_parts["image"].append(np.full(len(gt_cls), image_index, dtype=np.int32))
+            gt_parts["cls"].append(gt_cls)
+        print(f"\r{min(batch_start + batch, len(images))}/{len(images)} gambar", end="", flush=True)
+
+    elapsed = time.perf_counter() - start
+    print(f"\nInferensi selesai dalam {elapsed:.1f} s ({len(images) / elapsed:.1f} gambar/s)")
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        output,
+        pred_image=np.concatenate(pred_parts["image"]),
+        pred_cls=np.concatenate(pred_parts["cls"]),
+        pred_conf=np.concatenate(pred_parts["conf"]),
+        pred_box=np.concatenate(pred_parts["box"]),
+        pred_tp=np.concatenate(pred_parts["tp"]),
+        gt_image=np.concatenate(gt_parts["image"]),
+        gt_cls=np.concatenate(gt_parts["cls"]),
+        images=np.array([str(p) for p in images]),
+        names=np.array(names),
+        conf_floor=np.float32(conf),
+    )
+    print(f"Cache disimpan ke {output}")
+
+
+# ===================== Metrik dari Cache =====================
+
+def compute_ap(recall, precision):
+    """AP dengan interpolasi 101 titik (gaya COCO/ultralytics)."""
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    return _trapezoid(np.interp(x, mrec, mpre), x)
+
+
+class ThresholdEvaluator:
+    """Kurva kumulatif per kelas, dihitung sekali dari cache."""
+
+    def __init__(self, cache_path):
+        cache = np.load(cache_path)
+        self.names = [str(n) for n in cache["names"]]
+        self.conf_floor = float(cache["conf_floor"])
+        num_classes = len(self.names)
+        self.n_gt = np.bincount(cache["gt_cls"], minlength=num_classes)
+        self.curves = []
+        for c in range(num_classes):
+            mask = cache["pred_cls"] == c
+            order = np.argsort(-cache["pred_conf"][mask], kind="stable")
+            conf = cache["pred_conf"][mask][order]
+            cum_tp = np.cumsum(cache["pred_tp"][mask][order], axis=0)
+            self.curves.append((conf, cum_tp))
+
+    def class_metrics(self, class_thresholds):
+        """P, R, F1, AP50, AP50-95 per kelas untuk vektor ambang batas per kelas."""
+        rows = []
+        for c, threshold in enumerate(class_thresholds):
+            conf, cum_tp = self.curves[c]
+            n_gt = max(self.n_gt[c], 1)
+            k = int(np.searchsorted(-conf, -threshold, side="right"))
+            if k == 0:
+                rows.append((0.0, 0.0, 0.0, 0.0, 0.0))
+                continue
+            tp = cum_tp[:k]
+            counts = np.arange(1, k + 1)[:, None]
+            precision_curve = tp / counts
+            recall_curve = tp / n_gt
+            ap = np.array([compute_ap(recall_curve[:, j], precision_curve[:, j]) for j in range(tp.shape[1])])
+            p = float(precision_curve[-1, 0])
+            r = float(recall_curve[-1, 0])
+            f1 = 2 * p * r / (p + r) if p + r else 0.0
+            rows.append((p, r, f1, float(ap[0]), float(ap.mean())))
+        return np.array(rows)
+
+    def sweep(self, thresholds):
+        """Precision/recall/F1 IoU 0.5 untuk setiap ambang batas di grid, bentuk (grid, kelas)."""
+        thresholds = np.asarray(thresholds)
+        shape = (len(thresholds), len(self.names))
+        precision, recall = np.zeros(shape), np.zeros(shape)
+        for c, (conf, cum_tp) in enumerate(self.curves):
+            k = np.searchsorted(-conf, -thresholds, side="right")
+            tp = np.where(k > 0, cum_tp[np.maximum(k - 1, 0), 0] if len(conf) else 0, 0)
+            precision[:, c] = np.divide(tp, k, out=np.zeros(len(k)), where=k > 0)
+            recall[:, c] = tp / max(self.n_gt[c], 1)
+        f1 = np.divide(2 * precision * recall, precision + recall,
+                       out=np.zeros(shape), where=(precision + recall) > 0)
+        return precision, recall, f1
+
+    def recommend(self, thresholds, min_precision=None):
+        """Ambang batas per kelas: F1 maksimum, atau recall maksimum dengan presisi minimal."""
+        precision, recall, f1 = self.sweep(thresholds)
+        best = []
+        for c in range(len(self.names)):
+            if min_precision is not None and (precision[:, c] >= min_precision).any():
+                candidates = np.where(precision[:, c] >= min_precision, recall[:, c], -1)
+                best.append(float(thresholds[int(np.argmax(candidates))]))
+            else:
+                best.append(float(thresholds[int(np.argmax(f1[:, c]))]))
+        global_index = int(np.argmax(f1.mean(axis=1)))
+        return best, float(thresholds[global_index])
+
+
+def _print_table(names, metrics, thresholds):
+    print(f"{'kelas':<22} {'thr':>5} {'P':>6} {'R':>6} {'F1':>6} {'AP50':>6} {'AP50-95':>8}")
+    for name, threshold, (p, r, f1, ap50, ap) in zip(names, thresholds, metrics):
+        print(f"{name:<22} {threshold:>5.2f} {p:>6.3f} {r:>6.3f} {f1:>6.3f} {ap50:>6.3f} {ap:>8.3f}")
+    p, r, f1, ap50, ap = metrics.mean(axis=0)
+    print(f"{'semua':<22} {'':>5} {p:>6.3f} {r:>6.3f} {f1:>6.3f} {ap50:>6.3f} {ap:>8.3f}")
+
+
+def sweep_command(args):
+    start = time.perf_counter()
+    evaluator = ThresholdEvaluator(args.cache)
+    start_thr, stop_thr, step = (float(v) for v in args.grid.split(":"))
+    grid = np.round(np.arange(max(start_thr, evaluator.conf_floor), stop_thr + step / 2, step), 4)
+
+    if args.class_thresholds:
+        class_thresholds = args.class_thresholds
+        if len(class_thresholds) != len(evaluator.names):
+            raise SystemExit(f"--class-thresholds butuh {len(evaluator.names)} nilai")
+        _print_table(evaluator.names, evaluator.class_metrics(class_thresholds), class_thresholds)
+    else:
+        best, global_threshold = evaluator.recommend(grid, args.min_precision)
+        print(f"Ambang batas global terbaik (F1 rata-rata): {global_threshold:.2f}")
+        _print_table(evaluator.names, evaluator.class_metrics([global_threshold] * len(evaluator.names)),
+                     [global_threshold] * len(evaluator.names))
+        print("\nRekomendasi per kelas:")
+        _print_table(evaluator.names, evaluator.class_metrics(best), best)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({
+                    "global_threshold": global_threshold,
+                    "class_thresholds": dict(zip(evaluator.names, best)),
+                    "min_precision": args.min_precision,
+                }, f, indent=2)
+            print(f"\nRekomendasi disimpan ke {args.output}")
+    print(f"\nSelesai dalam {time.perf_counter() - start:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    cache_parser = subparsers.add_parser("cache", help="jalankan inferensi sekali dan simpan prediksi")
+    cache_parser.add_argument("--model", required=True)
+    cache_parser.add_argument("--data", required=True, help="file yaml dataset")
+    cache_parser.add_argument("--dataset-root", help="override folder root dataset")
+    cache_parser.add_argument("--output", required=True)
+    cache_parser.add_argument("--conf", type=float, default=0.001)
+    cache_parser.add_argument("--iou", type=float, default=0.7, help="ambang IoU untuk NMS")
+    cache_parser.add_argument("--imgsz", type=int, default=640)
+    cache_parser.add_argument("--batch", type=int, default=16)
+
+    sweep_parser = subparsers.add_parser("sweep", help="hitung metrik untuk grid atau vektor ambang batas")
+    sweep_parser.add_argument("--cache", required=True)
+    sweep_parser.add_argument("--grid", default="0.05:0.95:0.05", help="start:stop:step")
+    sweep_parser.add_argument("--class-thresholds", type=float, nargs="+")
+    sweep_parser.add_argument("--min-precision", type=float, help="pilih recall maksimum dengan presisi minimal ini")
+    sweep_parser.add_argument("--output", help="simpan rekomendasi ke file JSON")
+
+    args = parser.parse_args()
+    if args.command == "cache":
+        build_cache(args.model, args.data, args.output, args.conf, args.iou, args.imgsz, args.batch, args.dataset_root)
+    else:
+        sweep_command(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Konversi anotasi RDD2022 (Pascal VOC) ke format YOLOv8 dan split train/val.
+
+Versi modul dari ``0_PrepareDatasetYOLOv8.ipynb``:
+- XML diparse dengan ElementTree (parser C) di process pool.
+- Mode inkremental melewati XML yang mtime/ukuran atau hash isinya tidak berubah.
+- Split train/val tetap deterministik (seed 1337) seperti ``CopyDatasetSplit``.
+- File dataset dibuat dengan hardlink bila memungkinkan, fallback ke copy.
+
+Contoh:
+    python training/prepare_dataset.py convert --root /data/RDD2022
+    python training/prepare_dataset.py split --root /data/RDD2022 \\
+        --output training/dataset/rddJapanIndiaFiltered --train-dirs \\
+        RDD2022_all_countries/Japan/train RDD2022_all_countries/India/train
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import shutil
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+CLASS_MAPPING = {
+    "D00": 0,
+    "D10": 1,
+    "D20": 2,
+    "D40": 3,
+    "D01": 4,
+    "D11": 5,
+    "D43": 6,
+    "D44": 7,
+    "D50": 8
+}
+
+# Kelas yang dipakai model:
+# 0: D00 > Longitudinal Crack
+# 1: D10 > Transverse Crack
+# 2: D20 > Alligator Crack
+# 3: D40 > Potholes
+NUM_USED_CLASSES = 4
+
+DEFAULT_TRAIN_DIRS = [
+    "RDD2022_all_countries/Japan/train",
+    "RDD2022_all_countries/India/train",
+    "RDD2022_all_countries/China_Drone/train",
+    "RDD2022_all_countries/China_MotorBike/train",
+    "RDD2022_all_countries/Czech/train",
+    "RDD2022_all_countries/Norway/Norway/train",
+    "RDD2022_all_countries/United_States/United_States/train",
+]
+DEFAULT_SPLIT_DIRS = DEFAULT_TRAIN_DIRS[:2]
+
+SEED = 1337
+SPLIT_RATIO = 0.9
+BACKGROUND_IMAGES_PERCENTAGE = 0.1
+MANIFEST_NAME = ".convert_manifest.json"
+
+
+# ===================== Konversi Pascal VOC -> YOLOv8 =====================
+
+def _text(element, tag):
+    return element.find(".//" + tag).text
+
+
+def pascal_to_yolo(contents):
+    """Mengubah isi XML Pascal VOC menjadi teks label YOLOv8."""
+    root = ET.fromstring(contents)
+    image_size = root.find(".//size")
+    image_width = int(_text(image_size, "width"))
+    image_height = int(_text(image_size, "height"))
+
+    lines = []
+    for obj in root.iter("object"):
+        # Kelas yang tidak terdaftar dipetakan ke 10, lalu dibuang
+        _class = CLASS_MAPPING.get(_text(obj, "name"), 10)
+        if _class >= NUM_USED_CLASSES:
+            continue
+
+        _xmin = float(_text(obj, "xmin"))
+        _ymin = float(_text(obj, "ymin"))
+        _xmax = float(_text(obj, "xmax"))
+        _ymax = float(_text(obj, "ymax"))
+
+        # class x_center y_center width height (ternormalisasi)
+        w = (_xmax - _xmin)
+        h = (_ymax - _ymin)
+        cx = _xmin + (w/2)
+        cy = _ymin + (h/2)
+
+        w = round((w / image_width), 4)
+        h = round((h / image_height), 4)
+        cx = round((cx / image_width), 4)
+        cy = round((cy / image_height), 4)
+
+        lines.append(f"{_class} {cx} {cy} {w} {h}\n")
+    return "".join(lines)
+
+
+def label_path_for(xml_path):
+    """Label ditulis ke ``<train>/labels/<nama>.txt`` seperti di notebook."""
+    xml_path = Path(xml_path)
+    return xml_path.parents[2] / "labels" / (xml_path.stem + ".txt")
+
+
+def _write_atomic(path, text):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _convert_one(task):
+    xml_path, previous_hash = task
+    with open(xml_path, "rb") as f:
+        contents = f.read()
+    digest = hashlib.sha256(contents).hexdigest()
+    output_path = label_path_for(xml_path)
+    if digest == previous_hash and output_path.exists():
+        return xml_path, digest, False
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(output_path, pascal_to_yolo(contents))
+    return xml_path, digest, True
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def convert_directory(xml_dir, workers=None, incremental=True):
+    """Konversi semua XML di satu folder. Mengembalikan (jumlah file, dikonversi, detik)."""
+    start = time.perf_counter()
+    xml_files = sorted(glob.glob(os.path.join(xml_dir, "*.xml")))
+    if not xml_files:
+        return 0, 0, 0.0
+
+    manifest_path = label_path_for(xml_files[0]).parent / MANIFEST_NAME
+    manifest = _load_manifest(manifest_path) if incremental else {}
+
+    tasks = []
+    stats = {}
+    for xml_path in xml_files:
+        st = os.stat(xml_path)
+        stats[xml_path] = [st.st_mtime_ns, st.st_size]
+        entry = manifest.get(os.path.basename(xml_path))
+        if entry and entry[:2] == stats[xml_path] and label_path_for(xml_path).exists():
+            continue
+        tasks.append((xml_path, entry[2] if entry else None))
+
+    converted = 0
+    if tasks:
+        chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 8))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for xml_path, digest, written in pool.map(_convert_one, tasks, chunksize=chunksize):
+                manifest[os.path.basename(xml_path)] = stats[xml_path] + [digest]
+                converted += written
+
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(manifest_path, json.dumps(manifest))
+    return len(xml_files), converted, time.perf_counter() - start
+
+
+# ===================== Split Train/Val =====================
+
+def link_or_copy(src, dst_dir):
+    """Hardlink src ke dst_dir, fallback copy jika beda filesystem."""
+    dst = os.path.join(dst_dir, os.path.basename(src))
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return False
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return True
+
+
+def split_dataset(base_dir, base_output_dir):
+    """Split train/val deterministik, sama seperti ``CopyDatasetSplit`` di notebook."""
+    start = time.perf_counter()
+    random.seed(SEED)
+
+    country_name = Path(base_dir).parent.name
+    image_list_all = sorted(glob.glob(os.path.join(base_dir, "images", "*")))
+    annot_list_all = sorted(glob.glob(os.path.join(base_dir, "labels", "*.txt")))
+
+    # Buang gambar tanpa anotasi (background), sisakan sebagian kecil
+    image_list = []
+    annot_list = []
+    max_background_image = int(len(image_list_all) * BACKGROUND_IMAGES_PERCENTAGE)
+    _counter = 0
+    for i in range(len(annot_list_all)):
+        if os.path.getsize(annot_list_all[i]):
+            image_list.append(image_list_all[i])
+            annot_list.append(annot_list_all[i])
+        elif _counter < max_background_image:
+            image_list.append(image_list_all[i])
+            annot_list.append(annot_list_all[i])
+            _counter = _counter + 1
+
+    dataset_length = len(image_list)
+    middle_point = round(SPLIT_RATIO * dataset_length)
+    numberList = list(range(0, dataset_length))
+    random.shuffle(numberList)
+    splits = {"train": numberList[:middle_point], "val": numberList[middle_point:]}
+    print(f"{country_name} training/validation samples : {len(splits['train'])} {len(splits['val'])}")
+
+    written = 0
+    for split, indices in splits.items():
+        images_dir = os.path.join(base_output_dir, country_name, "images", split)
+        labels_dir = os.path.join(base_output_dir, country_name, "labels", split)
+        os.makedirs(images_dir, exist_ok=True)
+        os.makedirs(labels_dir, exist_ok=True)
+        for i in indices:
+            written += link_or_copy(image_list[i], images_dir)
+            written += link_or_copy(annot_list[i], labels_dir)
+    return 2 * dataset_length, written, time.perf_counter() - start
+
+
+# ===================== CLI =====================
+
+def _report(name, total, changed, seconds):
+    rate = total / seconds if seconds else 0.0
+    print(f"{name}: {total} file, {changed} diperbarui, {seconds:.1f} s ({rate:.0f} file/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="konversi XML Pascal VOC ke label YOLOv8")
+    convert_parser.add_argument("--root", required=True, help="folder root dataset RDD2022")
+    convert_parser.add_argument("--train-dirs", nargs="+", default=DEFAULT_TRAIN_DIRS)
+    convert_parser.add_argument("--workers", type=int, default=None)
+    convert_parser.add_argument("--full", action="store_true", help="konversi ulang semua file")
+
+    split_parser = subparsers.add_parser("split", help="split train/val dan susun dataset YOLOv8")
+    split_parser.add_argument("--root", required=True, help="folder root dataset RDD2022")
+    split_parser.add_argument("--output", required=True, help="folder dataset keluaran")
+    split_parser.add_argument("--train-dirs", nargs="+", default=DEFAULT_SPLIT_DIRS)
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        for train_dir in args.train_dirs:
+            xml_dir = os.path.join(args.root, train_dir, "annotations", "xmls")
+            _report(train_dir, *convert_directory(xml_dir, args.workers, incremental=not args.full))
+    else:
+        for train_dir in args.train_dirs:
+            _report(train_dir, *split_dataset(os.path.join(args.root, train_dir), args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Kontrol penerimaan (admission control) pekerjaan inferensi per pengguna.
+
+``cpu_scheduler`` membagi CPU per panggilan ``predict``; modul ini
+membatasi *pekerjaan* utuh sebelum dimulai: satu stream realtime, satu
+deteksi gambar (atau batch), atau satu pemrosesan video. Untuk setiap
+jenis pekerjaan berlaku:
+
+- token bucket per pengguna: pekerjaan baru ditolak (dengan waktu tunggu
+  yang disarankan) bila pengguna memulai terlalu banyak dalam waktu singkat;
+- batas pekerjaan bersamaan per pengguna dan global: pekerjaan yang
+  melebihinya masuk antrean FIFO dengan posisi dan perkiraan waktu tunggu;
+- antrean dibatasi ``max_queue``; di atas itu pekerjaan ditolak.
+
+Batas bisa diubah lewat environment, mis. ``ROADGUARD_ADMISSION_VIDEO_GLOBAL=3``
+atau ``ROADGUARD_ADMISSION_IMAGE_RATE=30`` (per menit). Setiap keputusan
+dicatat di metrik ``admission.<jenis>_<keputusan>`` dan waktu antre di
+``admission.<jenis>_wait``.
+"""
+import contextlib
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+from utils import metrics
+
+REALTIME = "realtime"
+IMAGE = "image"
+VIDEO = "video"
+
+# Tiket realtime yang tidak disentuh callback selama ini dianggap ditinggalkan
+LEASE_SECONDS = 30.0
+
+
+class Limits(NamedTuple):
+    per_user: int
+    global_limit: int
+    rate_per_minute: float
+    burst: int
+    max_queue: int
+    typical_seconds: float  # perkiraan awal durasi pekerjaan untuk ETA
+
+
+DEFAULT_LIMITS = {
+    REALTIME: Limits(per_user=1, global_limit=4, rate_per_minute=6, burst=3, max_queue=8, typical_seconds=300),
+    IMAGE: Limits(per_user=2, global_limit=8, rate_per_minute=60, burst=20, max_queue=64, typical_seconds=2),
+    VIDEO: Limits(per_user=1, global_limit=2, rate_per_minute=0.5, burst=3, max_queue=16, typical_seconds=120),
+}
+
+
+def limits_from_env(kind, defaults=None):
+    defaults = defaults or DEFAULT_LIMITS[kind]
+    prefix = f"ROADGUARD_ADMISSION_{kind.upper()}_"
+    return Limits(
+        per_user=int(os.environ.get(prefix + "PER_USER", defaults.per_user)),
+        global_limit=int(os.environ.get(prefix + "GLOBAL", defaults.global_limit)),
+        rate_per_minute=float(os.environ.get(prefix + "RATE", defaults.rate_per_minute)),
+        burst=int(os.environ.get(prefix + "BURST", defaults.burst)),
+        max_queue=int(os.environ.get(prefix + "MAX_QUEUE", defaults.max_queue)),
+        typical_seconds=defaults.typical_seconds,
+    )
+
+
+class Rejected(Exception):
+    """Pekerjaan ditolak; ``retry_after`` dalam detik (None bila tidak tentu)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst, now=None):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic() if now is None else now
+
+    def take(self, now):
+        """Mengambil satu token. Mengembalikan 0 jika berhasil, atau detik sampai token tersedia."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class Ticket:
+    def __init__(self, ticket_id, user, kind):
+        self.id = ticket_id
+        self.user = user
+        self.kind = kind
+        self.created = time.monotonic()
+        self.admitted_at = None
+        self.last_seen = self.created
+        self.admitted = threading.Event()
+        # Dicabut saat lease habis; pemegangnya harus meminta tiket baru
+        self.revoked = False
+
+    def touch(self):
+        """Menandai tiket masih dipakai (dipanggil callback realtime per frame)."""
+        self.last_seen = time.monotonic()
+
+
+class AdmissionController:
+    def __init__(self, limits=None):
+        self.limits = limits or {kind: limits_from_env(kind) for kind in DEFAULT_LIMITS}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._buckets = {}
+        self._queues = {kind: deque() for kind in self.limits}
+        self._running = {kind: {} for kind in self.limits}
+        # Rata-rata bergerak durasi pekerjaan per jenis, untuk perkiraan waktu tunggu
+        self._durations = {kind: limits.typical_seconds for kind, limits in self.limits.items()}
+
+    def _count(self, kind, decision, amount=1):
+        metrics.count(f"admission.{kind}_{decision}", amount)
+
+    def _can_start(self, ticket):
+        limits = self.limits[ticket.kind]
+        running = self._running[ticket.kind]
+        if len(running) >= limits.global_limit:
+            return False
+        return sum(1 for t in running.values() if t.user == ticket.user) < limits.per_user
+
+    def _admit_waiting(self, kind):
+        # FIFO, tetapi pengguna yang sudah di batasnya tidak menahan pengguna lain di belakangnya
+        queue = self._queues[kind]
+        for ticket in list(queue):
+            if len(self._running[kind]) >= self.limits[kind].global_limit:
+                break
+            if self._can_start(ticket):
+                queue.remove(ticket)
+                self._start(ticket)
+
+    def _start(self, ticket):
+        ticket.admitted_at = ticket.last_seen = time.monotonic()
+        self._running[ticket.kind][ticket.id] = ticket
+        ticket.admitted.set()
+        metrics.observe(f"admission.{ticket.kind}_wait", ticket.admitted_at - ticket.created)
+
+    def _reap(self, now):
+        # Stream realtime yang ditinggalkan (tab ditutup) tidak boleh menahan slot selamanya.
+        # Tiketnya dicabut, jadi callback yang ternyata masih hidup berhenti inferensi
+        # sampai mendapat tiket baru, dan batas global tetap berlaku.
+        expired = [t for t in self._running[REALTIME].values() if now - t.last_seen > LEASE_SECONDS]
+        for ticket in expired:
+            del self._running[REALTIME][ticket.id]
+        abandoned = [t for t in self._queues[REALTIME] if now - t.last_seen > LEASE_SECONDS]
+        for ticket in abandoned:
+            self._queues[REALTIME].remove(ticket)
+        for ticket in expired + abandoned:
+            ticket.admitted.clear()
+            ticket.revoked = True
+        if expired or abandoned:
+            self._count(REALTIME, "expired", len(expired) + len(abandoned))
+            self._admit_waiting(REALTIME)
+
+    def request(self, user, kind):
+        """Meminta izin menjalankan pekerjaan; mengembalikan ``Ticket`` (mungkin masih antre).
+
+        Melempar ``Rejected`` jika kena batas laju atau antrean penuh.
+        """
+        limits = self.limits[kind]
+        now = time.monotonic()
+        with self._lock:
+            self._reap(now)
+            bucket = self._buckets.get((user, kind))
+            if bucket is None:
+                bucket = self._buckets[(user, kind)] = TokenBucket(limits.rate_per_minute, limits.burst, now)
+            retry_after = bucket.take(now)
+            if retry_after:
+                self._count(kind, "rejected_rate")
+                raise Rejected("Terlalu banyak permintaan, coba lagi nanti.", retry_after)
+            if len(self._queues[kind]) >= limits.max_queue:
+                self._count(kind, "rejected_queue")
+                raise Rejected("Antrean penuh, coba lagi nanti.")
+
+            ticket = Ticket(next(self._ids), user, kind)
+            self._queues[kind].append(ticket)
+            self._admit_waiting(kind)
+            self._count(kind, "admitted" if ticket.admitted.is_set() else "queued")
+            return ticket
+
+    def release(self, ticket):
+        """Mengakhiri pekerjaan (atau membatalkan antrean) dan menjalankan antrean berikutnya."""
+        with self._lock:
+            running = self._running[ticket.kind]
+            if running.pop(ticket.id, None) is not None:
+                duration = time.monotonic() - ticket.admitted_at
+                self._durations[ticket.kind] = 0.8 * self._durations[ticket.kind] + 0.2 * duration
+            elif ticket in self._queues[ticket.kind]:
+                self._queues[ticket.kind].remove(ticket)
+                self._count(ticket.kind, "cancelled")
+            self._admit_waiting(ticket.kind)
+
+    def position(self, ticket):
+        """(posisi antrean mulai 1, perkiraan tunggu dalam detik); (0, 0) jika sudah berjalan."""
+        with self._lock:
+            self._reap(time.monotonic())
+            if ticket.admitted.is_set():
+                return 0, 0.0
+            try:
+                index = self._queues[ticket.kind].index(ticket)
+            except ValueError:
+                return 0, 0.0
+            limits = self.limits[ticket.kind]
+            # Setiap "gelombang" global_limit pekerjaan butuh kira-kira satu durasi rata-rata
+            waves = index // max(limits.global_limit, 1) + 1
+            return index + 1, waves * self._durations[ticket.kind]
+
+    def stats(self):
+        with self._lock:
+            return {
+                kind: {"running": len(self._running[kind]), "queued": len(self._queues[kind])}
+                for kind in self.limits
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
+
+
+@contextlib.contextmanager
+def admit(user, kind, on_wait=None, poll=0.5):
+    """Menunggu giliran pekerjaan ``kind`` untuk ``user`` lalu menjalankan blok di dalamnya.
+
+    ``on_wait(posisi, perkiraan_detik)`` dipanggil berkala selama antre.
+    Tiket dilepas saat blok selesai, gagal, atau skrip Streamlit dihentikan.
+    """
+    controller = get_controller()
+    ticket = controller.request(user, kind)
+    try:
+        while not ticket.admitted.wait(poll):
+            if on_wait is not None:
+                on_wait(*controller.position(ticket))
+        yield ticket
+    finally:
+        controller.release(ticket)
+
+
+def render_queue_status(placeholder, kind_label):
+    """Callback ``on_wait`` yang menulis posisi antrean ke placeholder Streamlit."""
+    def show(position, eta):
+        placeholder.info(
+            f"⏳ {kind_label} menunggu giliran: posisi {position} dalam antrean, "
+            f"perkiraan {max(eta, 1):.0f} detik."
+        )
+    return show
+
+
+def describe_rejection(error):
+    """Pesan untuk pengguna dari ``Rejected``, dengan waktu tunggu bila diketahui."""
+    if error.retry_after is None or error.retry_after == float("inf"):
+        return f"🚦 {error}"
+    return f"🚦 {error} Silakan coba lagi dalam {max(error.retry_after, 1):.0f} detik."
@@ -0,0 +1,416 @@
+"""Arsip bulanan laporan dan deteksi lama dalam file Parquet.
+
+Tabel MySQL ``reports`` dan ``detections`` hanya menyimpan data "panas".
+``compact`` memindahkan laporan yang lebih tua dari ``HOT_MONTHS`` bulan
+beserta deteksinya ke::
+
+    ARCHIVE_DIR/reports/<YYYY-MM>/r<id_awal>-<id_akhir>.parquet
+    ARCHIVE_DIR/detections/<YYYY-MM>/r<id_awal>-<id_akhir>.parquet
+
+File deteksi berisi baris join laporan-deteksi (kolom ``utils.export`` plus
+geohash), jadi ekspor dan agregasi arsip tidak perlu join ulang. Laporan
+dipindah per bagian ``REPORTS_PER_PART``: file ditulis dulu (tmp lalu
+``os.replace``), baru baris panasnya dihapus dalam transaksi kecil per
+``DELETE_ROWS`` deteksi, sehingga tabel tidak terkunci lama. Nama file
+ditentukan oleh rentang report_id, jadi job yang terputus aman diulang:
+laporan yang sudah ada di file arsip hanya dilanjutkan penghapusannya.
+
+Query dashboard dan ekspor menggabungkan hasil tabel panas dengan arsip.
+Rentang tanggal hanya membaca folder bulan yang bersinggungan. Agregat dan
+kolom yang dibaca tiap render dashboard di-cache per file arsip (``_per_part``).
+
+Contoh (dijalankan berkala, mis. lewat cron):
+    python -m utils.archive compact --hot-months 12
+    python -m utils.archive status
+"""
+import argparse
+import collections
+import datetime
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+from sample_utils.download import file_lock
+from utils import export, metrics
+from utils.geo import geohash_cover, zoom_to_precision
+
+ARCHIVE_DIR = Path(os.environ.get("ROADGUARD_ARCHIVE_DIR", "archive"))
+HOT_MONTHS = int(os.environ.get("ROADGUARD_HOT_MONTHS", "12"))
+REPORTS_PER_PART = 1000
+DELETE_ROWS = 5000
+
+REPORT_COLUMNS = [
+    ("report_id", "report_id", "int64"),
+    ("road_name", "road_name", "string"),
+    ("report_description", "report_description", "string"),
+    ("pothole_severity", "pothole_severity", "string"),
+    ("upload_time", "upload_time", "timestamp"),
+    ("image_name", "image_name", "string"),
+    ("video_name", "video_name", "string"),
+    ("annotated_image", "annotated_image", "binary"),
+    ("latitude", "latitude", "float64"),
+    ("longitude", "longitude", "float64"),
+    ("geohash", "geohash", "string"),
+]
+DETECTION_COLUMNS = export.COLUMNS + [("d.geohash", "geohash", "string")]
+TABLE_COLUMNS = {"reports": REPORT_COLUMNS, "detections": DETECTION_COLUMNS}
+
+_PART_NAME = re.compile(r"r(\d+)-(\d+)\.parquet$")
+# Hasil baca/agregasi per file arsip, di-key mtime dan ukuran file. Bagian bulan lama jarang
+# berubah, jadi render dashboard tidak membaca ulang seluruh arsip; bagian yang ditulis ulang
+# (kompaksi dilanjutkan, hapus laporan) otomatis dibaca lagi
+_part_cache = {}
+
+
+def month_start(value):
+    value = export._to_timestamp(value)
+    return datetime.datetime(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def part_path(table, month, first_id, last_id, root=None):
+    return Path(root or ARCHIVE_DIR) / table / f"{month:%Y-%m}" / f"r{first_id}-{last_id}.parquet"
+
+
+def parts(table, start_date=None, end_date=None, root=None):
+    """File arsip ``table`` pada bulan yang bersinggungan dengan rentang tanggal (inklusif)."""
+    base = Path(root or ARCHIVE_DIR) / table
+    if not base.is_dir():
+        return []
+    first = month_start(datetime.datetime.combine(start_date, datetime.time())) if start_date else None
+    last = month_start(datetime.datetime.combine(end_date, datetime.time())) if end_date else None
+    paths = []
+    for month_dir in sorted(base.iterdir()):
+        try:
+            month = datetime.datetime.strptime(month_dir.name, "%Y-%m")
+        except ValueError:
+            continue
+        if (first and month < first) or (last and month > last):
+            continue
+        paths.extend(sorted(p for p in month_dir.glob("*.parquet") if _PART_NAME.search(p.name)))
+    return paths
+
+
+# ===================== Kompaksi =====================
+
+def _write_part(path, columns, chunks):
+    """Menulis satu file arsip secara atomik. Mengembalikan jumlah baris."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".parquet.tmp")
+    with open(tmp, "wb") as output:
+        rows = export.write_parquet(chunks, output, columns)
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(tmp, path)
+    return rows
+
+
+def _counting(chunks, counter, key_index=0):
+    # Jumlah deteksi per laporan dicatat sambil menulis, untuk membagi transaksi hapus
+    for rows in chunks:
+        counter.update(row[key_index] for row in rows)
+        yield rows
+
+
+def _covering_part(month_dir, report_id):
+    """(id_awal, id_akhir) file laporan di ``month_dir`` yang rentangnya memuat ``report_id``."""
+    for path in month_dir.glob("r*.parquet"):
+        match = _PART_NAME.search(path.name)
+        if match and int(match.group(1)) <= report_id <= int(match.group(2)):
+            return int(match.group(1)), int(match.group(2))
+    return None
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def _delete_hot(connection, report_ids, detection_counts, delete_rows=DELETE_ROWS):
+    """Menghapus laporan panas dalam transaksi kecil (sekitar ``delete_rows`` deteksi per transaksi)."""
+    batch, batch_rows = [], 0
+    for report_id in report_ids + [None]:
+        if report_id is not None:
+            batch.append(report_id)
+            batch_rows += detection_counts.get(report_id, 0) + 1
+            if batch_rows < delete_rows:
+                continue
+        if not batch:
+            break
+        with metrics.timer("archive.delete"), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM detections WHERE report_id IN ({_placeholders(batch)})", batch)
+            cursor.execute(f"DELETE FROM reports WHERE report_id IN ({_placeholders(batch)})", batch)
+        connection.commit()
+        batch, batch_rows = [], 0
+
+
+def compact(connection, hot_months=HOT_MONTHS, reports_per_part=REPORTS_PER_PART, delete_rows=DELETE_ROWS,
+            now=None, root=None, log=None):
+    """Memindahkan laporan sebelum awal bulan (sekarang - ``hot_months``) ke arsip.
+
+    Mengembalikan ``{bulan: [laporan, deteksi]}`` yang dipindah pada run ini.
+    """
+    root = Path(root or ARCHIVE_DIR)
+    cutoff = add_months(month_start(now or datetime.datetime.now()), -hot_months)
+    moved = collections.defaultdict(lambda: [0, 0])
+    root.mkdir(parents=True, exist_ok=True)
+    with file_lock(root / ".compact.lock"):
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT MIN(upload_time) FROM reports WHERE upload_time < %s", (str(cutoff),))
+                oldest = cursor.fetchone()[0]
+                if oldest is None:
+                    break
+                month = month_start(oldest)
+                cursor.execute(
+                    "SELECT report_id FROM reports WHERE upload_time >= %s AND upload_time < %s "
+                    "ORDER BY report_id LIMIT %s",
+                    (str(month), str(add_months(month, 1)), reports_per_part),
+                )
+                report_ids = [row[0] for row in cursor.fetchall()]
+
+            start = time.perf_counter()
+            counts = collections.Counter()
+            # Run sebelumnya bisa terhenti di tengah penghapusan: sisa laporannya sudah ada di arsip
+            resumed = _covering_part(root / "reports" / f"{month:%Y-%m}", report_ids[0])
+            if resumed is None:
+                reports_path = part_path("reports", month, report_ids[0], report_ids[-1], root)
+                detections_path = part_path("detections", month, report_ids[0], report_ids[-1], root)
+                in_list = _placeholders(report_ids)
+                # Deteksi ditulis dulu; file laporan menandai bagian ini lengkap
+                sql = (f"SELECT {', '.join(c for c, _, _ in DETECTION_COLUMNS)} FROM reports r "
+                       f"JOIN detections d ON d.report_id = r.report_id WHERE r.report_id IN ({in_list})")
+                _write_part(detections_path, DETECTION_COLUMNS,
+                            _counting(export.iter_chunks(connection, sql, report_ids), counts))
+                sql = (f"SELECT {', '.join(c for c, _, _ in REPORT_COLUMNS)} FROM reports "
+                       f"WHERE report_id IN ({in_list}) ORDER BY report_id")
+                _write_part(reports_path, REPORT_COLUMNS, export.iter_chunks(connection, sql, report_ids))
+            else:
+                reports_path = part_path("reports", month, *resumed, root)
+                report_ids = [report_id for report_id in report_ids if report_id <= resumed[1]]
+                in_list = _placeholders(report_ids)
+                with connection.cursor() as cursor:
+                    cursor.execute(f"SELECT report_id, COUNT(*) FROM detections WHERE report_id IN ({in_list}) "
+                                   "GROUP BY report_id", report_ids)
+                    counts.update(dict(cursor.fetchall()))
+            _delete_hot(connection, report_ids, counts, delete_rows)
+
+            key = f"{month:%Y-%m}"
+            moved[key][0] += len(report_ids)
+            moved[key][1] += sum(counts.values())
+            metrics.count("archive.reports", len(report_ids))
+            metrics.count("archive.detections", sum(counts.values()))
+            metrics.observe("archive.part", time.perf_counter() - start)
+            if log is not None:
+                log(f"{key}: {len(report_ids)} laporan, {sum(counts.values())} deteksi -> {reports_path.name} "
+                    f"({time.perf_counter() - start:.1f} detik)")
+    return dict(moved)
+
+
+# ===================== Query Arsip =====================
+
+def count_rows(table, root=None):
+    """Jumlah baris arsip ``table``, dari metadata Parquet saja."""
+    paths = parts(table, root=root)
+    if not paths:
+        return 0
+    import pyarrow.parquet as pq
+
+    return sum(pq.ParquetFile(path).metadata.num_rows for path in paths)
+
+
+def _date_filters(start_date, end_date):
+    filters = []
+    if start_date:
+        filters.append(("upload_time", ">=", datetime.datetime.combine(start_date, datetime.time())))
+    if end_date:
+        filters.append(("upload_time", "<", datetime.datetime.combine(end_date + datetime.timedelta(days=1),
+                                                                      datetime.time())))
+    return filters
+
+
+def read_table(table, columns=None, start_date=None, end_date=None, filters=None, root=None):
+    """Tabel Arrow dari arsip ``table``, disaring per tanggal unggah (inklusif) dan ``filters``."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    filters = _date_filters(start_date, end_date) + list(filters or [])
+    tables = [pq.read_table(path, columns=columns, filters=filters or None)
+              for path in parts(table, start_date, end_date, root)]
+    if not tables:
+        schema = export.parquet_schema(TABLE_COLUMNS[table])
+        return (schema if columns is None else pa.schema([schema.field(c) for c in columns])).empty_table()
+    return pa.concat_tables(tables)
+
+
+def iter_export_chunks(start_date=None, end_date=None, severities=None, classes=None,
+                       chunk_size=export.CHUNK_SIZE, root=None):
+    """Baris arsip untuk ``utils.export``, dalam urutan ``export.HEADER``."""
+    paths = parts("detections", start_date, end_date, root)
+    if not paths:
+        return
+    import pyarrow.parquet as pq
+
+    filters = _date_filters(start_date, end_date)
+    if severities:
+        filters.append(("severity", "in", list(severities)))
+    if classes:
+        filters.append(("class_label", "in", list(classes)))
+    for path in paths:
+        table = pq.read_table(path, columns=export.HEADER, filters=filters or None)
+        for batch in table.to_batches(max_chunksize=chunk_size):
+            yield list(zip(*(column.to_pylist() for column in batch.columns)))
+
+
+def _per_part(path, name, compute):
+    """``compute(path)`` untuk satu file arsip, di-cache sampai file itu berubah."""
+    stat = path.stat()
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    key = (str(path), name)
+    cached = _part_cache.get(key)
+    if cached is None or cached[0] != stamp:
+        cached = _part_cache[key] = (stamp, compute(path))
+        metrics.count("archive.part_cache_misses")
+    return cached[1]
+
+
+def cached_table(table, columns, root=None):
+    """Seperti ``read_table`` tanpa filter, tetapi kolom tiap file arsip di-cache per mtime.
+
+    Untuk kolom kecil yang dibaca setiap render dashboard (bukan ``annotated_image``).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    name = ("columns",) + tuple(columns)
+    tables = [_per_part(path, name, lambda p: pq.read_table(p, columns=list(columns)))
+              for path in parts(table, root=root)]
+    if not tables:
+        schema = export.parquet_schema(TABLE_COLUMNS[table])
+        return pa.schema([schema.field(c) for c in columns]).empty_table()
+    return pa.concat_tables(tables)
+
+
+def severity_counts(root=None):
+    """``{tingkat kerusakan: jumlah laporan}`` di arsip, dijumlah dari hitungan per file (di-cache)."""
+    import pyarrow.parquet as pq
+
+    def count(path):
+        return collections.Counter(pq.read_table(path, columns=["pothole_severity"]).column(0).to_pylist())
+
+    counts = collections.Counter()
+    for path in parts("reports", root=root):
+        counts.update(_per_part(path, "severity_counts", count))
+    return counts
+
+
+def cluster_detections(zoom, bbox=None, root=None):
+    """Seperti ``utils.geo.cluster_detections`` untuk deteksi di arsip (diagregasi per file)."""
+    paths = parts("detections", root=root)
+    if not paths:
+        return []
+    import pyarrow.parquet as pq
+
+    precision = zoom_to_precision(zoom)
+    clusters = []
+    for path in paths:
+        frame = pq.read_table(path, columns=["geohash", "class_label", "latitude", "longitude"]).to_pandas()
+        frame = frame[frame["geohash"].notna()]
+        if bbox is not None:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            frame = frame[frame["latitude"].between(min_lat, max_lat) & frame["longitude"].between(min_lon, max_lon)]
+            prefixes = tuple(geohash_cover(*bbox))
+            frame = frame[frame["geohash"].str.startswith(prefixes)]
+        if frame.empty:
+            continue
+        frame["cell"] = frame["geohash"].str[:precision]
+        grouped = frame.groupby(["cell", "class_label"]).agg(
+            count=("latitude", "size"), latitude=("latitude", "mean"), longitude=("longitude", "mean")
+        )
+        clusters.extend(grouped.reset_index().to_dict("records"))
+    return clusters
+
+
+def _parts_containing(table, report_id, root=None):
+    for path in parts(table, root=root):
+        first, last = map(int, _PART_NAME.search(path.name).groups())
+        if first <= report_id <= last:
+            yield path
+
+
+def get_report(report_id, root=None):
+    """Laporan arsip sebagai dict kolom ``REPORT_COLUMNS``, atau None."""
+    import pyarrow.parquet as pq
+
+    for path in _parts_containing("reports", report_id, root):
+        rows = pq.read_table(path, filters=[("report_id", "=", report_id)]).to_pylist()
+        if rows:
+            return rows[0]
+    return None
+
+
+def delete_report(report_id, root=None):
+    """Menghapus laporan dari arsip dengan menulis ulang file bagiannya. Mengembalikan True jika ada."""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    root = Path(root or ARCHIVE_DIR)
+    found = False
+    with file_lock(root / ".compact.lock"):
+        for table in ("detections", "reports"):
+            for path in list(_parts_containing(table, report_id, root)):
+                data = pq.read_table(path)
+                keep = pc.not_equal(data.column("report_id"), report_id)
+                if pc.all(keep).as_py():
+                    continue
+                found = True
+                tmp = path.with_suffix(".parquet.tmp")
+                pq.write_table(data.filter(keep), tmp, compression="zstd")
+                os.replace(tmp, path)
+    return found
+
+
+# ===================== CLI =====================
+
+def main():
+    from utils.db import create_connection
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact_parser = commands.add_parser("compact", help="pindahkan bulan lama ke arsip")
+    compact_parser.add_argument("--hot-months", type=int, default=HOT_MONTHS)
+    compact_parser.add_argument("--reports-per-part", type=int, default=REPORTS_PER_PART)
+    compact_parser.add_argument("--delete-rows", type=int, default=DELETE_ROWS)
+    commands.add_parser("status", help="ringkasan isi arsip per bulan")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        import pyarrow.parquet as pq
+
+        months = collections.defaultdict(lambda: [0, 0, 0])
+        for column, table in enumerate(("reports", "detections")):
+            for path in parts(table):
+                months[path.parent.name][column] += pq.ParquetFile(path).metadata.num_rows
+                months[path.parent.name][2] += path.stat().st_size
+        print(f"{'bulan':<8} {'laporan':>10} {'deteksi':>12} {'MB':>8}")
+        for month, (reports, detections, size) in sorted(months.items()):
+            print(f"{month:<8} {reports:>10,} {detections:>12,} {size / 2**20:>8.1f}")
+        return
+
+    connection = create_connection()
+    try:
+        moved = compact(connection, args.hot_months, args.reports_per_part, args.delete_rows,
+                        log=lambda line: print(line, file=sys.stderr))
+    finally:
+        connection.close()
+    total = [sum(values) for values in zip(*moved.values())] or [0, 0]
+    print(f"{total[0]} laporan dan {total[1]} deteksi dipindah ke {ARCHIVE_DIR}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
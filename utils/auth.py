@@ -1,26 +1,180 @@
+import base64
+import hashlib
+import hmac
 import json
 import os
+import secrets
+import time
 
-USER_DATA_FILE = 'user_data.json'
+import bcrypt
 
-def load_user_data():
-    if os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+from utils import user_store
 
-def save_user_data(user_data):
-    with open(USER_DATA_FILE, 'w') as f:
-        json.dump(user_data, f)
+# Cost factor bcrypt, bisa diatur lewat environment (minimal 4)
+BCRYPT_ROUNDS = max(4, int(os.environ.get("ROADGUARD_BCRYPT_ROUNDS", "12")))
 
-def register_user(username, password):
-    user_data = load_user_data()
-    if username in user_data:
-        return False  # Username already exists
-    user_data[username] = password
-    save_user_data(user_data)
+# Masa berlaku token sesi dalam detik (default 8 jam)
+SESSION_TTL = int(os.environ.get("ROADGUARD_SESSION_TTL", str(8 * 3600)))
+SECRET_KEY_FILE = os.environ.get("ROADGUARD_SECRET_KEY_FILE", ".session_secret")
+
+
+# ===================== Hashing Password =====================
+
+def _to_bytes(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    return str(value).encode("utf-8")
+
+
+def hash_password(password, rounds=None):
+    """Meng-hash password dengan bcrypt dan mengembalikannya sebagai string."""
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
+    return bcrypt.hashpw(_to_bytes(password), salt).decode("ascii")
+
+
+def is_bcrypt_hash(stored):
+    """Cek apakah nilai di database sudah berupa hash bcrypt."""
+    if stored is None:
+        return False
+    stored = _to_bytes(stored)
+    return stored[:4] in (b"$2a$", b"$2b$", b"$2y$") and len(stored) == 60
+
+
+def needs_rehash(stored):
+    """Hash perlu diperbarui jika masih plaintext atau cost factor-nya berbeda."""
+    if not is_bcrypt_hash(stored):
+        return True
+    return int(_to_bytes(stored)[4:6]) != BCRYPT_ROUNDS
+
+
+def verify_password(password, stored):
+    """Memverifikasi password terhadap nilai tersimpan.
+
+    Baris lama yang masih plaintext dibandingkan dengan waktu konstan supaya
+    bisa di-upgrade ke bcrypt saat login berikutnya.
+    """
+    if stored is None:
+        return False
+    if is_bcrypt_hash(stored):
+        return bcrypt.checkpw(_to_bytes(password), _to_bytes(stored))
+    return hmac.compare_digest(_to_bytes(password), _to_bytes(stored))
+
+
+# ===================== Token Sesi =====================
+
+def _load_secret_key():
+    env_key = os.environ.get("ROADGUARD_SECRET_KEY")
+    if env_key:
+        return env_key.encode("utf-8")
+    try:
+        with open(SECRET_KEY_FILE, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    key = secrets.token_bytes(32)
+    try:
+        fd = os.open(SECRET_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Proses lain sudah membuat key lebih dulu
+        with open(SECRET_KEY_FILE, "rb") as f:
+            return f.read()
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+SECRET_KEY = _load_secret_key()
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload):
+    return hmac.new(SECRET_KEY, payload, hashlib.sha256).digest()
+
+
+def issue_session_token(username, ttl=None):
+    """Membuat token sesi bertanda tangan HMAC untuk username."""
+    expires = int(time.time()) + (ttl or SESSION_TTL)
+    payload = json.dumps([username, expires], separators=(",", ":")).encode("utf-8")
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def validate_session_token(token):
+    """Mengembalikan username jika token valid dan belum kedaluwarsa, selain itu None."""
+    if not token or not isinstance(token, str):
+        return None
+    try:
+        payload_b64, signature_b64 = token.split(".", 1)
+        payload = _b64decode(payload_b64)
+        signature = _b64decode(signature_b64)
+    except (ValueError, TypeError):
+        return None
+    if not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    username, expires = json.loads(payload)
+    if expires < time.time():
+        return None
+    return username
+
+
+# ===================== Status Login di Session State =====================
+
+def login_session(session_state, username):
+    session_state['session_token'] = issue_session_token(username)
+    session_state['logged_in'] = True
+    session_state['username'] = username
+
+
+def logout_session(session_state):
+    session_state['session_token'] = None
+    session_state['logged_in'] = False
+    session_state['username'] = None
+
+
+def is_logged_in(session_state):
+    """Cek login tanpa query ke database, cukup validasi token sesi."""
+    username = validate_session_token(session_state.get('session_token'))
+    if username is None or username != session_state.get('username'):
+        return False
+    return True
+
+
+# ===================== Otentikasi ke Database =====================
+
+def authenticate_db_user(connection, username, password):
+    """Verifikasi login ke tabel users, sekaligus upgrade password lama ke bcrypt."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT password FROM users WHERE username = %s", (username,))
+        row = cursor.fetchone()
+        if row is None:
+            return False
+        stored = row["password"] if isinstance(row, dict) else row[0]
+        if not verify_password(password, stored):
+            return False
+        if needs_rehash(stored):
+            cursor.execute(
+                "UPDATE users SET password = %s WHERE username = %s",
+                (hash_password(password), username),
+            )
+            connection.commit()
     return True
 
+
+# ===================== Penyimpanan Lokal (Fallback) =====================
+
+def register_user(username, password):
+    return user_store.add_user(username, hash_password(password))
+
 def authenticate_user(username, password):
-    user_data = load_user_data()
-    return user_data.get(username) == password
\ No newline at end of file
+    stored = user_store.get_password(username)
+    if not verify_password(password, stored):
+        return False
+    if needs_rehash(stored):
+        user_store.set_password(username, hash_password(password))
+    return True
@@ -0,0 +1,128 @@
+"""Deteksi banyak gambar sekaligus: decode paralel dan inferensi per batch.
+
+Decode (JPEG dengan skala DCT, lihat ``utils.image_decode``) dan resize
+melepas GIL, jadi dijalankan di thread pool sementara thread utama
+menjalankan ``predict`` untuk batch sebelumnya.
+Jumlah gambar yang sudah didecode tapi belum diinferensi dibatasi supaya
+ratusan foto survei tidak dimuat ke memori sekaligus.
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+import cv2
+
+from utils import cpu_scheduler, metrics
+from utils.crop_store import image_crops
+from utils.image_decode import decode_resized
+
+BATCH_SIZE = 8
+
+
+class BatchResult(NamedTuple):
+    name: str
+    annotated_png: bytes
+    detections: List[dict]
+    location: Optional[Tuple[float, float]]
+    # Crop JPEG per deteksi untuk ``crop_store`` (label, skor, frame, box, jpeg)
+    crops: List[tuple]
+    # Pesan kesalahan jika gambar gagal didecode; kolom lain kosong
+    error: Optional[str] = None
+
+
+def decode_image(data, imgsz):
+    """Decode bytes gambar ke array RGB berukuran (imgsz, imgsz) plus lokasi EXIF."""
+    with metrics.timer("batch.decode"):
+        return decode_resized(data, imgsz)
+
+
+def iter_decoded(items, imgsz, workers=None, prefetch=None):
+    """Menghasilkan (nama, gambar, lokasi, error) sesuai urutan ``items`` (nama, bytes).
+
+    Gambar yang gagal didecode menghasilkan ``gambar=None`` dan pesan ``error``.
+    """
+    workers = workers or min(8, os.cpu_count() or 1)
+    prefetch = prefetch or workers * 2 + BATCH_SIZE
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as pool:
+        pending = deque()
+        for name, data in items:
+            pending.append((name, pool.submit(decode_image, data, imgsz)))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            name, future = pending.popleft()
+            next_item = next(items, None)
+            if next_item is not None:
+                pending.append((next_item[0], pool.submit(decode_image, next_item[1], imgsz)))
+            try:
+                image, location = future.result()
+            except Exception as e:
+                # Satu file rusak atau terpotong tidak boleh menggagalkan seluruh batch
+                metrics.count("batch.decode_errors")
+                yield name, None, None, str(e) or type(e).__name__
+                continue
+            yield name, image, location, None
+
+
+def detect_batches(model, items, classes, imgsz=640, conf=0.5, batch_size=BATCH_SIZE, workers=None):
+    """Menjalankan deteksi untuk semua ``items`` dan menghasilkan ``BatchResult`` per gambar.
+
+    Gambar yang gagal didecode menghasilkan ``BatchResult`` dengan ``error`` terisi.
+    """
+    batch = []
+    for name, image, location, error in iter_decoded(items, imgsz, workers):
+        if error is not None:
+            yield BatchResult(name, b"", [], None, [], error)
+            continue
+        batch.append((name, image, location))
+        if len(batch) == batch_size:
+            yield from _predict_batch(model, batch, classes, imgsz, conf)
+            batch = []
+    if batch:
+        yield from _predict_batch(model, batch, classes, imgsz, conf)
+
+
+def _predict_batch(model, batch, classes, imgsz, conf):
+    with metrics.timer("batch.inference"):
+        # Batch foto survei bukan pekerjaan interaktif, jadi antre seperti video
+        # decode_resized menghasilkan RGB, sedangkan ultralytics menganggap array NumPy BGR
+        # (sama seperti services/inference_server.py)
+        results = cpu_scheduler.predict(
+            model, [cv2.cvtColor(image, cv2.COLOR_RGB2BGR) for _, image, _ in batch], cpu_scheduler.VIDEO,
+            conf=conf, imgsz=imgsz, verbose=False,
+        )
+    metrics.count("batch.batches")
+    for (name, image, location), result in zip(batch, results):
+        with metrics.timer("batch.annotate"):
+            annotated = result.plot()
+        with metrics.timer("batch.encode"):
+            # plot() menggambar di atas gambar input (BGR), langsung cocok untuk imencode
+            _, png = cv2.imencode(".png", annotated)
+        with metrics.timer("batch.extract"):
+            data = result.boxes.data.cpu().numpy()
+            detections = [
+                {"name": classes[int(r[5])], "confidence": float(r[4]), "box": tuple(int(v) for v in r[:4])}
+                for r in data
+            ]
+        with metrics.timer("batch.crops"):
+            crops = image_crops(image, detections)
+        metrics.count("batch.images")
+        metrics.count("batch.detections", len(detections))
+        yield BatchResult(name, png.tobytes(), detections, location, crops)
+
+
+def run_batch(model, items, classes, imgsz=640, conf=0.5, batch_size=BATCH_SIZE, progress=None):
+    """Memproses semua gambar; mengembalikan (daftar BatchResult, detik total).
+
+    ``progress`` dipanggil dengan jumlah gambar yang sudah selesai.
+    """
+    start = time.perf_counter()
+    results = []
+    for result in detect_batches(model, items, classes, imgsz, conf, batch_size):
+        results.append(result)
+        if progress is not None:
+            progress(len(results))
+    return results, time.perf_counter() - start
@@ -0,0 +1,213 @@
+"""Pembagian CPU untuk semua pemanggil ``predict`` dalam satu proses.
+
+Tanpa pengaturan, setiap ``predict`` PyTorch memakai semua core. Bila
+beberapa sesi berjalan bersamaan, thread saling berebut core dan
+throughput total malah turun di bawah satu pengguna. Modul ini:
+
+- menetapkan jumlah thread intra-op PyTorch per inferensi, dan
+- membatasi jumlah inferensi yang berjalan bersamaan (slot), sehingga
+  ``slot x thread`` kira-kira sama dengan jumlah core.
+
+Slot diberikan menurut prioritas: realtime lebih dulu, lalu gambar, lalu
+video. Video (batch) juga tidak boleh memakai slot terakhir selama ada
+lebih dari satu slot, supaya pengguna realtime tidak menunggu video panjang.
+
+Konfigurasi: ``ROADGUARD_INFERENCE_SLOTS`` dan ``ROADGUARD_INTRAOP_THREADS``.
+"""
+import contextlib
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+REALTIME = 0
+IMAGE = 1
+VIDEO = 2
+PRIORITY_NAMES = {REALTIME: "realtime", IMAGE: "image", VIDEO: "video"}
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_budget(cores=None):
+    """(slot, thread per slot) bawaan: slot kecil dengan 2 thread masing-masing."""
+    cores = cores or available_cores()
+    slots = int(os.environ.get("ROADGUARD_INFERENCE_SLOTS", 0)) or max(1, min(4, cores // 2))
+    threads = int(os.environ.get("ROADGUARD_INTRAOP_THREADS", 0)) or max(1, cores // slots)
+    return slots, threads
+
+
+class PrioritySlots:
+    """Semaphore dengan antrean prioritas dan batas slot untuk pekerjaan batch."""
+
+    def __init__(self, slots, batch_priority=VIDEO):
+        self.slots = slots
+        self.batch_priority = batch_priority
+        # Satu slot disisakan untuk pekerjaan interaktif bila slot lebih dari satu
+        self.max_batch = slots - 1 if slots > 1 else slots
+        self._cond = threading.Condition()
+        self._free = list(range(slots))
+        # Slot yang sedang ditunggu ``acquire_slot``; tidak dibagikan ke antrean prioritas
+        self._reserved = set()
+        self._busy_batch = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def _available(self):
+        return [slot for slot in self._free if slot not in self._reserved]
+
+    def _can_run(self, ticket):
+        if not self._available() or self._waiters[0] != ticket:
+            return False
+        return ticket[0] < self.batch_priority or self._busy_batch < self.max_batch
+
+    def acquire(self, priority, timeout=None):
+        """Mengembalikan nomor slot (0 lebih dulu), atau None jika timeout."""
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            slot = None
+            if self._cond.wait_for(lambda: self._can_run(ticket), timeout):
+                heapq.heappop(self._waiters)
+                slot = min(self._available())
+                self._free.remove(slot)
+                if priority >= self.batch_priority:
+                    self._busy_batch += 1
+            else:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+            # Kepala antrean berubah: bangunkan penunggu lain
+            self._cond.notify_all()
+            return slot
+
+    def release(self, priority, slot):
+        with self._cond:
+            self._free.append(slot)
+            if priority >= self.batch_priority:
+                self._busy_batch -= 1
+            self._cond.notify_all()
+
+    def acquire_slot(self, slot):
+        """Menunggu slot tertentu bebas lalu memegangnya, mendahului antrean prioritas."""
+        with self._cond:
+            self._reserved.add(slot)
+            try:
+                self._cond.wait_for(lambda: slot in self._free)
+                self._free.remove(slot)
+            finally:
+                self._reserved.discard(slot)
+                self._cond.notify_all()
+
+    def release_slot(self, slot):
+        with self._cond:
+            self._free.append(slot)
+            self._cond.notify_all()
+
+    def in_use(self):
+        with self._cond:
+            return self.slots - len(self._free)
+
+
+_lock = threading.Lock()
+_slots = None
+# Slot yang sedang dipegang thread ini (supaya holding_slot bisa dipanggil di dalam slot yang sama)
+_held = threading.local()
+
+
+def configure(slots=None, threads=None):
+    """Menetapkan anggaran CPU proses ini. Dipanggil otomatis saat slot pertama diminta."""
+    global _slots
+    default_slots, default_threads = default_budget()
+    slots = slots or default_slots
+    threads = threads or default_threads
+    _slots = PrioritySlots(slots)
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    logger.info("Anggaran CPU: %d slot inferensi x %d thread intra-op", slots, threads)
+    return slots, threads
+
+
+def _get_slots():
+    if _slots is None:
+        with _lock:
+            if _slots is None:
+                configure()
+    return _slots
+
+
+@contextlib.contextmanager
+def inference_slot(priority):
+    """Menunggu slot inferensi sesuai prioritas dan menghasilkan nomor slotnya.
+
+    Waktu tunggu dicatat di metrik ``scheduler.wait_<prioritas>``.
+    """
+    slots = _get_slots()
+    start = time.perf_counter()
+    slot = slots.acquire(priority)
+    metrics.observe(f"scheduler.wait_{PRIORITY_NAMES.get(priority, priority)}", time.perf_counter() - start)
+    held = _held.__dict__.setdefault("slots", set())
+    held.add(slot)
+    try:
+        yield slot
+    finally:
+        held.discard(slot)
+        slots.release(priority, slot)
+
+
+@contextlib.contextmanager
+def holding_slot(slot):
+    """Memegang slot ``slot`` secara eksklusif, mis. selama model milik slot itu dipanaskan.
+
+    Model slot 0 dipakai bersama oleh semua sesi, jadi pemanasan di ukuran
+    input baru tidak boleh berjalan bersamaan dengan inferensi di slot itu.
+    Slot yang sudah dipegang thread ini, atau di luar anggaran slot, langsung dijalankan.
+    """
+    slots = _get_slots()
+    held = _held.__dict__.setdefault("slots", set())
+    if slot in held or slot >= slots.slots:
+        yield slot
+        return
+    slots.acquire_slot(slot)
+    held.add(slot)
+    try:
+        yield slot
+    finally:
+        held.discard(slot)
+        slots.release_slot(slot)
+
+
+def predict(net, source, priority, **kwargs):
+    """``net.predict`` yang berjalan di dalam slot CPU.
+
+    Objek YOLO tidak aman dipakai dua thread sekaligus, jadi slot selain 0
+    memakai salinan model dari ``utils.model_registry`` (dimuat sekali per slot).
+    """
+    from utils.model_registry import replica_of
+
+    with inference_slot(priority) as slot:
+        model = net if slot == 0 else replica_of(net, slot)
+        return model.predict(source, **kwargs)
+
+
+def detect(net, image, priority, **kwargs):
+    """``utils.postprocess.detect`` (jalur cepat, hasil array) di dalam slot CPU."""
+    from utils.model_registry import replica_of
+    from utils.postprocess import detect as fast_detect
+
+    with inference_slot(priority) as slot:
+        model = net if slot == 0 else replica_of(net, slot)
+        return fast_detect(model, image, **kwargs)
@@ -0,0 +1,304 @@
+"""Crop JPEG kecil per deteksi, disimpan dalam satu file pack append-only.
+
+Setiap laporan yang disimpan juga menulis crop ber-padding dari setiap
+kerusakan: per deteksi untuk gambar, dan satu crop dengan skor tertinggi per
+kerusakan yang dilacak antar frame (``TrackCropper``) untuk video. Isi file:
+
+- ``crops.pack``: byte JPEG yang ditulis berurutan, tidak pernah diubah;
+- ``crops.idx``: satu record ``INDEX_DTYPE`` berukuran tetap per crop (offset,
+  panjang, waktu, label, skor, frame, box, ID sementara laporan, nama file);
+- ``crops.rid``: pasangan ID sementara -> ``report_id`` MySQL (``REPORT_ID_DTYPE``),
+  ditulis writer ``write_behind`` saat laporan di-commit.
+
+Record indeks ditulis setelah datanya, jadi indeks tidak pernah menunjuk ke
+byte yang belum ada. Sisa record yang terpotong (proses mati di tengah
+write) dibuang sebelum append berikutnya supaya record baru tetap sejajar. Galeri dashboard cukup membaca indeks lalu membaca
+crop satu halaman dengan beberapa read berurutan (crop satu laporan
+bersebelahan di pack), tanpa decode video atau gambar penuh.
+
+Lokasi: ``ROADGUARD_CROP_STORE`` (default direktori ``crops``).
+"""
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from sample_utils.download import file_lock
+from utils import metrics
+
+CROP_STORE_DIR = os.environ.get("ROADGUARD_CROP_STORE", "crops")
+# Padding di sekitar box (fraksi sisi box, minimal MIN_PADDING piksel) dan sisi terpanjang crop
+PADDING = 0.15
+MIN_PADDING = 8
+MAX_SIDE = 256
+JPEG_QUALITY = 85
+# Crop yang jaraknya di pack kurang dari ini dibaca dalam satu read
+COALESCE_GAP = 256 * 1024
+
+INDEX_DTYPE = np.dtype([
+    ("offset", np.uint64),
+    ("length", np.uint32),
+    ("created", np.float64),
+    ("score", np.float32),
+    ("frame", np.int32),
+    ("box", np.int32, (4,)),
+    ("label", "S32"),
+    ("source", "S32"),
+    ("name", "S48"),
+])
+REPORT_ID_DTYPE = np.dtype([
+    ("source", "S32"),
+    ("report_id", np.int64),
+])
+
+
+def _append_records(path, records):
+    """Menambahkan record berukuran tetap ke ``path`` lalu fsync; dipanggil di bawah lock."""
+    with open(path, "ab") as f:
+        size = f.seek(0, os.SEEK_END)
+        torn = size % records.dtype.itemsize
+        if torn:
+            # Record terakhir tidak lengkap: tanpa dipotong, semua record setelahnya ikut bergeser
+            f.truncate(size - torn)
+            metrics.count("crops.torn_records")
+        f.write(records.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def encode_crop(image, box, rgb=True):
+    """JPEG crop ``box`` (x1, y1, x2, y2) dengan padding dari ``image``; None jika box kosong."""
+    height, width = image.shape[:2]
+    x1, y1, x2, y2 = (int(v) for v in box)
+    pad_x = max(int((x2 - x1) * PADDING), MIN_PADDING)
+    pad_y = max(int((y2 - y1) * PADDING), MIN_PADDING)
+    x1, y1 = max(x1 - pad_x, 0), max(y1 - pad_y, 0)
+    x2, y2 = min(x2 + pad_x, width), min(y2 + pad_y, height)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    crop = image[y1:y2, x1:x2]
+    scale = MAX_SIDE / max(crop.shape[:2])
+    if scale < 1:
+        crop = cv2.resize(crop, (max(round(crop.shape[1] * scale), 1), max(round(crop.shape[0] * scale), 1)),
+                          interpolation=cv2.INTER_AREA)
+    if rgb:
+        crop = cv2.cvtColor(crop, cv2.COLOR_RGB2BGR)
+    ok, jpeg = cv2.imencode(".jpg", crop, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return jpeg.tobytes() if ok else None
+
+
+def image_crops(image, detections, box_scale=(1.0, 1.0), rgb=True):
+    """Crop untuk daftar deteksi halaman gambar (dict ``name``, ``confidence``, ``box``).
+
+    ``box_scale`` mengubah box dari koordinat input model ke koordinat ``image``.
+    Mengembalikan tuple ``(label, skor, frame, box, jpeg)`` untuk ``CropStore.append``.
+    """
+    sx, sy = box_scale
+    crops = []
+    for detection in detections:
+        x1, y1, x2, y2 = detection["box"]
+        box = (round(x1 * sx), round(y1 * sy), round(x2 * sx), round(y2 * sy))
+        jpeg = encode_crop(image, box, rgb=rgb)
+        if jpeg is not None:
+            crops.append((detection["name"], float(detection["confidence"]), -1, box, jpeg))
+    return crops
+
+
+def _iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+class TrackCropper:
+    """Melacak kerusakan antar frame video dan menyimpan crop skor tertinggi per track.
+
+    Deteksi dihubungkan ke track aktif sekelas dengan IoU tertinggi (>= ``iou_threshold``)
+    yang terakhir terlihat paling lama ``max_gap`` frame sebelumnya. Crop hanya
+    di-encode saat skor track naik, jadi biayanya kecil dibanding inferensi.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_gap=15):
+        self.iou_threshold = iou_threshold
+        self.max_gap = max_gap
+        # Per track: [class_id, frame terakhir, box terakhir, skor terbaik, frame terbaik, box terbaik, jpeg]
+        self._tracks = []
+        self._active = []
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def update(self, frame_index, image, class_ids, scores, boxes, rgb=False):
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self._active = [t for t in self._active if frame_index - t[1] <= self.max_gap]
+        claimed = set()
+        # Deteksi paling yakin memilih track lebih dulu
+        for i in np.argsort(-np.asarray(scores)):
+            class_id, score, box = int(class_ids[i]), float(scores[i]), boxes[i]
+            candidates = [t for t in self._active if t[0] == class_id and id(t) not in claimed]
+            track = None
+            if candidates:
+                ious = _iou(box, np.array([t[2] for t in candidates]))
+                best = int(np.argmax(ious))
+                if ious[best] >= self.iou_threshold:
+                    track = candidates[best]
+            if track is None:
+                track = [class_id, frame_index, box, -1.0, -1, None, None]
+                self._tracks.append(track)
+                self._active.append(track)
+            claimed.add(id(track))
+            track[1], track[2] = frame_index, box
+            if score > track[3]:
+                jpeg = encode_crop(image, box, rgb=rgb)
+                if jpeg is not None:
+                    track[3:7] = [score, frame_index, tuple(int(v) for v in box), jpeg]
+
+    def best(self, classes, min_score=None):
+        """Crop terbaik tiap track yang skornya >= ``min_score``, format ``CropStore.append``."""
+        return [
+            (classes[class_id], score, frame, box, jpeg)
+            for class_id, _, _, score, frame, box, jpeg in self._tracks
+            if jpeg is not None and (min_score is None or score >= min_score)
+        ]
+
+
+class CropStore:
+    def __init__(self, directory=None):
+        self.directory = directory or CROP_STORE_DIR
+        self.pack_path = os.path.join(self.directory, "crops.pack")
+        self.index_path = os.path.join(self.directory, "crops.idx")
+        self.report_ids_path = os.path.join(self.directory, "crops.rid")
+        self._lock_path = os.path.join(self.directory, "crops.lock")
+        self._thread_lock = threading.Lock()
+        # (ukuran file, dict) terakhir dari crops.rid
+        self._report_ids = (0, {})
+
+    def append(self, source, name, crops):
+        """Menambahkan crop ``(label, skor, frame, box, jpeg)`` milik satu laporan. Mengembalikan jumlahnya."""
+        crops = list(crops)
+        if not crops:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        records = np.zeros(len(crops), dtype=INDEX_DTYPE)
+        records["created"] = time.time()
+        records["source"] = (source or "").encode()[:32]
+        records["name"] = (name or "").encode()[:48]
+        # Proses lain (server lain di direktori bersama) juga bisa menulis, jadi pakai lock file
+        with self._thread_lock, file_lock(self._lock_path), metrics.timer("crops.append"):
+            with open(self.pack_path, "ab") as pack:
+                offset = pack.tell()
+                for record, (label, score, frame, box, jpeg) in zip(records, crops):
+                    record["offset"] = offset
+                    record["length"] = len(jpeg)
+                    record["label"] = label.encode()[:32]
+                    record["score"] = score
+                    record["frame"] = -1 if frame is None else frame
+                    record["box"] = box
+                    pack.write(jpeg)
+                    offset += len(jpeg)
+                pack.flush()
+                os.fsync(pack.fileno())
+            _append_records(self.index_path, records)
+        metrics.count("crops.written", len(crops))
+        return len(crops)
+
+    def record_report_ids(self, mapping):
+        """Mencatat ``report_id`` untuk ID sementara laporan (dict ``{id sementara: report_id}``)."""
+        if not mapping:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        records = np.zeros(len(mapping), dtype=REPORT_ID_DTYPE)
+        records["source"] = [(source or "").encode()[:32] for source in mapping]
+        records["report_id"] = list(mapping.values())
+        with self._thread_lock, file_lock(self._lock_path):
+            _append_records(self.report_ids_path, records)
+
+    def report_ids(self):
+        """Dict ID sementara (bytes, seperti kolom ``source`` indeks) -> ``report_id``."""
+        try:
+            size = os.path.getsize(self.report_ids_path)
+        except OSError:
+            return {}
+        size -= size % REPORT_ID_DTYPE.itemsize
+        cached_size, mapping = self._report_ids
+        if size != cached_size:
+            records = np.fromfile(self.report_ids_path, dtype=REPORT_ID_DTYPE, count=size // REPORT_ID_DTYPE.itemsize)
+            mapping = dict(zip(records["source"].tolist(), records["report_id"].tolist()))
+            self._report_ids = (size, mapping)
+        return mapping
+
+    def index(self):
+        """Seluruh indeks sebagai array terstruktur read-only (memory-mapped)."""
+        try:
+            size = os.path.getsize(self.index_path)
+        except OSError:
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        # Record terakhir yang belum lengkap (sedang ditulis) diabaikan
+        count = size // INDEX_DTYPE.itemsize
+        if not count:
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        return np.memmap(self.index_path, dtype=INDEX_DTYPE, mode="r", shape=(count,))
+
+    def select(self, labels=None, min_score=None, since=None):
+        """Record indeks yang cocok filter, terbaru lebih dulu."""
+        index = self.index()
+        mask = np.ones(len(index), dtype=bool)
+        if labels:
+            mask &= np.isin(index["label"], [label.encode()[:32] for label in labels])
+        if min_score is not None:
+            mask &= index["score"] >= min_score
+        if since is not None:
+            mask &= index["created"] >= since
+        # Urutan tulis sama dengan urutan waktu, cukup dibalik
+        return np.array(index[mask][::-1])
+
+    def read(self, records):
+        """Byte JPEG untuk ``records`` sesuai urutannya, dibaca dalam run berurutan di pack."""
+        if not len(records):
+            return []
+        offsets = records["offset"].astype(np.int64)
+        ends = offsets + records["length"]
+        # Crop yang berdekatan di pack digabung menjadi satu run [awal, akhir, anggota]
+        runs = []
+        for i in np.argsort(offsets, kind="stable").tolist():
+            if runs and offsets[i] - runs[-1][1] <= COALESCE_GAP:
+                runs[-1][1] = max(runs[-1][1], ends[i])
+                runs[-1][2].append(i)
+            else:
+                runs.append([offsets[i], ends[i], [i]])
+        crops = [None] * len(records)
+        with open(self.pack_path, "rb") as pack, metrics.timer("crops.read"):
+            for start, end, members in runs:
+                pack.seek(int(start))
+                data = pack.read(int(end - start))
+                for i in members:
+                    crops[i] = data[offsets[i] - start:ends[i] - start]
+        metrics.count("crops.read_runs", len(runs))
+        return crops
+
+
+_store = None
+
+
+def get_store():
+    """``CropStore`` bersama di ``CROP_STORE_DIR``."""
+    global _store
+    if _store is None:
+        _store = CropStore()
+    return _store
+
+
+def save_crops(source, name, crops):
+    """Menyimpan crop laporan; kegagalan hanya dicatat supaya laporan tetap tersimpan."""
+    try:
+        return get_store().append(source, name, crops)
+    except OSError:
+        metrics.count("crops.errors")
+        return 0
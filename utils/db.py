@@ -0,0 +1,41 @@
+import os
+import threading
+
+import pymysql
+
+# Konfigurasi koneksi database MySQL (bisa di-override lewat environment)
+DB_CONFIG = {
+    "host": os.environ.get("ROADGUARD_DB_HOST", "localhost"),
+    "user": os.environ.get("ROADGUARD_DB_USER", "root"),
+    "password": os.environ.get("ROADGUARD_DB_PASSWORD", ""),
+    "database": os.environ.get("ROADGUARD_DB_NAME", "road_detection"),
+}
+
+_local = threading.local()
+
+
+def create_connection(**kwargs):
+    """Membuat koneksi baru ke database MySQL."""
+    config = dict(DB_CONFIG)
+    config.update(kwargs)
+    return pymysql.connect(**config)
+
+
+def get_connection():
+    """Mengembalikan koneksi yang dipakai ulang per thread.
+
+    Koneksi PyMySQL tidak aman dipakai bersama antar thread, jadi setiap
+    thread script Streamlit menyimpan koneksinya sendiri. Koneksi yang sudah
+    putus disambung ulang lewat ping().
+    """
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        connection = create_connection()
+        _local.connection = connection
+    else:
+        try:
+            connection.ping(reconnect=True)
+        except pymysql.MySQLError:
+            connection = create_connection()
+            _local.connection = connection
+    return connection
@@ -0,0 +1,136 @@
+"""Penyimpanan deteksi berbentuk kolom untuk video panjang.
+
+Setiap deteksi menempati satu baris array terstruktur NumPy (26 byte):
+indeks frame, kelas, skor, dan box ``x1, y1, x2, y2``. Kapasitas tumbuh
+dua kali lipat saat penuh, dan begitu ukurannya melewati ``spill_bytes``
+data dipindah ke file memory-mapped di disk supaya tidak menahan RAM
+selama sesi Streamlit berlangsung.
+"""
+import os
+import tempfile
+
+import numpy as np
+
+DETECTION_DTYPE = np.dtype([
+    ("frame", np.int32),
+    ("class_id", np.int16),
+    ("score", np.float32),
+    ("box", np.int32, (4,)),
+])
+
+# Batas ukuran di memori sebelum dipindah ke file (default 64 MB)
+SPILL_BYTES = int(os.environ.get("ROADGUARD_DETECTION_SPILL_BYTES", str(64 * 2 ** 20)))
+
+
+class DetectionStore:
+    def __init__(self, initial_capacity=1024, spill_bytes=None, spill_dir=None):
+        self._data = np.empty(initial_capacity, dtype=DETECTION_DTYPE)
+        self._size = 0
+        self._spill_bytes = SPILL_BYTES if spill_bytes is None else spill_bytes
+        self._spill_dir = spill_dir
+        self._spill_path = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return self._size * DETECTION_DTYPE.itemsize
+
+    @property
+    def spilled(self):
+        return self._spill_path is not None
+
+    def _reserve(self, required):
+        capacity = len(self._data)
+        if required <= capacity:
+            return
+        while capacity < required:
+            capacity *= 2
+        if self._spill_path is None and capacity * DETECTION_DTYPE.itemsize <= self._spill_bytes:
+            grown = np.empty(capacity, dtype=DETECTION_DTYPE)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+            return
+
+        if self._spill_path is None:
+            fd, self._spill_path = tempfile.mkstemp(prefix="detections_", suffix=".bin", dir=self._spill_dir)
+            os.close(fd)
+            old = self._data
+        else:
+            self._data.flush()
+            old = None
+        with open(self._spill_path, "r+b") as f:
+            f.truncate(capacity * DETECTION_DTYPE.itemsize)
+        # Memmap lama dilepas dulu sebelum file dipetakan ulang dengan ukuran baru
+        self._data = None
+        self._data = np.memmap(self._spill_path, dtype=DETECTION_DTYPE, mode="r+", shape=(capacity,))
+        if old is not None:
+            self._data[:self._size] = old[:self._size]
+
+    def append(self, frame_index, class_ids, scores, boxes):
+        """Menambah semua deteksi satu frame sekaligus (array per kolom)."""
+        count = len(class_ids)
+        if not count:
+            return
+        self._reserve(self._size + count)
+        rows = self._data[self._size:self._size + count]
+        rows["frame"] = frame_index
+        rows["class_id"] = class_ids
+        rows["score"] = scores
+        rows["box"] = boxes
+        self._size += count
+
+    def view(self, min_score=None):
+        """Array terstruktur berisi deteksi yang tersimpan (tanpa salinan jika tanpa filter)."""
+        data = self._data[:self._size]
+        if min_score is not None:
+            data = data[data["score"] >= min_score]
+        return data
+
+    @property
+    def frames(self):
+        return self.view()["frame"]
+
+    @property
+    def class_ids(self):
+        return self.view()["class_id"]
+
+    @property
+    def scores(self):
+        return self.view()["score"]
+
+    @property
+    def boxes(self):
+        return self.view()["box"]
+
+    def class_counts(self, num_classes, min_score=None):
+        return np.bincount(self.view(min_score)["class_id"], minlength=num_classes)
+
+    def iter_rows(self, classes, lats=None, lons=None, min_score=None, chunk_size=4096):
+        """Baris ``(label, score, x1, y1, x2, y2, frame, lat, lon)`` untuk disimpan ke database.
+
+        ``lats``/``lons`` (opsional) harus sejajar dengan ``view(min_score)``.
+        """
+        data = self.view(min_score)
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start:start + chunk_size]
+            chunk_lats = [None] * len(chunk) if lats is None else lats[start:start + chunk_size].tolist()
+            chunk_lons = [None] * len(chunk) if lons is None else lons[start:start + chunk_size].tolist()
+            for (frame, class_id, score, box), lat, lon in zip(chunk.tolist(), chunk_lats, chunk_lons):
+                yield (classes[class_id], score, *box.tolist(), frame, lat, lon)
+
+    def close(self):
+        """Melepas memori dan menghapus file spill."""
+        self._data = np.empty(0, dtype=DETECTION_DTYPE)
+        self._size = 0
+        if self._spill_path is not None:
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
+            self._spill_path = None
+
+    def __del__(self):
+        if getattr(self, "_spill_path", None) is not None:
+            self.close()
@@ -0,0 +1,199 @@
+"""Ekspor laporan beserta deteksinya ke CSV atau Parquet secara streaming.
+
+Query dibaca dengan cursor server-side tanpa buffer (``SSCursor``) per
+potongan ``CHUNK_SIZE`` baris dan langsung ditulis ke file, jadi memori
+tetap walau tabel deteksi berisi puluhan juta baris.
+
+Contoh:
+    python -m utils.export --output ekspor.parquet --from 2024-01-01 --severity Berat
+"""
+import argparse
+import csv
+import datetime
+import io
+import itertools
+import os
+import sys
+import time
+
+import pymysql.cursors
+
+CHUNK_SIZE = 50_000
+FORMATS = ("csv", "parquet")
+# Direktori tujuan ekspor "simpan di server" dari dashboard; kosong berarti opsi itu dimatikan
+EXPORT_DIR = os.environ.get("ROADGUARD_EXPORT_DIR", "")
+# Unduhan lewat browser dibaca utuh ke memori sesi Streamlit, jadi ukurannya dibatasi;
+# ekspor yang lebih besar dipindah ke EXPORT_DIR atau harus lewat CLI
+BROWSER_MAX_BYTES = int(float(os.environ.get("ROADGUARD_EXPORT_BROWSER_MAX_MB", "200")) * 1024 * 1024)
+
+# (kolom SQL, nama kolom di file, tipe Parquet)
+COLUMNS = [
+    ("r.report_id", "report_id", "int64"),
+    ("r.road_name", "road_name", "string"),
+    ("r.pothole_severity", "severity", "string"),
+    ("r.upload_time", "upload_time", "timestamp"),
+    ("r.image_name", "image_name", "string"),
+    ("r.video_name", "video_name", "string"),
+    ("d.detection_id", "detection_id", "int64"),
+    ("d.class_label", "class_label", "string"),
+    ("d.confidence", "confidence", "float64"),
+    ("d.x", "x", "int64"),
+    ("d.y", "y", "int64"),
+    ("d.width", "width", "int64"),
+    ("d.height", "height", "int64"),
+    ("d.frame_index", "frame_index", "int64"),
+    ("d.latitude", "latitude", "float64"),
+    ("d.longitude", "longitude", "float64"),
+]
+HEADER = [name for _, name, _ in COLUMNS]
+
+
+def server_export_path(name, fmt, directory=None):
+    """Path file ekspor bernama ``name`` di dalam ``EXPORT_DIR``.
+
+    Hanya nama file yang dipakai (tanpa direktori), jadi pengguna dashboard
+    tidak bisa menulis ke path lain di server. ``ValueError`` jika nama tidak valid
+    atau ``EXPORT_DIR`` tidak dikonfigurasi.
+    """
+    directory = directory if directory is not None else EXPORT_DIR
+    if not directory:
+        raise ValueError("Ekspor ke server tidak diaktifkan (ROADGUARD_EXPORT_DIR kosong)")
+    name = name.strip()
+    if not name or os.path.basename(name) != name or name in (".", ".."):
+        raise ValueError("Nama file tidak valid, gunakan nama file saja tanpa direktori")
+    if not name.endswith(f".{fmt}"):
+        name = f"{name}.{fmt}"
+    return os.path.join(directory, name)
+
+
+def build_query(start_date=None, end_date=None, severities=None, classes=None):
+    """SQL join laporan-deteksi dengan filter tanggal (inklusif), tingkat kerusakan, dan kelas."""
+    conditions, params = [], []
+    if start_date:
+        conditions.append("r.upload_time >= %s")
+        params.append(str(start_date))
+    if end_date:
+        conditions.append("r.upload_time < %s")
+        params.append(str(end_date + datetime.timedelta(days=1)))
+    if severities:
+        conditions.append(f"r.pothole_severity IN ({', '.join(['%s'] * len(severities))})")
+        params.extend(severities)
+    if classes:
+        conditions.append(f"d.class_label IN ({', '.join(['%s'] * len(classes))})")
+        params.extend(classes)
+    sql = f"""
+    SELECT {', '.join(column for column, _, _ in COLUMNS)}
+    FROM reports r
+    JOIN detections d ON d.report_id = r.report_id
+    """
+    if conditions:
+        sql += "WHERE " + " AND ".join(conditions)
+    return sql, params
+
+
+def iter_chunks(connection, sql, params, chunk_size=CHUNK_SIZE):
+    """Baris hasil query per potongan, dibaca dengan cursor tanpa buffer."""
+    with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+def write_csv(chunks, output):
+    """Menulis potongan baris ke ``output`` (file biner). Mengembalikan jumlah baris."""
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="", write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(HEADER)
+    total = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        total += len(rows)
+    text.flush()
+    text.detach()
+    return total
+
+
+def _to_timestamp(value):
+    # MySQL mengembalikan datetime, pengganti SQLite mengembalikan string ISO
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    return value
+
+
+def parquet_schema(columns=COLUMNS):
+    """Skema Arrow untuk daftar kolom ``(sql, nama, tipe)``."""
+    import pyarrow as pa
+
+    types = {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string(), "timestamp": pa.timestamp("s"),
+             "binary": pa.binary()}
+    return pa.schema([(name, types[kind]) for _, name, kind in columns])
+
+
+def write_parquet(chunks, output, columns=COLUMNS):
+    """Menulis setiap potongan sebagai satu row group Parquet. Mengembalikan jumlah baris."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema(columns)
+    total = 0
+    with pq.ParquetWriter(output, schema, compression="zstd") as writer:
+        for rows in chunks:
+            values_by_column = list(zip(*rows))
+            arrays = []
+            for (_, _, kind), field, values in zip(columns, schema, values_by_column):
+                if kind == "timestamp":
+                    values = [_to_timestamp(value) for value in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            total += len(rows)
+    return total
+
+
+def export(connection, output, fmt="csv", chunk_size=CHUNK_SIZE, include_archive=True, **filters):
+    """Mengekspor hasil filter ke ``output`` (file biner). Mengembalikan (baris, detik).
+
+    Dengan ``include_archive``, baris dari arsip bulanan (``utils.archive``) yang
+    masuk rentang tanggal ikut diekspor setelah baris tabel panas.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format ekspor tidak dikenal: {fmt}")
+    sql, params = build_query(**filters)
+    start = time.perf_counter()
+    chunks = iter_chunks(connection, sql, params, chunk_size)
+    if include_archive:
+        from utils import archive
+
+        chunks = itertools.chain(chunks, archive.iter_export_chunks(chunk_size=chunk_size, **filters))
+    rows = write_csv(chunks, output) if fmt == "csv" else write_parquet(chunks, output)
+    return rows, time.perf_counter() - start
+
+
+def main():
+    from utils.db import create_connection
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="path file .csv atau .parquet")
+    parser.add_argument("--format", choices=FORMATS, help="bawaan: dari ekstensi --output")
+    parser.add_argument("--from", dest="start_date", type=datetime.date.fromisoformat)
+    parser.add_argument("--to", dest="end_date", type=datetime.date.fromisoformat)
+    parser.add_argument("--severity", nargs="+", dest="severities")
+    parser.add_argument("--class", nargs="+", dest="classes")
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    connection = create_connection()
+    try:
+        with open(args.output, "wb") as output:
+            rows, seconds = export(connection, output, fmt, start_date=args.start_date, end_date=args.end_date,
+                                   severities=args.severities, classes=args.classes)
+    finally:
+        connection.close()
+    print(f"{rows} baris ditulis ke {args.output} dalam {seconds:.1f} detik "
+          f"({rows / max(seconds, 1e-9):,.0f} baris/detik)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
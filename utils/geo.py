@@ -0,0 +1,373 @@
+"""Koordinat, geohash, dan query spasial untuk laporan dan deteksi.
+
+Koordinat laporan diambil dari EXIF GPS gambar atau dari file trek GPS
+(CSV/GPX) yang diunggah bersama video. Setiap baris ``reports`` dan
+``detections`` menyimpan ``latitude``, ``longitude`` dan ``geohash`` yang
+diindeks, sehingga query bbox/radius cukup memindai beberapa rentang prefix
+geohash di indeks, bukan seluruh tabel.
+"""
+import csv
+import io
+import math
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import numpy as np
+import pymysql
+
+GEOHASH_PRECISION = 12
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_M = 6371008.8
+
+# Presisi geohash untuk pengelompokan per level zoom peta (web mercator)
+_ZOOM_PRECISION = [1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4, 5, 5, 6, 6, 6, 7, 7, 8, 8]
+
+
+# ===================== Geohash =====================
+
+def geohash_encode(lat, lon, precision=GEOHASH_PRECISION):
+    """Mengubah koordinat menjadi string geohash."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def geohash_cell_size(precision):
+    """Tinggi dan lebar (derajat) satu sel geohash pada presisi tertentu."""
+    total_bits = 5 * precision
+    lat_bits = total_bits // 2
+    lon_bits = total_bits - lat_bits
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def geohash_cover(min_lat, min_lon, max_lat, max_lon, max_cells=32):
+    """Daftar prefix geohash yang menutupi bbox, dengan jumlah sel <= max_cells."""
+    best = [""]
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = geohash_cell_size(precision)
+        rows = range(int((min_lat + 90) // height), int((max_lat + 90) // height) + 1)
+        cols = range(int((min_lon + 180) // width), int((max_lon + 180) // width) + 1)
+        if len(rows) * len(cols) > max_cells:
+            break
+        best = sorted({
+            geohash_encode(
+                min(-90 + (r + 0.5) * height, 90.0),
+                min(-180 + (c + 0.5) * width, 180.0),
+                precision,
+            )
+            for r in rows
+            for c in cols
+        })
+    return best
+
+
+def zoom_to_precision(zoom):
+    zoom = int(max(0, zoom))
+    return _ZOOM_PRECISION[min(zoom, len(_ZOOM_PRECISION) - 1)]
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Jarak great-circle dalam meter (bisa menerima array NumPy)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def radius_to_bbox(lat, lon, radius_m):
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = math.degrees(radius_m / (EARTH_RADIUS_M * max(math.cos(math.radians(lat)), 1e-6)))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+# ===================== Sumber Koordinat =====================
+
+def _dms_to_degrees(dms, ref):
+    degrees, minutes, seconds = (float(v) for v in dms)
+    value = degrees + minutes / 60 + seconds / 3600
+    return -value if ref in ("S", "W") else value
+
+
+def extract_exif_gps(image):
+    """Membaca (lat, lon) dari EXIF GPS gambar PIL, atau None jika tidak ada."""
+    try:
+        gps = image.getexif().get_ifd(0x8825)
+    except (AttributeError, KeyError, ValueError):
+        return None
+    if not gps or 2 not in gps or 4 not in gps:
+        return None
+    try:
+        lat = _dms_to_degrees(gps[2], gps.get(1, "N"))
+        lon = _dms_to_degrees(gps[4], gps.get(3, "E"))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return lat, lon
+
+
+class GpsTrack:
+    """Trek GPS per video, diinterpolasi ke indeks frame."""
+
+    def __init__(self, lat, lon, frames=None, seconds=None):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.frames = None if frames is None else np.asarray(frames, dtype=np.float64)
+        self.seconds = None if seconds is None else np.asarray(seconds, dtype=np.float64)
+
+    def positions(self, frame_indices, fps):
+        """Koordinat (lat, lon) untuk setiap indeks frame."""
+        frame_indices = np.asarray(frame_indices, dtype=np.float64)
+        if self.frames is not None:
+            x, xp = frame_indices, self.frames
+        else:
+            x, xp = frame_indices / (fps or 30.0), self.seconds
+        return np.interp(x, xp, self.lat), np.interp(x, xp, self.lon)
+
+
+def _parse_csv_track(text):
+    reader = csv.DictReader(io.StringIO(text))
+    fields = {name.strip().lower(): name for name in reader.fieldnames or []}
+
+    def column(*names):
+        for name in names:
+            if name in fields:
+                return fields[name]
+        return None
+
+    lat_col = column("lat", "latitude")
+    lon_col = column("lon", "lng", "longitude")
+    frame_col = column("frame", "frame_index")
+    time_col = column("time", "timestamp", "t", "seconds")
+    if not lat_col or not lon_col or not (frame_col or time_col):
+        raise ValueError("CSV trek GPS butuh kolom lat, lon, dan frame atau time")
+
+    rows = list(reader)
+    lat = [float(r[lat_col]) for r in rows]
+    lon = [float(r[lon_col]) for r in rows]
+    if frame_col:
+        return GpsTrack(lat, lon, frames=[float(r[frame_col]) for r in rows])
+    return GpsTrack(lat, lon, seconds=[float(r[time_col]) for r in rows])
+
+
+def _parse_gpx_track(text):
+    root = ET.fromstring(text)
+    lat, lon, times = [], [], []
+    for point in root.iter():
+        if not point.tag.endswith("trkpt"):
+            continue
+        lat.append(float(point.get("lat")))
+        lon.append(float(point.get("lon")))
+        time_el = next((child for child in point if child.tag.endswith("time")), None)
+        if time_el is None:
+            raise ValueError("Titik GPX tanpa elemen <time>")
+        times.append(datetime.fromisoformat(time_el.text.strip().replace("Z", "+00:00")).timestamp())
+    if not lat:
+        raise ValueError("File GPX tidak berisi titik trek")
+    start = times[0]
+    return GpsTrack(lat, lon, seconds=[t - start for t in times])
+
+
+def load_gps_track(data, filename=""):
+    """Membaca trek GPS dari bytes CSV atau GPX, diurutkan menurut frame/waktu."""
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    if filename.lower().endswith(".gpx") or text.lstrip().startswith("<"):
+        track = _parse_gpx_track(text)
+    else:
+        track = _parse_csv_track(text)
+    # np.interp butuh xp menaik; log GPS tidak selalu ditulis berurutan
+    key = track.frames if track.frames is not None else track.seconds
+    order = np.argsort(key, kind="stable")
+    return GpsTrack(track.lat[order], track.lon[order],
+                    frames=None if track.frames is None else track.frames[order],
+                    seconds=None if track.seconds is None else track.seconds[order])
+
+
+# ===================== Skema dan Query Database =====================
+
+_GEO_COLUMNS = {
+    "reports": [
+        ("latitude", "DOUBLE NULL"),
+        ("longitude", "DOUBLE NULL"),
+        ("geohash", "CHAR(12) NULL"),
+    ],
+    "detections": [
+        ("frame_index", "INT NULL"),
+        ("latitude", "DOUBLE NULL"),
+        ("longitude", "DOUBLE NULL"),
+        ("geohash", "CHAR(12) NULL"),
+    ],
+}
+
+_schema_ready = False
+
+
+class SchemaNotMigrated(RuntimeError):
+    """Kolom/indeks geo belum ada; diperbaiki operator dengan ``python -m utils.geo migrate``."""
+
+
+def missing_geo_schema(connection):
+    """Pernyataan DDL kolom/indeks geo yang belum ada (hanya membaca ``information_schema``)."""
+    statements = []
+    with connection.cursor() as cursor:
+        for table, columns in _GEO_COLUMNS.items():
+            cursor.execute(
+                "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                (table,),
+            )
+            existing = {_first(row) for row in cursor.fetchall()}
+            for name, definition in columns:
+                if name not in existing:
+                    statements.append(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            cursor.execute(
+                "SELECT 1 FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+                (table, f"idx_{table}_geohash"),
+            )
+            if cursor.fetchone() is None:
+                statements.append(f"CREATE INDEX idx_{table}_geohash ON {table} (geohash)")
+    return statements
+
+
+def migrate_geo_schema(connection, log=None):
+    """Menambahkan kolom koordinat dan indeks geohash yang belum ada.
+
+    ``ALTER TABLE`` pada tabel besar memegang metadata lock cukup lama, jadi
+    ini dijalankan eksplisit saat deploy (``python -m utils.geo migrate``),
+    bukan di dalam permintaan simpan laporan. Mengembalikan pernyataan yang dijalankan.
+    """
+    global _schema_ready
+    statements = missing_geo_schema(connection)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            if log:
+                log(statement)
+            cursor.execute(statement)
+    connection.commit()
+    _schema_ready = True
+    return statements
+
+
+def ensure_geo_schema(connection):
+    """Memastikan migrasi geo sudah dijalankan (dicek sekali per proses, tanpa DDL)."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    if missing_geo_schema(connection):
+        raise SchemaNotMigrated("Skema geo belum dimigrasi, jalankan: python -m utils.geo migrate")
+    _schema_ready = True
+
+
+def _first(row):
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+
+def _prefix_condition(prefixes):
+    # Rentang prefix memakai indeks geohash (range scan), bukan LIKE dengan wildcard di depan
+    clauses = " OR ".join(["(geohash >= %s AND geohash < %s)"] * len(prefixes))
+    params = []
+    for prefix in prefixes:
+        params.extend([prefix, prefix + "~"])
+    return f"({clauses})", params
+
+
+def query_bbox(connection, min_lat, min_lon, max_lat, max_lon, table="detections", columns="*", limit=None):
+    """Baris di dalam bbox, memakai indeks geohash lalu disaring dengan lat/lon persis."""
+    condition, params = _prefix_condition(geohash_cover(min_lat, min_lon, max_lat, max_lon))
+    sql = (
+        f"SELECT {columns} FROM {table} WHERE {condition} "
+        "AND latitude BETWEEN %s AND %s AND longitude BETWEEN %s AND %s"
+    )
+    params += [min_lat, max_lat, min_lon, max_lon]
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def query_radius(connection, lat, lon, radius_m, table="detections"):
+    """Baris dalam radius (meter) dari titik, diurutkan dari yang terdekat."""
+    rows = query_bbox(connection, *radius_to_bbox(lat, lon, radius_m), table=table)
+    result = []
+    for row in rows:
+        distance = float(haversine_m(lat, lon, row["latitude"], row["longitude"]))
+        if distance <= radius_m:
+            result.append((distance, row))
+    result.sort(key=lambda item: item[0])
+    return result
+
+
+def cluster_detections(connection, zoom, bbox=None):
+    """Mengelompokkan deteksi per sel geohash sesuai level zoom, dihitung di server.
+
+    Mengembalikan list dict berisi ``cell``, ``latitude``, ``longitude``
+    (centroid), ``class_label`` dan ``count``.
+    """
+    precision = zoom_to_precision(zoom)
+    sql = (
+        "SELECT LEFT(geohash, %s) AS cell, class_label, COUNT(*) AS count, "
+        "AVG(latitude) AS latitude, AVG(longitude) AS longitude "
+        "FROM detections WHERE geohash IS NOT NULL"
+    )
+    params = [precision]
+    if bbox is not None:
+        condition, prefix_params = _prefix_condition(geohash_cover(*bbox))
+        sql += f" AND {condition} AND latitude BETWEEN %s AND %s AND longitude BETWEEN %s AND %s"
+        params += prefix_params + [bbox[0], bbox[2], bbox[1], bbox[3]]
+    sql += " GROUP BY cell, class_label"
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def main():
+    import argparse
+
+    from utils.db import create_connection
+
+    parser = argparse.ArgumentParser(description="Migrasi skema geo (kolom koordinat dan indeks geohash).")
+    parser.add_argument("command", choices=["migrate", "check"])
+    args = parser.parse_args()
+
+    connection = create_connection()
+    try:
+        if args.command == "check":
+            statements = missing_geo_schema(connection)
+            for statement in statements:
+                print(statement)
+            print("Skema geo lengkap." if not statements else f"{len(statements)} perubahan belum diterapkan.")
+            raise SystemExit(1 if statements else 0)
+        statements = migrate_geo_schema(connection, log=print)
+        print(f"{len(statements)} perubahan diterapkan.")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Decode foto unggahan langsung ke resolusi yang dibutuhkan model.
+
+Foto ponsel 12–50 MP tidak perlu didecode penuh bila hasilnya langsung
+di-resize ke ``imgsz``. Untuk JPEG, ``Image.draft()`` meminta libjpeg
+mendecode dengan skala DCT 1/2, 1/4, atau 1/8 sehingga ukuran hasilnya
+masih >= target. Orientasi EXIF diterapkan setelah decode pada array yang
+sudah kecil. Decode penuh hanya dipakai bila ``full=True`` (misalnya untuk
+inferensi per-tile yang butuh piksel asli).
+"""
+from io import BytesIO
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from utils.geo import extract_exif_gps
+
+EXIF_ORIENTATION = 0x0112
+
+
+def apply_orientation(image, orientation):
+    """Menerapkan tag orientasi EXIF (1–8) ke array HxWxC."""
+    if orientation == 2:
+        return image[:, ::-1]
+    if orientation == 3:
+        return cv2.rotate(image, cv2.ROTATE_180)
+    if orientation == 4:
+        return image[::-1]
+    if orientation == 5:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)[:, ::-1]
+    if orientation == 6:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)[:, ::-1]
+    if orientation == 8:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image
+
+
+def decode_image(data, target=None, full=False):
+    """Decode bytes gambar menjadi array RGB, plus lokasi EXIF GPS.
+
+    ``target`` adalah sisi terpendek minimum yang dibutuhkan (misalnya
+    ``imgsz``). Hasil decode bisa lebih besar dari target, tapi tidak lebih
+    kecil, jadi pemanggil tetap perlu ``cv2.resize``. Mengembalikan
+    ``(image, location, original_size)`` dengan ``original_size`` (w, h)
+    resolusi penuh setelah orientasi EXIF diterapkan, untuk mengembalikan
+    koordinat box ke gambar asli.
+    """
+    pil_image = Image.open(BytesIO(data))
+    location = extract_exif_gps(pil_image)
+    orientation = pil_image.getexif().get(EXIF_ORIENTATION, 1)
+    # Orientasi 5–8 memutar 90°, jadi lebar dan tinggi tertukar
+    original_size = pil_image.size[::-1] if orientation in (5, 6, 7, 8) else pil_image.size
+
+    if target and not full and pil_image.format == "JPEG":
+        # Rotasi 90° menukar lebar/tinggi, jadi target dibuat persegi
+        pil_image.draft("RGB", (target, target))
+    if pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+    image = np.asarray(pil_image)
+    # Flip menghasilkan view dengan stride negatif yang tidak diterima OpenCV
+    return np.ascontiguousarray(apply_orientation(image, orientation)), location, original_size
+
+
+def decode_resized(data, imgsz, full=False):
+    """Decode lalu resize ke (imgsz, imgsz) seperti input model di halaman deteksi."""
+    image, location, _ = decode_image(data, target=imgsz, full=full)
+    return cv2.resize(image, (imgsz, imgsz), interpolation=cv2.INTER_AREA), location
@@ -0,0 +1,249 @@
+"""Instrumentasi ringan untuk mengukur setiap tahap pipeline deteksi.
+
+Pemakaian di halaman::
+
+    from utils import metrics
+
+    with metrics.timer("video.inference"):
+        results = net.predict(frame)
+    metrics.count("video.frames")
+
+Nama metrik berformat ``<halaman>.<tahap>``. Histogram disimpan di memori
+proses dan bisa diekspor dalam format teks Prometheus atau ditulis berkala
+ke log. Saat nonaktif, ``timer()`` mengembalikan context manager kosong yang
+sama setiap kali, jadi overhead-nya hanya satu pengecekan flag.
+
+Aktifkan lewat environment ``ROADGUARD_METRICS=1`` atau dari panel debug di
+sidebar. ``ROADGUARD_METRICS_LOG_INTERVAL`` (detik) menyalakan log berkala.
+Status dan data metrik berlaku untuk seluruh proses, jadi hanya pengguna di
+``ROADGUARD_METRICS_ADMINS`` (daftar username dipisah koma) yang bisa
+menyalakan, mematikan, atau me-reset metrik dari panel; pengguna lain hanya
+melihat.
+"""
+import bisect
+import contextlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Batas bucket histogram dalam detik
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_TIMER = contextlib.nullcontext()
+_enabled = os.environ.get("ROADGUARD_METRICS", "") not in ("", "0", "false")
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_reporter = None
+# Username yang boleh mengubah status metrik dari panel debug
+ADMINS = frozenset(name.strip() for name in os.environ.get("ROADGUARD_METRICS_ADMINS", "").split(",") if name.strip())
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Perkiraan kuantil dengan interpolasi linear di dalam bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+    interval = float(os.environ.get("ROADGUARD_METRICS_LOG_INTERVAL", "0") or 0)
+    if _enabled and interval > 0:
+        start_log_reporter(interval)
+
+
+def timer(name):
+    """Context manager untuk mengukur durasi satu tahap."""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def observe(name, seconds):
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+def count(name, amount=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def snapshot():
+    """Ringkasan semua histogram dan counter sebagai dict biasa."""
+    with _lock:
+        stages = {
+            name: {
+                "count": h.count,
+                "mean_ms": h.sum / h.count * 1000 if h.count else 0.0,
+                "p50_ms": h.quantile(0.5) * 1000,
+                "p95_ms": h.quantile(0.95) * 1000,
+                "max_ms": h.max * 1000,
+                "total_s": h.sum,
+            }
+            for name, h in sorted(_histograms.items())
+        }
+        counters = dict(sorted(_counters.items()))
+    return {"stages": stages, "counters": counters}
+
+
+def _labels(name):
+    page, _, stage = name.partition(".")
+    return f'page="{page}",stage="{stage or page}"'
+
+
+def export_prometheus():
+    """Semua metrik dalam format teks eksposisi Prometheus."""
+    lines = [
+        "# HELP roadguard_stage_seconds Durasi tiap tahap pipeline deteksi.",
+        "# TYPE roadguard_stage_seconds histogram",
+    ]
+    with _lock:
+        for name, h in sorted(_histograms.items()):
+            labels = _labels(name)
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, h.counts):
+                cumulative += bucket_count
+                lines.append(f'roadguard_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'roadguard_stage_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f"roadguard_stage_seconds_sum{{{labels}}} {h.sum}")
+            lines.append(f"roadguard_stage_seconds_count{{{labels}}} {h.count}")
+        lines.append("# HELP roadguard_events_total Jumlah kejadian per halaman.")
+        lines.append("# TYPE roadguard_events_total counter")
+        for name, value in sorted(_counters.items()):
+            page, _, event = name.partition(".")
+            lines.append(f'roadguard_events_total{{page="{page}",event="{event or page}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def start_log_reporter(interval=60.0):
+    """Menulis ringkasan metrik ke log setiap ``interval`` detik (sekali per proses)."""
+    global _reporter
+    with _lock:
+        if _reporter is not None:
+            return
+        _reporter = threading.Thread(target=_report_loop, args=(interval,), name="metrics-reporter", daemon=True)
+    _reporter.start()
+
+
+def _report_loop(interval):
+    while True:
+        time.sleep(interval)
+        if not _enabled:
+            continue
+        data = snapshot()
+        for name, stats in data["stages"].items():
+            logger.info(
+                "metrics %s count=%d mean=%.2fms p50=%.2fms p95=%.2fms max=%.2fms",
+                name, stats["count"], stats["mean_ms"], stats["p50_ms"], stats["p95_ms"], stats["max_ms"],
+            )
+        for name, value in data["counters"].items():
+            logger.info("metrics %s total=%d", name, value)
+
+
+def can_control(username):
+    """True jika ``username`` boleh menyalakan/mematikan dan me-reset metrik proses."""
+    return username in ADMINS
+
+
+def render_debug_panel():
+    """Panel debug metrik di sidebar Streamlit (kontrol hanya untuk ``ADMINS``)."""
+    import pandas as pd
+    import streamlit as st
+
+    admin = can_control(st.session_state.get("username"))
+    with st.sidebar.expander("🐞 Debug Metrik"):
+        if admin:
+            # Status metrik berlaku untuk seluruh proses, checkbox hanya mengikuti
+            st.session_state["metrics_enabled"] = is_enabled()
+            st.checkbox(
+                "Aktifkan metrik",
+                key="metrics_enabled",
+                on_change=lambda: set_enabled(st.session_state["metrics_enabled"]),
+            )
+        else:
+            st.caption(f"Metrik {'aktif' if is_enabled() else 'nonaktif'}. Hanya admin yang bisa mengubahnya.")
+        if not is_enabled():
+            return
+        data = snapshot()
+        if data["stages"]:
+            table = pd.DataFrame.from_dict(data["stages"], orient="index")
+            st.dataframe(table[["count", "mean_ms", "p50_ms", "p95_ms", "max_ms"]].round(2))
+        else:
+            st.caption("Belum ada data.")
+        if data["counters"]:
+            st.json(data["counters"])
+        col1, col2 = st.columns(2)
+        col1.download_button("Prometheus", export_prometheus(), file_name="roadguard_metrics.txt")
+        if admin and col2.button("Reset"):
+            reset()
+
+
+if _enabled:
+    set_enabled(True)
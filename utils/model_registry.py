@@ -0,0 +1,531 @@
+"""Manifest varian model dan pemilihan otomatis berdasarkan kecepatan host.
+
+``models/manifest.json`` berisi varian model (nano/small/medium dan format
+ekspor) beserta mAP dan latensi CPU per ukuran input. Saat startup, varian
+yang tersedia di-probe di host ini (hasilnya di-cache) lalu dipilih varian
+paling akurat yang latensinya masih di bawah anggaran
+(``ROADGUARD_LATENCY_BUDGET_MS``). Pilihan bisa di-override global dengan
+``ROADGUARD_MODEL_VARIANT=<nama>@<imgsz>`` atau per halaman dari sidebar.
+
+CLI:
+    python -m utils.model_registry probe
+    python -m utils.model_registry measure --variant small --imgsz 640 --data <dataset.yaml>
+    python -m utils.model_registry export --variant small --format onnx
+    python -m utils.model_registry build --variant small --imgsz 640 480
+    python -m utils.model_registry pin --variant small
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from sample_utils.download import is_valid
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+MODELS_DIR = ROOT / "models"
+MANIFEST_PATH = MODELS_DIR / "manifest.json"
+PROBE_CACHE_PATH = MODELS_DIR / ".probe_cache.json"
+
+# Nama kelas keluaran model, urut sesuai indeks kelas saat training
+CLASSES = [
+    "Longitudinal Crack",
+    "Transverse Crack",
+    "Alligator Crack",
+    "Potholes",
+]
+
+_lock = threading.Lock()
+_models = {}
+_model_keys = {}
+_warmed = set()
+# Lock per (path, replica): muat dan pemanasan satu model tidak menahan model lain
+_key_locks = {}
+_selections = {}
+# Pemilihan (dan probe) dijalankan satu per satu supaya sesi pertama yang bersamaan tidak ikut probe
+_select_lock = threading.Lock()
+# Hasil validasi file model per (path, ukuran, mtime), supaya SHA-256 tidak dihitung tiap rerun
+_validated = {}
+_preloader = None
+
+
+class ModelChoice(NamedTuple):
+    variant: str
+    path: Path
+    imgsz: int
+    latency_ms: Optional[float]
+    reason: str
+
+    @property
+    def label(self):
+        return f"{self.variant}@{self.imgsz}"
+
+
+# ===================== Manifest =====================
+
+def load_manifest(path=MANIFEST_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp_path = Path(str(path) + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def is_available(variant):
+    """File varian ada dan cocok dengan ``size``/``sha256`` di manifest (bila tercatat).
+
+    File terpotong dari unduhan lama yang tidak atomik tidak dianggap model.
+    """
+    path = MODELS_DIR / variant["file"]
+    try:
+        stat = path.stat()
+    except OSError:
+        return False
+    key = (str(path), stat.st_size, stat.st_mtime_ns, variant.get("size"), variant.get("sha256"))
+    valid = _validated.get(key)
+    if valid is None:
+        valid = _validated[key] = is_valid(path, variant.get("size"), variant.get("sha256"))
+        if not valid:
+            logger.warning("%s tidak cocok dengan ukuran/SHA-256 di manifest, diabaikan", path)
+    return valid
+
+
+def candidates(manifest, available_only=True):
+    """Pasangan (varian, imgsz) urut dari yang paling akurat.
+
+    Jika semua kandidat punya mAP terukur, urutan memakai mAP50; selain itu
+    memakai urutan di manifest (paling akurat lebih dulu) dan imgsz terbesar.
+    """
+    result = []
+    for order, variant in enumerate(manifest["variants"]):
+        if available_only and not is_available(variant):
+            continue
+        for imgsz, stats in variant["metrics"].items():
+            result.append((order, variant, int(imgsz), stats))
+    if result and all(stats.get("map50") is not None for _, _, _, stats in result):
+        result.sort(key=lambda c: -c[3]["map50"])
+    else:
+        result.sort(key=lambda c: (c[0], -c[2]))
+    return [(variant, imgsz, stats) for _, variant, imgsz, stats in result]
+
+
+def default_variant(manifest):
+    """Varian pertama yang bisa diunduh, dipakai bila belum ada model di disk."""
+    return next(v for v in manifest["variants"] if v.get("url"))
+
+
+# ===================== Probe Latensi Host =====================
+
+def _host_key():
+    return f"{platform.node()}|{platform.machine()}|{os.cpu_count()}"
+
+
+def _load_probe_cache():
+    try:
+        with open(PROBE_CACHE_PATH) as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return cache if cache.get("host") == _host_key() else {}
+
+
+def _save_probe_cache(cache):
+    cache["host"] = _host_key()
+    tmp_path = Path(str(PROBE_CACHE_PATH) + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, PROBE_CACHE_PATH)
+
+
+def probe_latency(path, imgsz, runs=5, warmup=2, use_cache=True):
+    """Median latensi predict (ms) untuk satu frame acak di host ini."""
+    path = Path(path)
+    key = f"{path.name}@{imgsz}@{path.stat().st_mtime_ns}"
+    cache = _load_probe_cache() if use_cache else {}
+    if key in cache.get("latency_ms", {}):
+        return cache["latency_ms"][key]
+
+    from ultralytics import YOLO
+
+    from utils import cpu_scheduler
+
+    # Instance sendiri yang tidak di-cache: model slot 0 dipakai bersama semua sesi dan tidak
+    # aman dipakai dua thread, dan varian yang tidak terpilih tidak perlu tinggal di memori
+    net = YOLO(str(path))
+    frame = np.random.default_rng(0).integers(0, 255, (imgsz, imgsz, 3), dtype=np.uint8)
+    timings = []
+    with cpu_scheduler.holding_slot(0):
+        for _ in range(warmup):
+            net.predict(frame, imgsz=imgsz, verbose=False)
+        for _ in range(runs):
+            start = time.perf_counter()
+            net.predict(frame, imgsz=imgsz, verbose=False)
+            timings.append((time.perf_counter() - start) * 1000)
+    del net
+    latency = statistics.median(timings)
+
+    cache = _load_probe_cache()
+    cache.setdefault("latency_ms", {})[key] = latency
+    _save_probe_cache(cache)
+    return latency
+
+
+# ===================== Pemilihan dan Pemuatan Model =====================
+
+def parse_override(value):
+    """``"small@480"`` -> ("small", 480); ``"small"`` -> ("small", None)."""
+    if not value:
+        return None
+    name, _, imgsz = value.partition("@")
+    return name, int(imgsz) if imgsz else None
+
+
+def select_model(budget_ms=None, override=None, manifest=None):
+    """Memilih varian paling akurat yang memenuhi anggaran latensi di host ini."""
+    manifest = manifest or load_manifest()
+    if budget_ms is None:
+        budget_ms = float(os.environ.get("ROADGUARD_LATENCY_BUDGET_MS", manifest.get("latency_budget_ms", 250)))
+    override = override or os.environ.get("ROADGUARD_MODEL_VARIANT")
+
+    cache_key = (budget_ms, override)
+    with _lock:
+        if cache_key in _selections:
+            return _selections[cache_key]
+    with _select_lock:
+        with _lock:
+            if cache_key in _selections:
+                return _selections[cache_key]
+        choice = _select(manifest, budget_ms, override)
+        with _lock:
+            _selections[cache_key] = choice
+    return choice
+
+
+def _select(manifest, budget_ms, override):
+    options = candidates(manifest)
+    if not options:
+        variant = default_variant(manifest)
+        choice = ModelChoice(variant["name"], MODELS_DIR / variant["file"], 640, None, "bawaan (belum ada model di disk)")
+    elif override:
+        name, imgsz = parse_override(override)
+        matches = [(v, s) for v, s, _ in options if v["name"] == name and (imgsz is None or s == imgsz)]
+        if not matches:
+            raise ValueError(f"Varian model '{override}' tidak tersedia")
+        variant, imgsz = matches[0]
+        choice = ModelChoice(variant["name"], MODELS_DIR / variant["file"], imgsz, None, "dipilih manual")
+    else:
+        choice = None
+        fastest = None
+        for variant, imgsz, _stats in options:
+            path = MODELS_DIR / variant["file"]
+            latency = probe_latency(path, imgsz)
+            if fastest is None or latency < fastest.latency_ms:
+                fastest = ModelChoice(variant["name"], path, imgsz, latency, "tercepat (tidak ada yang memenuhi anggaran)")
+            if latency <= budget_ms:
+                choice = ModelChoice(variant["name"], path, imgsz, latency, f"paling akurat dalam anggaran {budget_ms:.0f} ms")
+                break
+        choice = choice or fastest
+    return choice
+
+
+def warm_model(net, sizes, batch_sizes=(1,)):
+    """Menjalankan predict dengan frame kosong di setiap ukuran input.
+
+    Panggilan pertama membayar fusi layer, alokasi memori, dan (untuk
+    TorchScript) optimasi graf; lebih baik dibayar saat startup daripada oleh
+    pengguna pertama.
+    """
+    for imgsz in sizes:
+        blank = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        for batch_size in batch_sizes:
+            for _ in range(2):
+                net.predict([blank] * batch_size, imgsz=imgsz, verbose=False)
+
+
+def get_model(path, warm_sizes=(), replica=0):
+    """Model YOLO yang dipakai bersama oleh semua sesi dalam satu proses.
+
+    ``warm_sizes`` memanaskan model di ukuran input tersebut (sekali per
+    ukuran). ``replica`` > 0 memuat salinan terpisah untuk slot inferensi
+    paralel (lihat ``utils.cpu_scheduler``). Muat dan pemanasan memakai lock
+    per model, jadi halaman yang memakai model lain (atau model ini di
+    ukuran yang sudah panas) tidak ikut menunggu.
+    """
+    from ultralytics import YOLO
+
+    key = (str(path), replica)
+    with _lock:
+        net = _models.get(key)
+        if net is not None and all((key, imgsz) in _warmed for imgsz in warm_sizes):
+            return net
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        net = _models.get(key)
+        if net is None:
+            net = YOLO(key[0], task="detect")
+            with _lock:
+                _models[key] = net
+                _model_keys[id(net)] = key
+        pending = [imgsz for imgsz in warm_sizes if (key, imgsz) not in _warmed]
+        if pending:
+            from utils import cpu_scheduler
+
+            # Model slot ``replica`` bisa sedang dipakai sesi lain; pemanasan memegang slot itu
+            with cpu_scheduler.holding_slot(replica):
+                warm_model(net, pending)
+            with _lock:
+                _warmed.update((key, imgsz) for imgsz in pending)
+    return net
+
+
+def replica_of(net, replica):
+    """Salinan ``net`` untuk slot ``replica``, dipanaskan di ukuran yang sama dengan aslinya.
+
+    Model yang tidak dimuat lewat ``get_model`` dikembalikan apa adanya.
+    """
+    key = _model_keys.get(id(net))
+    if key is None:
+        return net
+    sizes = [imgsz for warmed_key, imgsz in list(_warmed) if warmed_key == key]
+    return get_model(key[0], warm_sizes=sizes, replica=replica)
+
+
+def preload(budget_ms=None):
+    """Memilih, memuat, dan memanaskan model di thread latar (sekali per proses).
+
+    Dipanggil dari halaman utama supaya pengguna pertama di halaman deteksi
+    tidak menunggu model dimuat.
+    """
+    global _preloader
+
+    def _run():
+        try:
+            manifest = load_manifest()
+            choice = select_model(budget_ms, manifest=manifest)
+            if any(v["name"] == choice.variant and is_available(v) for v in manifest["variants"]):
+                get_model(choice.path, warm_sizes=[choice.imgsz])
+        except Exception:
+            logger.exception("Preload model gagal")
+
+    with _lock:
+        if _preloader is not None:
+            return
+        _preloader = threading.Thread(target=_run, name="model-preload", daemon=True)
+    _preloader.start()
+
+
+def render_model_selector(page_key):
+    """Pilihan varian model di sidebar. Mengembalikan (ModelChoice, model)."""
+    import streamlit as st
+
+    from sample_utils.download import download_file
+
+    manifest = load_manifest()
+    if not candidates(manifest):
+        variant = default_variant(manifest)
+        download_file(
+            variant["url"], MODELS_DIR / variant["file"],
+            expected_size=variant.get("size"), sha256=variant.get("sha256"),
+        )
+
+    labels = [f"{v['name']}@{imgsz}" for v, imgsz, _ in candidates(manifest)]
+    selected = st.sidebar.selectbox(
+        "Varian Model",
+        ["Otomatis"] + labels,
+        key=f"model_variant_{page_key}",
+        help="Otomatis: varian paling akurat yang memenuhi anggaran latensi di server ini.",
+    )
+    with st.spinner("Mengukur kecepatan model di server..."):
+        choice = select_model(override=None if selected == "Otomatis" else selected, manifest=manifest)
+    latency = f" · {choice.latency_ms:.0f} ms/frame" if choice.latency_ms is not None else ""
+    st.sidebar.caption(f"🧠 Model: **{choice.label}**{latency} ({choice.reason})")
+    with st.spinner("Memuat dan memanaskan model..."):
+        net = get_model(choice.path, warm_sizes=[choice.imgsz])
+    return choice, net
+
+
+# ===================== Artefak Inferensi =====================
+
+def sha256sum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify_artifact(source_path, artifact_path, imgsz, images, box_tolerance=1.0, score_tolerance=0.01):
+    """Membandingkan deteksi artefak dengan checkpoint asli pada gambar contoh.
+
+    Mengembalikan daftar pesan perbedaan; kosong berarti artefak setara.
+    """
+    import cv2
+
+    from ultralytics import YOLO
+
+    source = YOLO(str(source_path), task="detect")
+    artifact = YOLO(str(artifact_path), task="detect")
+    problems = []
+    for image_path in images:
+        image = cv2.imread(str(image_path))
+        expected = source.predict(image, imgsz=imgsz, conf=0.25, verbose=False)[0].boxes.data.cpu().numpy()
+        actual = artifact.predict(image, imgsz=imgsz, conf=0.25, verbose=False)[0].boxes.data.cpu().numpy()
+        if len(expected) != len(actual):
+            problems.append(f"{Path(image_path).name}: {len(actual)} box, seharusnya {len(expected)}")
+            continue
+        expected = expected[np.argsort(-expected[:, 4])]
+        actual = actual[np.argsort(-actual[:, 4])]
+        box_diff = float(np.abs(expected[:, :4] - actual[:, :4]).max()) if len(expected) else 0.0
+        score_diff = float(np.abs(expected[:, 4] - actual[:, 4]).max()) if len(expected) else 0.0
+        if box_diff > box_tolerance or score_diff > score_tolerance or not np.array_equal(expected[:, 5], actual[:, 5]):
+            problems.append(f"{Path(image_path).name}: selisih box {box_diff:.2f}px, skor {score_diff:.4f}")
+    return problems
+
+
+def build_artifacts(manifest, name, sizes, images, output_format="torchscript"):
+    """Ekspor checkpoint ke artefak inferensi per ukuran input, verifikasi, lalu daftarkan di manifest.
+
+    TorchScript di-trace pada satu ukuran input, jadi setiap imgsz menjadi
+    varian tersendiri (``<nama>-ts<imgsz>``) yang diletakkan sebelum
+    checkpoint asalnya supaya dipilih lebih dulu pada akurasi yang sama.
+    """
+    source = _find_variant(manifest, name)
+    source_path = MODELS_DIR / source["file"]
+    built = []
+    for imgsz in sizes:
+        # fuse() dilakukan oleh exporter; hasilnya hanya bobot inferensi tanpa state training
+        exported = Path(get_model(source_path).export(format=output_format, imgsz=imgsz))
+        artifact_path = MODELS_DIR / f"{source_path.stem}_{imgsz}{exported.suffix}"
+        os.replace(exported, artifact_path)
+
+        problems = verify_artifact(source_path, artifact_path, imgsz, images)
+        if problems:
+            artifact_path.unlink()
+            raise SystemExit(f"Verifikasi {artifact_path.name} gagal:\n  " + "\n  ".join(problems))
+
+        variant_name = f"{name}-ts{imgsz}" if output_format == "torchscript" else f"{name}-{output_format}{imgsz}"
+        entry = next((v for v in manifest["variants"] if v["name"] == variant_name), None)
+        if entry is None:
+            entry = {"name": variant_name, "url": None, "size": None, "metrics": {}}
+            manifest["variants"].insert(manifest["variants"].index(source), entry)
+        entry.update({
+            "file": artifact_path.name,
+            "format": output_format,
+            "source": source["name"],
+            "sha256": sha256sum(artifact_path),
+            "verified_on": [Path(p).name for p in images],
+        })
+        # Akurasi sama dengan sumbernya karena sudah diverifikasi setara
+        entry["metrics"] = {str(imgsz): dict(source["metrics"].get(str(imgsz), {}), cpu_latency_ms=None)}
+        built.append(entry)
+    save_manifest(manifest)
+    return built
+
+
+# ===================== CLI =====================
+
+def _find_variant(manifest, name):
+    for variant in manifest["variants"]:
+        if variant["name"] == name:
+            return variant
+    raise SystemExit(f"Varian '{name}' tidak ada di manifest")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    probe_parser = subparsers.add_parser("probe", help="ukur latensi varian yang tersedia di host ini")
+    probe_parser.add_argument("--budget", type=float, default=None)
+
+    measure_parser = subparsers.add_parser("measure", help="ukur mAP dan latensi lalu simpan ke manifest")
+    measure_parser.add_argument("--variant", required=True)
+    measure_parser.add_argument("--imgsz", type=int, default=640)
+    measure_parser.add_argument("--data", help="yaml dataset untuk model.val (tanpa ini hanya latensi)")
+
+    export_parser = subparsers.add_parser("export", help="ekspor varian ke format lain dan daftarkan di manifest")
+    export_parser.add_argument("--variant", required=True)
+    export_parser.add_argument("--format", required=True, help="format ekspor ultralytics, misalnya onnx atau openvino")
+    export_parser.add_argument("--imgsz", type=int, default=640)
+
+    build_parser = subparsers.add_parser("build", help="buat artefak inferensi (TorchScript) terverifikasi per ukuran input")
+    build_parser.add_argument("--variant", required=True)
+    build_parser.add_argument("--imgsz", type=int, nargs="+", help="default: semua ukuran varian di manifest")
+    pin_parser = subparsers.add_parser("pin", help="catat ukuran dan SHA-256 file varian di manifest")
+    pin_parser.add_argument("--variant", required=True)
+
+    build_parser.add_argument("--images", nargs="+", default=[str(p) for p in sorted((ROOT / "resource").glob("*.jpg"))],
+                              help="gambar contoh untuk verifikasi")
+
+    args = parser.parse_args()
+    manifest = load_manifest()
+
+    if args.command == "probe":
+        for variant, imgsz, _ in candidates(manifest):
+            latency = probe_latency(MODELS_DIR / variant["file"], imgsz, use_cache=False)
+            print(f"{variant['name']:>12}@{imgsz:<4} {latency:8.1f} ms")
+        choice = select_model(budget_ms=args.budget, manifest=manifest)
+        print(f"\nDipilih: {choice.label} ({choice.reason})")
+
+    elif args.command == "measure":
+        variant = _find_variant(manifest, args.variant)
+        stats = variant["metrics"].setdefault(str(args.imgsz), {})
+        stats["cpu_latency_ms"] = round(probe_latency(MODELS_DIR / variant["file"], args.imgsz, use_cache=False), 1)
+        if args.data:
+            result = get_model(MODELS_DIR / variant["file"]).val(data=args.data, imgsz=args.imgsz, device="cpu")
+            stats["map50"] = round(float(result.box.map50), 4)
+            stats["map50_95"] = round(float(result.box.map), 4)
+        save_manifest(manifest)
+        print(f"{args.variant}@{args.imgsz}: {stats}")
+
+    elif args.command == "export":
+        source = _find_variant(manifest, args.variant)
+        exported = Path(get_model(MODELS_DIR / source["file"]).export(format=args.format, imgsz=args.imgsz))
+        name = f"{args.variant}-{args.format}"
+        entry = next((v for v in manifest["variants"] if v["name"] == name), None)
+        if entry is None:
+            entry = {"name": name, "url": None, "size": None, "metrics": {}}
+            manifest["variants"].insert(manifest["variants"].index(source) + 1, entry)
+        entry["file"] = str(exported.relative_to(MODELS_DIR))
+        entry["format"] = args.format
+        entry["metrics"].setdefault(str(args.imgsz), {"map50": None, "map50_95": None, "cpu_latency_ms": None})
+        save_manifest(manifest)
+        print(f"Diekspor ke {exported} sebagai varian '{name}'")
+
+    elif args.command == "pin":
+        variant = _find_variant(manifest, args.variant)
+        path = MODELS_DIR / variant["file"]
+        if not path.exists():
+            raise SystemExit(f"{path} tidak ada")
+        # Ukuran yang sudah tercatat harus cocok dulu supaya file rusak tidak ikut dipatok
+        if variant.get("size") and path.stat().st_size != variant["size"]:
+            raise SystemExit(f"Ukuran {path.name} {path.stat().st_size} byte, manifest mencatat {variant['size']}")
+        variant["size"] = path.stat().st_size
+        variant["sha256"] = sha256sum(path)
+        save_manifest(manifest)
+        print(f"{args.variant}: {variant['size']} byte, sha256 {variant['sha256']}")
+
+    elif args.command == "build":
+        sizes = args.imgsz or [int(size) for size in _find_variant(manifest, args.variant)["metrics"]]
+        for entry in build_artifacts(manifest, args.variant, sizes, args.images):
+            print(f"{entry['name']}: {entry['file']} terverifikasi ({entry['sha256'][:12]})")
+
+
+if __name__ == "__main__":
+    main()
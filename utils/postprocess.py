@@ -0,0 +1,173 @@
+"""Jalur cepat inferensi CPU: letterbox, forward, lalu postprocessing vektor.
+
+``net.predict`` menjalankan NMS generik ultralytics lalu membungkus hasilnya
+dalam ``Results``, dan halaman masih mengambil box satu per satu. Pada
+frame retak buaya yang padat, ribuan anchor lolos ambang batas dan NMS
+menjadi tahap termahal. ``detect`` memotong jalur itu:
+
+1. skor kelas terbaik per anchor dan ambang batas ``conf`` (satu operasi array);
+2. top-k per kelas (``max_per_class``) sebelum NMS, jadi biaya NMS dibatasi;
+3. NMS per kelas atas kandidat yang tersisa: ``torchvision.ops.nms`` dengan
+   offset per kelas bila torchvision terpasang (selalu ada bersama
+   ultralytics), selain itu ``cv2.dnn.NMSBoxesBatched`` (sekitar 2x lebih lambat
+   pada frame padat);
+4. box dikembalikan ke koordinat gambar input.
+
+Hasilnya ``Detections``: tiga array (kelas, skor, box xyxy) per gambar,
+tanpa objek Python per box. Semantik input sama dengan ``net.predict``:
+array dianggap BGR.
+"""
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+# Kandidat per kelas yang masuk NMS. Sama dengan jumlah anchor pada input 640,
+# jadi di ukuran bawaan top-k tidak pernah membuang kandidat; batas ini hanya
+# menahan biaya NMS untuk input yang lebih besar (kecepatan di ukuran bawaan
+# datang dari ``batched_nms``). Nilai lebih kecil (1000)
+# kehilangan sampai 37% area kerusakan pada frame retak buaya padat
+# (lihat benchmarks/bench_postprocess.py)
+MAX_PER_CLASS = 8400
+# Sama dengan bawaan ultralytics
+IOU_THRESHOLD = 0.7
+MAX_DET = 300
+# Offset box per kelas untuk NMS batch, lebih besar dari sisi input mana pun (sama dengan ultralytics)
+CLASS_OFFSET = 7680
+STRIDE = 32
+PAD_VALUE = 114
+
+
+class Detections(NamedTuple):
+    class_ids: np.ndarray  # (N,) int32
+    scores: np.ndarray  # (N,) float32
+    boxes: np.ndarray  # (N, 4) float32 xyxy
+
+    def select(self, index):
+        return Detections(self.class_ids[index], self.scores[index], self.boxes[index])
+
+
+def empty_detections():
+    return Detections(np.empty(0, np.int32), np.empty(0, np.float32), np.empty((0, 4), np.float32))
+
+
+def letterbox(image, imgsz, auto=False, stride=STRIDE):
+    """Resize dengan rasio aspek tetap dan padding; mengembalikan (gambar, skala, (pad_x, pad_y)).
+
+    ``auto`` hanya menambah padding sampai kelipatan ``stride`` (model PyTorch),
+    selain itu hasilnya persegi ``imgsz`` (model ekspor berukuran input tetap).
+    """
+    height, width = image.shape[:2]
+    gain = min(imgsz / height, imgsz / width)
+    new_w, new_h = round(width * gain), round(height * gain)
+    pad_w, pad_h = imgsz - new_w, imgsz - new_h
+    if auto:
+        pad_w, pad_h = pad_w % stride, pad_h % stride
+    if (new_w, new_h) != (width, height):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    left, top = pad_w // 2, pad_h // 2
+    image = cv2.copyMakeBorder(image, top, pad_h - top, left, pad_w - left, cv2.BORDER_CONSTANT,
+                               value=(PAD_VALUE, PAD_VALUE, PAD_VALUE))
+    return image, gain, (left, top)
+
+
+def top_k_per_class(class_ids, scores, k):
+    """Indeks (terurut per kelas, skor menurun) dari maksimal ``k`` skor tertinggi setiap kelas."""
+    order = np.lexsort((-scores, class_ids))
+    sorted_ids = class_ids[order]
+    # Peringkat di dalam kelas = posisi dikurangi posisi pertama kelas tersebut
+    rank = np.arange(len(order)) - np.searchsorted(sorted_ids, sorted_ids, side="left")
+    return order[rank < k]
+
+
+def postprocess(prediction, conf, iou=IOU_THRESHOLD, max_per_class=MAX_PER_CLASS, max_det=MAX_DET, classes=None):
+    """Output mentah head YOLOv8 ``(4 + nc, anchor)`` -> ``Detections`` di koordinat input model.
+
+    ``classes`` (opsional) membatasi kelas yang dipertimbangkan.
+    """
+    class_scores = prediction[4:]
+    if classes is not None:
+        class_scores = class_scores[list(classes)]
+    class_ids = class_scores.argmax(0)
+    scores = np.take_along_axis(class_scores, class_ids[None], 0)[0]
+    candidates = np.flatnonzero(scores >= conf)
+    if not len(candidates):
+        return empty_detections()
+    class_ids, scores = class_ids[candidates], scores[candidates]
+    if classes is not None:
+        class_ids = np.asarray(classes)[class_ids]
+    if len(candidates) > max_per_class:
+        selected = top_k_per_class(class_ids, scores, max_per_class)
+        candidates, class_ids, scores = candidates[selected], class_ids[selected], scores[selected]
+
+    cx, cy, w, h = prediction[:4, candidates]
+    xywh = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+    keep = batched_nms(xywh, scores, class_ids, conf, iou)[:max_det]
+    boxes = xywh[keep]
+    boxes[:, 2:] += boxes[:, :2]
+    return Detections(class_ids[keep].astype(np.int32), scores[keep].astype(np.float32), boxes.astype(np.float32))
+
+
+_torch_nms = None
+
+
+def _load_torch_nms():
+    global _torch_nms
+    if _torch_nms is None:
+        try:
+            import torch
+            from torchvision.ops import nms
+        except ImportError:
+            _torch_nms = False
+        else:
+            _torch_nms = (torch, nms)
+    return _torch_nms
+
+
+def batched_nms(xywh, scores, class_ids, conf, iou):
+    """Indeks box yang lolos NMS per kelas, skor menurun."""
+    torch_nms = _load_torch_nms()
+    if not torch_nms:
+        keep = cv2.dnn.NMSBoxesBatched(xywh, scores, class_ids.astype(np.int32), conf, iou)
+        return np.asarray(keep, dtype=np.intp).reshape(-1)
+    torch, nms = torch_nms
+    # Box tiap kelas digeser ke area sendiri supaya satu NMS tidak menindih antar kelas
+    offset = class_ids.astype(np.float32)[:, None] * CLASS_OFFSET
+    xyxy = np.concatenate([xywh[:, :2], xywh[:, :2] + xywh[:, 2:]], axis=1).astype(np.float32) + offset
+    keep = nms(torch.from_numpy(xyxy), torch.from_numpy(np.ascontiguousarray(scores, dtype=np.float32)), iou)
+    return keep.numpy().astype(np.intp)
+
+
+def scale_boxes(boxes, gain, pad, shape):
+    """Box dari koordinat letterbox ke koordinat gambar asli (dipotong di tepi)."""
+    boxes = (boxes - np.array([pad[0], pad[1], pad[0], pad[1]], dtype=np.float32)) / gain
+    height, width = shape[:2]
+    np.clip(boxes[:, 0::2], 0, width, out=boxes[:, 0::2])
+    np.clip(boxes[:, 1::2], 0, height, out=boxes[:, 1::2])
+    return boxes
+
+
+def _backend(net, imgsz):
+    # AutoBackend dibuat ultralytics saat predict pertama (biasanya sudah saat warmup)
+    if net.predictor is None or getattr(net.predictor, "model", None) is None:
+        net.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+    return net.predictor.model
+
+
+def detect(net, image, conf, imgsz=640, iou=IOU_THRESHOLD, max_per_class=MAX_PER_CLASS, max_det=MAX_DET,
+           classes=None):
+    """Deteksi satu gambar BGR dengan postprocessing vektor; box dalam koordinat ``image``."""
+    import torch
+
+    backend = _backend(net, imgsz)
+    padded, gain, pad = letterbox(image, imgsz, auto=getattr(backend, "pt", False))
+    tensor = torch.from_numpy(np.ascontiguousarray(padded[..., ::-1].transpose(2, 0, 1)))[None]
+    tensor = tensor.to(backend.device)
+    tensor = (tensor.half() if getattr(backend, "fp16", False) else tensor.float()) / 255
+    with torch.inference_mode():
+        prediction = backend(tensor)
+    if isinstance(prediction, (list, tuple)):
+        prediction = prediction[0]
+    prediction = prediction[0].float().cpu().numpy() if hasattr(prediction, "cpu") else np.asarray(prediction)[0]
+    detections = postprocess(prediction, conf, iou, max_per_class, max_det, classes)
+    return detections._replace(boxes=scale_boxes(detections.boxes, gain, pad, image.shape))
@@ -0,0 +1,76 @@
+"""Agregasi hasil deteksi realtime dalam jendela waktu bergulir.
+
+Callback video WebRTC hanya memanggil ``add()`` (menyimpan array hasil
+predict, tanpa membuat objek per box). Halaman membaca ``snapshot()``
+dengan laju tetap untuk menampilkan jumlah per kelas, deteksi terbaru, dan
+fps, jadi biaya render tidak lagi sebanding dengan jumlah frame.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class ResultsAggregator:
+    def __init__(self, classes, window=10.0, recent=15, max_frames=1200):
+        self.classes = classes
+        self.window = window
+        self.recent = recent
+        self._lock = threading.Lock()
+        # (waktu, class_id, score, xyxy) per frame; maxlen membatasi memori bila halaman tidak membaca
+        self._frames = deque(maxlen=max_frames)
+
+    def add(self, class_ids, scores, boxes, timestamp=None):
+        """Mencatat hasil satu frame (array dari ``result.boxes``)."""
+        entry = (
+            time.monotonic() if timestamp is None else timestamp,
+            np.asarray(class_ids, dtype=np.int16),
+            np.asarray(scores, dtype=np.float32),
+            np.asarray(boxes).reshape(-1, 4).astype(np.int32),
+        )
+        with self._lock:
+            self._frames.append(entry)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+
+    def snapshot(self, now=None):
+        """Ringkasan jendela terakhir: fps, jumlah frame, jumlah per kelas, deteksi terbaru."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while self._frames and self._frames[0][0] < now - self.window:
+                self._frames.popleft()
+            frames = list(self._frames)
+
+        if frames:
+            class_ids = np.concatenate([f[1] for f in frames])
+            span = max(now - frames[0][0], 1e-6)
+            fps = (len(frames) - 1) / span if len(frames) > 1 else 0.0
+        else:
+            class_ids = np.empty(0, dtype=np.int16)
+            fps = 0.0
+        counts = np.bincount(class_ids, minlength=len(self.classes))[:len(self.classes)]
+
+        recent = []
+        for timestamp, ids, scores, boxes in reversed(frames):
+            for class_id, score, box in zip(ids, scores, boxes):
+                recent.append({
+                    "detik lalu": round(now - timestamp, 1),
+                    "label": self.classes[int(class_id)],
+                    "score": round(float(score), 2),
+                    "box": box.tolist(),
+                })
+                if len(recent) >= self.recent:
+                    break
+            if len(recent) >= self.recent:
+                break
+
+        return {
+            "fps": fps,
+            "frames": len(frames),
+            "detections": int(class_ids.size),
+            "counts": dict(zip(self.classes, counts.tolist())),
+            "recent": recent,
+        }
@@ -0,0 +1,83 @@
+from itertools import islice
+
+from utils.geo import ensure_geo_schema, geohash_encode
+
+# Jumlah baris deteksi per executemany
+INSERT_CHUNK_SIZE = 1000
+
+
+def _insert_report(cursor, road_name, description, severity, detection_rows,
+                   image_name=None, video_name=None, annotated_image=None, location=None):
+    lat, lon = location if location else (None, None)
+    sql_report = """
+    INSERT INTO reports (image_name, video_name, road_name, report_description, pothole_severity,
+                         annotated_image, latitude, longitude, geohash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    cursor.execute(sql_report, (
+        image_name, video_name, road_name, description, severity, annotated_image,
+        lat, lon, geohash_encode(lat, lon) if lat is not None else None,
+    ))
+    report_id = cursor.lastrowid
+
+    sql_detection = """
+    INSERT INTO detections (report_id, class_label, confidence, x, y, width, height,
+                            frame_index, latitude, longitude, geohash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    rows = (
+        (
+            report_id,
+            label,
+            round(float(confidence), 4),
+            int(x1),
+            int(y1),
+            int(x2) - int(x1),
+            int(y2) - int(y1),
+            None if frame_index is None else int(frame_index),
+            det_lat,
+            det_lon,
+            geohash_encode(det_lat, det_lon) if det_lat is not None else None,
+        )
+        for label, confidence, x1, y1, x2, y2, frame_index, det_lat, det_lon in detection_rows
+    )
+    # Disisipkan per potongan supaya deteksi video panjang tidak dimuat sekaligus
+    while True:
+        chunk = list(islice(rows, INSERT_CHUNK_SIZE))
+        if not chunk:
+            break
+        cursor.executemany(sql_detection, chunk)
+    return report_id
+
+
+def save_report(connection, road_name, description, severity, detection_rows,
+                image_name=None, video_name=None, annotated_image=None, location=None):
+    """Menyimpan laporan beserta deteksinya dalam satu transaksi.
+
+    ``detection_rows`` berisi tuple ``(class_label, confidence, x1, y1, x2, y2,
+    frame_index, latitude, longitude)``; koordinat boleh None. ``location``
+    adalah (lat, lon) laporan. Mengembalikan report_id, atau melempar
+    exception setelah rollback.
+    """
+    return save_reports(connection, [dict(
+        road_name=road_name, description=description, severity=severity, detection_rows=detection_rows,
+        image_name=image_name, video_name=video_name, annotated_image=annotated_image, location=location,
+    )])[0]
+
+
+def save_reports(connection, reports):
+    """Menyimpan banyak laporan sekaligus dalam satu transaksi.
+
+    Setiap elemen ``reports`` adalah dict berisi argumen ``save_report``
+    (tanpa ``connection``). Mengembalikan daftar report_id sesuai urutan;
+    jika satu laporan gagal, semuanya di-rollback.
+    """
+    ensure_geo_schema(connection)
+    try:
+        with connection.cursor() as cursor:
+            report_ids = [_insert_report(cursor, **report) for report in reports]
+        connection.commit()
+        return report_ids
+    except Exception:
+        connection.rollback()
+        raise
@@ -0,0 +1,122 @@
+"""Profil region-of-interest (ROI) jalan per kamera.
+
+Frame dashcam biasanya 30–50% berisi langit, kap mesin, atau tepi jalan.
+Profil ROI berupa poligon (mis. trapesium) dalam koordinat ternormalisasi
+0–1, sehingga berlaku untuk resolusi apa pun. Inferensi hanya dijalankan
+pada bounding box poligon, deteksi yang titik tengahnya di luar poligon
+dibuang, dan box dikembalikan ke koordinat frame penuh.
+
+Profil dibaca dari ``roi_profiles.json`` (ubah dengan ``ROADGUARD_ROI_PROFILES``).
+"""
+import json
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+PROFILES_PATH = Path(os.environ.get("ROADGUARD_ROI_PROFILES", ROOT / "roi_profiles.json"))
+FULL_FRAME = "Penuh"
+
+
+class RoiLayout:
+    """Profil ROI yang sudah dihitung untuk satu ukuran frame."""
+
+    def __init__(self, polygon, width, height):
+        self.width = width
+        self.height = height
+        if polygon is None:
+            polygon = [(0, 0), (1, 0), (1, 1), (0, 1)]
+        points = np.array(polygon, dtype=np.float64) * (width, height)
+        self.polygon = np.round(points).astype(np.int32)
+        x, y, w, h = cv2.boundingRect(self.polygon)
+        self.x0, self.y0 = max(x, 0), max(y, 0)
+        self.x1, self.y1 = min(x + w, width), min(y + h, height)
+        # Mask poligon seukuran crop untuk menyaring titik tengah box
+        self.mask = np.zeros((self.y1 - self.y0, self.x1 - self.x0), dtype=np.uint8)
+        cv2.fillPoly(self.mask, [self.polygon - (self.x0, self.y0)], 1)
+        self.is_full = self.mask.all() and self.mask.shape == (height, width)
+
+    @property
+    def pixel_ratio(self):
+        """Porsi piksel frame yang masuk inferensi."""
+        return self.mask.size / (self.width * self.height)
+
+    def crop(self, frame):
+        return frame[self.y0:self.y1, self.x0:self.x1]
+
+    def keep(self, xyxy, scale=1.0):
+        """Indeks box (koordinat input predict / ``scale``) yang titik tengahnya di dalam poligon."""
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4) / scale
+        if self.is_full or not len(xyxy):
+            return np.arange(len(xyxy))
+        cx = np.clip(((xyxy[:, 0] + xyxy[:, 2]) / 2).astype(np.intp), 0, self.mask.shape[1] - 1)
+        cy = np.clip(((xyxy[:, 1] + xyxy[:, 3]) / 2).astype(np.intp), 0, self.mask.shape[0] - 1)
+        return np.flatnonzero(self.mask[cy, cx])
+
+    def to_frame(self, xyxy, scale=1.0):
+        """Box dari koordinat input predict ke koordinat frame penuh."""
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4) / scale
+        return xyxy + np.array([self.x0, self.y0, self.x0, self.y0], dtype=np.float32)
+
+    def outline(self, image):
+        """Menggambar garis poligon ROI pada ``image`` (di tempat)."""
+        if not self.is_full:
+            cv2.polylines(image, [self.polygon], isClosed=True, color=(255, 200, 0), thickness=2)
+        return image
+
+    def paste(self, frame, annotated_crop):
+        """Menempel hasil anotasi crop ke salinan frame dan menggambar garis ROI."""
+        output = frame.copy()
+        output[self.y0:self.y1, self.x0:self.x1] = annotated_crop
+        return self.outline(output)
+
+
+class RoiProfile:
+    def __init__(self, name, polygon=None):
+        self.name = name
+        self.polygon = polygon
+        self._layouts = {}
+
+    def layout(self, width, height):
+        """``RoiLayout`` untuk ukuran frame ini (di-cache per ukuran)."""
+        layout = self._layouts.get((width, height))
+        if layout is None:
+            layout = self._layouts[(width, height)] = RoiLayout(self.polygon, width, height)
+        return layout
+
+
+def load_profiles(path=None):
+    """Profil ROI berurutan sesuai file, selalu diawali profil frame penuh."""
+    profiles = {FULL_FRAME: RoiProfile(FULL_FRAME)}
+    try:
+        with open(path or PROFILES_PATH) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return profiles
+    for entry in data["profiles"]:
+        polygon = entry.get("polygon")
+        if polygon is not None and len(polygon) < 3:
+            raise ValueError(f"Poligon ROI '{entry['name']}' butuh minimal 3 titik")
+        profiles[entry["name"]] = RoiProfile(entry["name"], polygon)
+    return profiles
+
+
+def render_roi_selector(page_key):
+    """Pilihan profil ROI di sidebar. Mengembalikan ``RoiProfile``."""
+    import streamlit as st
+
+    profiles = load_profiles()
+    name = st.sidebar.selectbox(
+        "Profil ROI Kamera",
+        list(profiles),
+        key=f"roi_profile_{page_key}",
+        help="Inferensi hanya pada area jalan; deteksi di luar poligon dibuang.",
+    )
+    profile = profiles[name]
+    if profile.polygon is not None:
+        # Rasio piksel dihitung untuk frame 16:9; bentuk poligon yang menentukan, bukan resolusi
+        ratio = profile.layout(1280, 720).pixel_ratio
+        st.sidebar.caption(f"🛣️ ROI: {ratio:.0%} piksel frame diinferensi (hemat {1 - ratio:.0%})")
+    return profile
@@ -0,0 +1,138 @@
+"""Penyimpanan pengguna lokal (fallback) berbasis SQLite mode WAL.
+
+Menggantikan penulisan ulang seluruh ``user_data.json`` di setiap registrasi.
+SQLite menangani penguncian file antar proses/worker Streamlit, setiap
+penulisan berjalan dalam transaksi atomik, dan pencarian username memakai
+indeks primary key sehingga tidak lagi membaca seluruh file.
+
+Impor satu kali dari file JSON lama:
+    python -m utils.user_store import user_data.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+USER_DB_FILE = os.environ.get("ROADGUARD_USER_DB", "user_data.db")
+LEGACY_JSON_FILE = 'user_data.json'
+
+_local = threading.local()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    created_at REAL NOT NULL DEFAULT (strftime('%s', 'now'))
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _connect(path):
+    # isolation_level=None: transaksi diatur manual dengan BEGIN IMMEDIATE
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA busy_timeout=30000")
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def get_connection(path=None):
+    """Koneksi SQLite per thread untuk file database pengguna."""
+    path = path or USER_DB_FILE
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    connection = connections.get(path)
+    if connection is None:
+        connection = connections[path] = _connect(path)
+        if path == USER_DB_FILE and os.path.exists(LEGACY_JSON_FILE):
+            import_json_users(LEGACY_JSON_FILE, path)
+    return connection
+
+
+def get_password(username, path=None):
+    """Mengambil password/hash tersimpan untuk username, atau None."""
+    row = get_connection(path).execute(
+        "SELECT password FROM users WHERE username = ?", (username,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def add_user(username, password_hash, path=None):
+    """Menambah pengguna baru secara atomik. False jika username sudah ada."""
+    try:
+        get_connection(path).execute(
+            "INSERT INTO users (username, password) VALUES (?, ?)", (username, password_hash)
+        )
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+
+def set_password(username, password_hash, path=None):
+    get_connection(path).execute(
+        "UPDATE users SET password = ? WHERE username = ?", (password_hash, username)
+    )
+
+
+def count_users(path=None):
+    return get_connection(path).execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+
+def import_json_users(json_path, path=None):
+    """Impor satu kali dari file JSON lama ``{username: password}``.
+
+    Impor dicatat di tabel meta, jadi pemanggilan berikutnya tidak melakukan
+    apa-apa. Username yang sudah ada di SQLite tidak ditimpa. Password lama
+    tetap disimpan apa adanya dan di-upgrade ke bcrypt saat login berikutnya.
+    Mengembalikan jumlah pengguna yang diimpor.
+    """
+    connection = get_connection(path)
+    marker = "imported:" + os.path.abspath(json_path)
+    if connection.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+        return 0
+
+    with open(json_path, 'r') as f:
+        user_data = json.load(f)
+
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        # Cek ulang di dalam lock, mungkin worker lain sudah mengimpor
+        if connection.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+            connection.execute("ROLLBACK")
+            return 0
+        before = connection.total_changes
+        connection.executemany(
+            "INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)",
+            ((str(username), str(password)) for username, password in user_data.items()),
+        )
+        imported = connection.total_changes - before
+        connection.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (marker, str(imported)))
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kelola penyimpanan pengguna lokal")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="impor pengguna dari file JSON lama")
+    import_parser.add_argument("json_path", nargs="?", default=LEGACY_JSON_FILE)
+    import_parser.add_argument("--db", default=USER_DB_FILE)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        imported = import_json_users(args.json_path, args.db)
+        print(f"{imported} pengguna diimpor ke {args.db} (total {count_users(args.db)})")
+
+
+if __name__ == "__main__":
+    main()
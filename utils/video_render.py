@@ -0,0 +1,77 @@
+"""Anotasi video dari deteksi yang sudah tersimpan, tanpa model.
+
+Halaman video menjalankan inferensi sekali pada ambang batas rendah
+(``FLOOR_CONFIDENCE``) dan menyimpan semua box ke ``DetectionStore``.
+Ambang batas yang lebih tinggi cukup menyaring array tersebut, dan video
+beranotasi untuk ambang batas baru digambar ulang dari box tersimpan.
+"""
+import cv2
+import numpy as np
+
+from utils import metrics
+
+# Ambang batas inferensi; nilai terendah slider halaman video
+FLOOR_CONFIDENCE = 0.1
+
+# Warna per kelas (BGR), mengikuti palet anotasi ultralytics
+PALETTE = [(56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255)]
+
+
+def draw_detections(image, class_ids, scores, boxes, classes):
+    """Menggambar box dan label pada ``image`` (BGR, diubah di tempat)."""
+    thickness = max(round(sum(image.shape[:2]) / 2 * 0.003), 2)
+    font_scale = thickness / 3
+    for class_id, score, (x1, y1, x2, y2) in zip(class_ids.tolist(), scores.tolist(), boxes.tolist()):
+        color = PALETTE[class_id % len(PALETTE)]
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, thickness, cv2.LINE_AA)
+        label = f"{classes[class_id]} {score:.2f}"
+        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, max(thickness - 1, 1))
+        top = y1 - h - 3 if y1 - h - 3 >= 0 else y1 + h + 3
+        cv2.rectangle(image, (x1, y1), (x1 + w, top), color, -1, cv2.LINE_AA)
+        cv2.putText(image, label, (x1, (y1 - 2) if top < y1 else (y1 + h + 2)), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (255, 255, 255), max(thickness - 1, 1), cv2.LINE_AA)
+    return image
+
+
+def render_video(input_path, output_path, detections, min_score, classes, roi=None, progress=None):
+    """Menulis ulang video beranotasi untuk ``min_score`` dari ``detections``.
+
+    ``detections`` adalah ``DetectionStore`` yang diisi berurutan per frame.
+    ``progress(fraction)`` dipanggil sekali per persen. Mengembalikan jumlah frame.
+    """
+    capture = cv2.VideoCapture(str(input_path))
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    frame_count = max(int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), 1)
+    writer = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+
+    selected = detections.view(min_score)
+    frames = selected["frame"]
+    frame_index = 0
+    start = 0
+    last_percent = -1
+    try:
+        while True:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            # Deteksi tersimpan urut per frame, jadi cukup maju dengan searchsorted
+            end = int(np.searchsorted(frames, frame_index, side="right"))
+            if end > start:
+                rows = selected[start:end]
+                draw_detections(frame, rows["class_id"], rows["score"], rows["box"], classes)
+            if roi is not None:
+                roi.outline(frame)
+            writer.write(frame)
+            start = end
+            frame_index += 1
+            percent = frame_index * 100 // frame_count
+            if progress is not None and percent != last_percent:
+                progress(min(frame_index / frame_count, 1.0))
+                last_percent = percent
+    finally:
+        capture.release()
+        writer.release()
+    metrics.count("video.rerendered_frames", frame_index)
+    return frame_index
@@ -0,0 +1,401 @@
+"""Antrean write-behind untuk menyimpan laporan tanpa memblokir halaman.
+
+Halaman memanggil ``enqueue()`` yang hanya menulis laporan ke jurnal SQLite
+lokal (mode WAL) lalu langsung mengembalikan ID sementara. Satu thread
+writer per proses mengambil laporan dari jurnal dan meng-commit-nya ke MySQL
+per batch lewat ``save_reports``. Jika MySQL tidak bisa dihubungi, laporan
+tetap di jurnal dan dicoba ulang dengan backoff; jurnal yang tersisa saat
+aplikasi restart otomatis diputar ulang.
+
+Laporan yang ditolak MySQL karena isinya sendiri (bukan koneksi atau skema)
+dipindah utuh ke tabel ``dead_letter`` dan bisa diputar ulang setelah
+penyebabnya diperbaiki: ``python -m utils.write_behind replay``.
+
+Jeda commit (waktu dari enqueue sampai commit) dicatat di metrik
+``persist.commit_lag`` dan ringkasannya tersedia lewat ``stats()``.
+
+Jurnal: ``ROADGUARD_REPORT_SPOOL`` (default ``report_spool.db``).
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import pymysql
+
+from utils import crop_store, metrics
+from utils.db import create_connection
+from utils.geo import SchemaNotMigrated
+from utils.reports import save_reports
+
+logger = logging.getLogger(__name__)
+
+SPOOL_FILE = os.environ.get("ROADGUARD_REPORT_SPOOL", "report_spool.db")
+BATCH_SIZE = 16
+MAX_BACKOFF = 60.0
+# Status laporan yang sudah selesai disimpan selama 7 hari untuk ditampilkan
+FINISHED_RETENTION = 7 * 24 * 3600
+
+# Error koneksi dan skema yang belum dimigrasi dicoba ulang; error lain berarti laporannya
+# sendiri bermasalah dan laporan dipindah ke dead letter
+RETRYABLE_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError, ConnectionError, SchemaNotMigrated)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    payload TEXT NOT NULL,
+    annotated_image BLOB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pending_created ON pending (created_at);
+CREATE TABLE IF NOT EXISTS finished (
+    id TEXT PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    report_id INTEGER,
+    error TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dead_letter (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL,
+    payload TEXT NOT NULL,
+    annotated_image BLOB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+"""
+
+_local = threading.local()
+_lock = threading.Lock()
+_wake = threading.Event()
+_writer = None
+_last_error = None
+
+
+def _spool(path=None):
+    """Koneksi SQLite per thread ke file jurnal."""
+    path = path or SPOOL_FILE
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    connection = connections.get(path)
+    if connection is None:
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        connections[path] = connection
+    return connection
+
+
+def _to_python(value):
+    # Angka NumPy dari hasil deteksi tidak bisa langsung di-serialize ke JSON
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Tipe {type(value).__name__} tidak bisa disimpan di jurnal")
+
+
+def enqueue(road_name, description, severity, detection_rows,
+            image_name=None, video_name=None, annotated_image=None, location=None):
+    """Menaruh laporan di jurnal dan mengembalikan ID sementara.
+
+    Argumennya sama dengan ``utils.reports.save_report`` tanpa ``connection``.
+    Laporan sudah aman di disk saat fungsi ini kembali.
+    """
+    return enqueue_many([dict(
+        road_name=road_name, description=description, severity=severity, detection_rows=detection_rows,
+        image_name=image_name, video_name=video_name, annotated_image=annotated_image, location=location,
+    )])[0]
+
+
+def enqueue_many(reports):
+    """Seperti ``enqueue`` untuk banyak laporan (dict argumen) dalam satu transaksi jurnal."""
+    now = time.time()
+    rows = []
+    for report in reports:
+        report = dict(report)
+        annotated_image = report.pop("annotated_image", None)
+        report["detection_rows"] = list(report["detection_rows"])
+        rows.append((uuid.uuid4().hex, now, json.dumps(report, default=_to_python), annotated_image))
+
+    spool = _spool()
+    spool.execute("BEGIN IMMEDIATE")
+    try:
+        spool.executemany("INSERT INTO pending (id, created_at, payload, annotated_image) VALUES (?, ?, ?, ?)", rows)
+        spool.execute("COMMIT")
+    except Exception:
+        spool.execute("ROLLBACK")
+        raise
+    metrics.count("persist.enqueued", len(rows))
+    start()
+    _wake.set()
+    return [row[0] for row in rows]
+
+
+def status(pending_id):
+    """Status laporan: dict ``state`` (pending/committed/failed), ``report_id``, ``error``."""
+    spool = _spool()
+    row = spool.execute("SELECT report_id, error FROM finished WHERE id = ?", (pending_id,)).fetchone()
+    if row:
+        report_id, error = row
+        return {"state": "failed" if error else "committed", "report_id": report_id, "error": error}
+    row = spool.execute("SELECT attempts, last_error FROM pending WHERE id = ?", (pending_id,)).fetchone()
+    if row:
+        return {"state": "pending", "report_id": None, "error": row[1], "attempts": row[0]}
+    return {"state": "unknown", "report_id": None, "error": None}
+
+
+def stats():
+    """Ringkasan antrean: jumlah tertunda, umur laporan tertua (detik), error terakhir."""
+    count, oldest = _spool().execute("SELECT COUNT(*), MIN(created_at) FROM pending").fetchone()
+    return {
+        "pending": count,
+        "oldest_age_s": time.time() - oldest if oldest else 0.0,
+        "last_error": _last_error,
+    }
+
+
+# ===================== Thread Writer =====================
+
+def start():
+    """Menyalakan thread writer (sekali per proses) dan memutar ulang jurnal."""
+    global _writer
+    with _lock:
+        if _writer is not None:
+            return
+        _writer = threading.Thread(target=_writer_loop, name="report-writer", daemon=True)
+    _writer.start()
+
+
+def _fetch_batch(spool):
+    rows = spool.execute(
+        "SELECT id, created_at, payload, annotated_image FROM pending ORDER BY created_at LIMIT ?", (BATCH_SIZE,)
+    ).fetchall()
+    batch = []
+    for pending_id, created_at, payload, annotated_image in rows:
+        report = json.loads(payload)
+        report["annotated_image"] = annotated_image
+        if report.get("location") is not None:
+            report["location"] = tuple(report["location"])
+        batch.append((pending_id, created_at, report))
+    return batch
+
+
+def _finish(spool, items, report_ids=None, error=None):
+    """Menandai laporan selesai; laporan gagal (``error``) dipindah utuh ke dead letter."""
+    now = time.time()
+    spool.execute("BEGIN IMMEDIATE")
+    try:
+        for i, (pending_id, created_at, _) in enumerate(items):
+            spool.execute(
+                "INSERT OR REPLACE INTO finished (id, finished_at, report_id, error) VALUES (?, ?, ?, ?)",
+                (pending_id, now, report_ids[i] if report_ids else None, error),
+            )
+            if error is not None:
+                spool.execute(
+                    "INSERT OR REPLACE INTO dead_letter (id, created_at, failed_at, payload, annotated_image, "
+                    "attempts, error) SELECT id, created_at, ?, payload, annotated_image, attempts, ? "
+                    "FROM pending WHERE id = ?",
+                    (now, error, pending_id),
+                )
+            spool.execute("DELETE FROM pending WHERE id = ?", (pending_id,))
+            if error is None:
+                metrics.observe("persist.commit_lag", now - created_at)
+        spool.execute("COMMIT")
+    except Exception:
+        spool.execute("ROLLBACK")
+        raise
+
+
+def _finish_committed(spool, items, report_ids):
+    """``_finish`` untuk laporan yang sudah di-commit ke MySQL.
+
+    Error jurnal (mis. ``database is locked``) dicoba ulang di sini, bukan
+    dilempar ke writer: jika dilempar, laporan yang sama akan di-commit lagi
+    dan menjadi duplikat.
+    """
+    backoff = 0.0
+    while True:
+        try:
+            _finish(spool, items, report_ids)
+            return
+        except sqlite3.Error:
+            backoff = min(MAX_BACKOFF, backoff * 2 or 0.5)
+            logger.exception("Jurnal gagal diperbarui setelah commit, dicoba lagi dalam %.1f detik", backoff)
+            metrics.count("persist.spool_errors")
+            time.sleep(backoff)
+
+
+def _commit(connection, spool, items):
+    with metrics.timer("persist.commit"):
+        report_ids = save_reports(connection, [report for _, _, report in items])
+    _finish_committed(spool, items, report_ids)
+    metrics.count("persist.committed", len(items))
+    # Status di jurnal dihapus setelah FINISHED_RETENTION; galeri crop butuh report_id selamanya
+    try:
+        crop_store.get_store().record_report_ids(
+            {pending_id: report_id for (pending_id, _, _), report_id in zip(items, report_ids)}
+        )
+    except OSError:
+        logger.exception("report_id untuk galeri crop gagal dicatat")
+        metrics.count("crops.errors")
+
+
+def _record_retry(spool, items, error):
+    spool.executemany(
+        "UPDATE pending SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+        [(str(error), pending_id) for pending_id, _, _ in items],
+    )
+
+
+def _writer_loop():
+    global _last_error
+    spool = _spool()
+    connection = None
+    backoff = 0.0
+    delay = 0.0
+    while True:
+        if delay:
+            # enqueue() membangunkan writer lebih awal
+            _wake.wait(timeout=delay)
+            _wake.clear()
+        batch = []
+        # Seluruh isi loop di dalam try: error jurnal pun tidak boleh mematikan thread writer
+        try:
+            batch = _fetch_batch(spool)
+            if not batch:
+                spool.execute("DELETE FROM finished WHERE finished_at < ?", (time.time() - FINISHED_RETENTION,))
+                delay = 5.0
+                continue
+            if connection is None:
+                connection = create_connection()
+            else:
+                connection.ping(reconnect=True)
+            try:
+                _commit(connection, spool, batch)
+            except RETRYABLE_ERRORS:
+                raise
+            except Exception:
+                # Satu laporan bermasalah jangan menahan yang lain: commit satu per satu
+                for item in batch:
+                    try:
+                        _commit(connection, spool, [item])
+                    except RETRYABLE_ERRORS:
+                        raise
+                    except Exception as e:
+                        logger.exception("Laporan %s gagal disimpan, dipindah ke dead letter", item[0])
+                        _finish(spool, [item], error=str(e))
+                        metrics.count("persist.failed")
+            _last_error = None
+            backoff = delay = 0.0
+        except Exception as e:
+            # Error koneksi, skema, atau jurnal: laporan tetap di jurnal, coba lagi nanti
+            _last_error = f"{time.strftime('%H:%M:%S')} {e}"
+            logger.warning("Penyimpanan tertunda, %d laporan tetap di jurnal: %s", len(batch), e)
+            if batch:
+                try:
+                    _record_retry(spool, batch, e)
+                except sqlite3.Error:
+                    logger.exception("Jumlah percobaan gagal dicatat di jurnal")
+            metrics.count("persist.spool_errors" if isinstance(e, sqlite3.Error) else "persist.db_errors")
+            if not isinstance(e, sqlite3.Error):
+                connection = None
+            backoff = delay = min(MAX_BACKOFF, backoff * 2 or 1.0)
+
+
+# ===================== Dead Letter =====================
+
+def dead_letters():
+    """Laporan di dead letter: daftar dict ``id``, ``created_at``, ``failed_at``, ``attempts``, ``error``."""
+    rows = _spool().execute(
+        "SELECT id, created_at, failed_at, attempts, error FROM dead_letter ORDER BY failed_at"
+    ).fetchall()
+    return [dict(zip(("id", "created_at", "failed_at", "attempts", "error"), row)) for row in rows]
+
+
+def replay(ids=None):
+    """Memindahkan laporan dari dead letter kembali ke antrean; ``ids`` None berarti semuanya.
+
+    Mengembalikan jumlah laporan yang diputar ulang.
+    """
+    spool = _spool()
+    where, params = "", ()
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return 0
+        where, params = f" WHERE id IN ({', '.join('?' * len(ids))})", tuple(ids)
+    spool.execute("BEGIN IMMEDIATE")
+    try:
+        count = spool.execute(
+            "INSERT OR IGNORE INTO pending (id, created_at, payload, annotated_image, attempts, last_error) "
+            f"SELECT id, created_at, payload, annotated_image, attempts, error FROM dead_letter{where}",
+            params,
+        ).rowcount
+        spool.execute(f"DELETE FROM finished WHERE id IN (SELECT id FROM dead_letter{where})", params)
+        spool.execute(f"DELETE FROM dead_letter{where}", params)
+        spool.execute("COMMIT")
+    except Exception:
+        spool.execute("ROLLBACK")
+        raise
+    metrics.count("persist.replayed", count)
+    _wake.set()
+    return count
+
+
+# ===================== Tampilan Streamlit =====================
+
+def render_status_panel():
+    """Panel sidebar: status laporan sesi ini dan kondisi antrean."""
+    import streamlit as st
+
+    pending_ids = st.session_state.get("pending_reports", [])
+    queue = stats()
+    if not pending_ids and not queue["pending"]:
+        return
+    with st.sidebar.expander("💾 Status Penyimpanan", expanded=bool(queue["pending"])):
+        st.write(f"Antrean: {queue['pending']} laporan, tertua {queue['oldest_age_s']:.0f} detik")
+        if queue["last_error"]:
+            st.warning(f"Database belum tersedia: {queue['last_error']}")
+        for pending_id, label in reversed(pending_ids[-10:]):
+            info = status(pending_id)
+            if info["state"] == "committed":
+                st.write(f"✅ {label}: ID {info['report_id']}")
+            elif info["state"] == "failed":
+                st.write(f"❌ {label}: {info['error']} (tersimpan di dead letter)")
+            else:
+                st.write(f"⏳ {label}: menunggu")
+        st.button("Muat ulang status")
+
+
+def remember(pending_id, label):
+    """Mencatat ID sementara di session supaya statusnya tampil di panel."""
+    import streamlit as st
+
+    st.session_state.setdefault("pending_reports", []).append((pending_id, label))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Dead letter antrean laporan write-behind.")
+    parser.add_argument("command", choices=["list", "replay"])
+    parser.add_argument("ids", nargs="*", help="ID sementara laporan (replay: kosong berarti semua)")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for row in dead_letters():
+            failed_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["failed_at"]))
+            print(f"{row['id']}  {failed_at}  percobaan {row['attempts']}  {row['error']}")
+        return
+    count = replay(args.ids or None)
+    print(f"{count} laporan dikembalikan ke antrean; writer aplikasi akan menyimpannya.")
+
+
+if __name__ == "__main__":
+    main()